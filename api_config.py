@@ -14,14 +14,77 @@ class APIConfig:
     # Endpoint para obtener variables
     API_ENDPOINT = "/get-variable/{variable_name}"
     
+    # Endpoint de lectura por lotes (?names=a,b,c); si el servidor no lo tiene se usa el individual
+    API_BATCH_ENDPOINT = os.getenv("OPC_API_BATCH_ENDPOINT", "/get-variables")
+    USE_BATCH_ENDPOINT = os.getenv("OPC_API_USE_BATCH", "true").lower() == "true"
+    
+    # Máximo de variables por petición de lote
+    BATCH_SIZE = int(os.getenv("OPC_API_BATCH_SIZE", "50"))
+    
+    # Segundos tras un 404/405/501 del endpoint de lotes antes de volver a probarlo
+    BATCH_REPROBE_INTERVAL = float(os.getenv("OPC_API_BATCH_REPROBE_INTERVAL", "300"))
+    
     # Timeout para las peticiones HTTP (en segundos)
     REQUEST_TIMEOUT = int(os.getenv("OPC_API_TIMEOUT", "10"))
     
     # Intervalo entre peticiones para no sobrecargar la API (en segundos)
     REQUEST_DELAY = float(os.getenv("OPC_API_DELAY", "0.1"))
     
-    # Intervalo de recolección continua (en segundos)
-    COLLECTION_INTERVAL = int(os.getenv("OPC_COLLECTION_INTERVAL", "60"))
+    # Máximo de peticiones simultáneas por escaneo (1 = secuencial)
+    MAX_IN_FLIGHT = int(os.getenv("OPC_API_MAX_IN_FLIGHT", "8"))
+    
+    # Intervalo de recolección continua (en segundos), periodo de la clase de escaneo "normal"
+    COLLECTION_INTERVAL = float(os.getenv("OPC_COLLECTION_INTERVAL", "2"))
+    
+    # Periodos de las clases de escaneo rápida (botones) y lenta (niveles Real), en segundos
+    SCAN_FAST_INTERVAL = float(os.getenv("OPC_SCAN_FAST_INTERVAL", "0.25"))
+    SCAN_SLOW_INTERVAL = float(os.getenv("OPC_SCAN_SLOW_INTERVAL", "10"))
+    
+    # Cada cuántos segundos se imprimen las estadísticas de escaneo (0 = nunca)
+    SCAN_REPORT_INTERVAL = float(os.getenv("OPC_SCAN_REPORT_INTERVAL", "60"))
+    
+    # Reporte por excepción: solo se suben los valores que cambiaron
+    ENABLE_CHANGE_FILTER = os.getenv("OPC_ENABLE_CHANGE_FILTER", "true").lower() == "true"
+    
+    # Banda muerta para tags Real (absoluta y en porcentaje del último valor escrito; 0 = desactivada)
+    DEADBAND_REAL_ABS = float(os.getenv("OPC_DEADBAND_REAL_ABS", "0"))
+    DEADBAND_REAL_PERCENT = float(os.getenv("OPC_DEADBAND_REAL_PERCENT", "0"))
+    
+    # Segundos máximos sin escribir un símbolo aunque no cambie (latido; 0 = sin latido)
+    MAX_SILENCE = float(os.getenv("OPC_MAX_SILENCE", "300"))
+    
+    # Búfer local (store-and-forward, camino por defecto): cada escaneo se guarda en disco y un hilo
+    # lo reenvía a Cloud SQL; con "false" se usa la cola de subida en memoria (UploadPipeline)
+    ENABLE_STORE_AND_FORWARD = os.getenv("OPC_ENABLE_STORE_AND_FORWARD", "true").lower() == "true"
+    BUFFER_PATH = os.getenv("OPC_BUFFER_PATH", "opc_buffer.sqlite3")
+    BUFFER_MAX_MB = float(os.getenv("OPC_BUFFER_MAX_MB", "512"))
+    
+    # Filas por lote y segundos de espera del reenviador cuando el búfer está vacío
+    FORWARD_BATCH_SIZE = int(os.getenv("OPC_FORWARD_BATCH_SIZE", "5000"))
+    FORWARD_INTERVAL = float(os.getenv("OPC_FORWARD_INTERVAL", "1"))
+    
+    # Solo con OPC_ENABLE_STORE_AND_FORWARD=false: subida en un hilo escritor aparte, con cola acotada de escaneos
+    UPLOAD_QUEUE_SIZE = int(os.getenv("OPC_UPLOAD_QUEUE_SIZE", "100"))
+    
+    # Qué hacer con la cola llena: block, drop_oldest o spill (al búfer local en disco)
+    UPLOAD_BACKPRESSURE = os.getenv("OPC_UPLOAD_BACKPRESSURE", "block").lower()
+    
+    # Backend de adquisición: "http" (sondeo de la API) u "opcua" (suscripción directa al servidor)
+    BACKEND = os.getenv("OPC_BACKEND", "http").lower()
+    
+    # Servidor OPC UA y plantilla del NodeId de cada símbolo (S7-1500: ns=3;s="Tabla"."Tag" o ns=3;s="Tag")
+    OPCUA_ENDPOINT = os.getenv("OPCUA_ENDPOINT", "opc.tcp://localhost:4840")
+    OPCUA_NODE_ID_TEMPLATE = os.getenv("OPCUA_NODE_ID_TEMPLATE", 'ns=3;s="{symbol}"')
+    OPCUA_TIMEOUT = float(os.getenv("OPCUA_TIMEOUT", "4"))
+    
+    # Notificaciones que el servidor guarda por tag entre dos publicaciones (0 = solo la última)
+    OPCUA_QUEUE_SIZE = int(os.getenv("OPCUA_QUEUE_SIZE", "10"))
+    
+    # Cada cuántos segundos se entregan las notificaciones recibidas al camino de subida
+    OPCUA_FLUSH_INTERVAL = float(os.getenv("OPCUA_FLUSH_INTERVAL", "1"))
+    
+    # Espera antes de reconectar tras perder la sesión (en segundos)
+    OPCUA_RECONNECT_DELAY = float(os.getenv("OPCUA_RECONNECT_DELAY", "5"))
     
     # Habilitar logging detallado
     ENABLE_LOGGING = os.getenv("OPC_ENABLE_LOGGING", "true").lower() == "true"
@@ -33,12 +96,28 @@ class APIConfig:
 # Instancia global de configuración
 api_config = APIConfig()
 
+def get_scan_intervals():
+    """
+    Periodo en segundos de cada clase de escaneo
+    """
+    return {
+        "fast": api_config.SCAN_FAST_INTERVAL,
+        "normal": api_config.COLLECTION_INTERVAL,
+        "slow": api_config.SCAN_SLOW_INTERVAL,
+    }
+
 def get_api_url(variable_name):
     """
     Construye la URL completa para obtener una variable
     """
     return f"{api_config.API_BASE_URL}{api_config.API_ENDPOINT.format(variable_name=variable_name)}"
 
+def get_batch_api_url():
+    """
+    Construye la URL completa del endpoint de lectura por lotes
+    """
+    return f"{api_config.API_BASE_URL}{api_config.API_BATCH_ENDPOINT}"
+
 def print_config():
     """
     Imprime la configuración actual
@@ -47,7 +126,15 @@ def print_config():
     print(f"URL Base: {api_config.API_BASE_URL}")
     print(f"Timeout: {api_config.REQUEST_TIMEOUT} segundos")
     print(f"Delay entre peticiones: {api_config.REQUEST_DELAY} segundos")
+    print(f"Lectura por lotes: {api_config.USE_BATCH_ENDPOINT} ({api_config.BATCH_SIZE} variables por petición, reintento tras {api_config.BATCH_REPROBE_INTERVAL} s sin soporte)")
+    print(f"Peticiones simultáneas: {api_config.MAX_IN_FLIGHT}")
     print(f"Intervalo de recolección: {api_config.COLLECTION_INTERVAL} segundos")
+    print(f"Clases de escaneo: rápida {api_config.SCAN_FAST_INTERVAL} s, lenta {api_config.SCAN_SLOW_INTERVAL} s")
+    print(f"Filtro de cambios: {api_config.ENABLE_CHANGE_FILTER} (banda muerta Real: {api_config.DEADBAND_REAL_ABS} / {api_config.DEADBAND_REAL_PERCENT}%, latido: {api_config.MAX_SILENCE} s)")
+    print(f"Búfer local: {api_config.ENABLE_STORE_AND_FORWARD} ({api_config.BUFFER_PATH}, máximo {api_config.BUFFER_MAX_MB} MB)")
+    if not api_config.ENABLE_STORE_AND_FORWARD:
+        print(f"Cola de subida: {api_config.UPLOAD_QUEUE_SIZE} escaneos (política: {api_config.UPLOAD_BACKPRESSURE})")
+    print(f"Backend: {api_config.BACKEND} (OPC UA: {api_config.OPCUA_ENDPOINT}, {api_config.OPCUA_NODE_ID_TEMPLATE})")
     print(f"Logging habilitado: {api_config.ENABLE_LOGGING}")
     print(f"Máximo de reintentos: {api_config.MAX_RETRIES}")
     print(f"Delay de reintento: {api_config.RETRY_DELAY} segundos")
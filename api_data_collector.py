@@ -1,43 +1,75 @@
-import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from database import sql_connection
-from pg8000.exceptions import DatabaseError
-import json
-from api_config import api_config, get_api_url
-
-# Definición de los símbolos con sus tipos de datos
-SYMBOLS_CONFIG = [
-    {"symbol": "Inicio", "address": "%I1.0", "data_type": "Bool"},
-    {"symbol": "Tolva1", "address": "%MD1", "data_type": "Real"},
-    {"symbol": "molido", "address": "%I2.0", "data_type": "Bool"},
-    {"symbol": "tolvaintermediacafe", "address": "%MD28", "data_type": "Real"},
-    {"symbol": "total molido", "address": "%MD5", "data_type": "Real"},
-    {"symbol": "tolva2", "address": "%MD24", "data_type": "Real"},
-    {"symbol": "tolvaempaque", "address": "%MD12", "data_type": "Real"},
-    {"symbol": "tipodecafe", "address": "%MW15", "data_type": "Int"},
-    {"symbol": "tipodebaso", "address": "%MW34", "data_type": "Int"},
-    {"symbol": "cafefinal", "address": "%MD62", "data_type": "Real"},
-    {"symbol": "aguafinal", "address": "%MD66", "data_type": "Real"},
-    {"symbol": "lechefinal", "address": "%MD70", "data_type": "Real"},
-    {"symbol": "iniciocafe", "address": "%I74.1", "data_type": "Bool"},
-    {"symbol": "botoniniciocafe", "address": "%I82.0", "data_type": "Bool"},
-    {"symbol": "americano", "address": "%I82.1", "data_type": "Bool"},
-    {"symbol": "cafe", "address": "%I82.2", "data_type": "Bool"},
-    {"symbol": "tinto", "address": "%I82.3", "data_type": "Bool"},
-    {"symbol": "100ml", "address": "%I82.4", "data_type": "Bool"},
-    {"symbol": "150ml", "address": "%I82.5", "data_type": "Bool"},
-    {"symbol": "250ml", "address": "%I82.6", "data_type": "Bool"},
-    {"symbol": "sacarvaso", "address": "%I82.7", "data_type": "Bool"}
-]
-
-def get_variable_from_api(variable_name):
+from database import sql_pool
+from history_schema import create_history_writer
+from api_config import api_config, get_api_url, get_batch_api_url, get_scan_intervals
+from change_filter import ChangeFilter
+from scan_scheduler import ScanScheduler
+from store_forward import Forwarder, open_buffer
+from upload_pipeline import UploadPipeline
+from tag_registry import converter_for, get_registry, module_for_address
+import metrics
+
+# Símbolos a leer con su tipo de dato y clase de escaneo, tomados del registro de tags
+# (fast: botones %I82.x, slow: niveles Real, normal: OPC_COLLECTION_INTERVAL)
+SYMBOLS_CONFIG = get_registry().symbols_config()
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Devuelve la sesión HTTP compartida (conexiones keep-alive reutilizadas entre escaneos)
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests se importa en el primer uso para no retrasar el arranque
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            pool_size = max(1, api_config.MAX_IN_FLIGHT)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """
+    Devuelve el pool de hilos compartido por todos los escaneos (MAX_IN_FLIGHT hilos)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, api_config.MAX_IN_FLIGHT),
+                                           thread_name_prefix="opc-poll")
+        return _executor
+
+def shutdown_executor():
+    """
+    Espera a las lecturas en curso y cierra el pool de hilos compartido
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def get_variable_from_api(variable_name, session=None):
     """
     Obtiene el valor de una variable desde la API OPC UA
     """
+    import requests
     try:
         url = get_api_url(variable_name)
-        response = requests.get(url, timeout=api_config.REQUEST_TIMEOUT)
+        with metrics.HTTP_REQUEST_SECONDS.time(variable_name):
+            response = (session or get_session()).get(url, timeout=api_config.REQUEST_TIMEOUT)
         
         if response.status_code == 200:
             data = response.json()
@@ -49,19 +81,103 @@ def get_variable_from_api(variable_name):
                 }
             else:
                 print(f"Error en la respuesta de la API para {variable_name}: {data}")
+                metrics.HTTP_ERRORS.labels(variable_name, "api").inc()
                 return {"success": False, "error": "API response error"}
         else:
             print(f"Error HTTP {response.status_code} para {variable_name}: {response.text}")
+            metrics.HTTP_ERRORS.labels(variable_name, f"http_{response.status_code}").inc()
             return {"success": False, "error": f"HTTP {response.status_code}"}
             
     except requests.exceptions.RequestException as e:
         print(f"Error de conexión para {variable_name}: {e}")
+        metrics.HTTP_ERRORS.labels(variable_name, "connection").inc()
         return {"success": False, "error": str(e)}
     except Exception as e:
         print(f"Error inesperado para {variable_name}: {e}")
+        metrics.HTTP_ERRORS.labels(variable_name, "unexpected").inc()
         return {"success": False, "error": str(e)}
 
-def convert_value_to_appropriate_type(value, data_type):
+# None = aún no se sabe si el servidor tiene el endpoint de lotes
+_batch_endpoint_supported = None
+# Instante (time.monotonic) a partir del cual se vuelve a probar el endpoint de lotes
+_batch_reprobe_at = 0.0
+
+# Códigos HTTP que indican que el servidor no implementa el endpoint de lotes
+BATCH_UNSUPPORTED_STATUS = (404, 405, 501)
+
+def _parse_batch_item(item):
+    if not isinstance(item, dict):
+        return {"success": True, "value": item, "data_type": None}
+    if item.get("success", True):
+        return {"success": True, "value": item.get("value"), "data_type": item.get("data_type")}
+    return {"success": False, "error": item.get("error", "API response error")}
+
+def get_variables_from_api(variable_names, session=None):
+    """
+    Obtiene varias variables con una sola petición al endpoint de lotes
+    
+    Devuelve {nombre: resultado} con el mismo formato que get_variable_from_api,
+    o None si el servidor no tiene el endpoint o la petición falló.
+    """
+    global _batch_endpoint_supported, _batch_reprobe_at
+    import requests
+    try:
+        with metrics.HTTP_BATCH_SECONDS.time():
+            response = (session or get_session()).get(
+                get_batch_api_url(),
+                params={"names": ",".join(variable_names)},
+                timeout=api_config.REQUEST_TIMEOUT
+            )
+        
+        if response.status_code in BATCH_UNSUPPORTED_STATUS:
+            print(f"La API no soporta lectura por lotes (HTTP {response.status_code}); se usarán peticiones "
+                  f"individuales y se volverá a probar en {api_config.BATCH_REPROBE_INTERVAL:g} s.")
+            _batch_endpoint_supported = False
+            _batch_reprobe_at = time.monotonic() + api_config.BATCH_REPROBE_INTERVAL
+            return None
+        if response.status_code != 200:
+            print(f"Error HTTP {response.status_code} en la lectura por lotes: {response.text}")
+            return None
+        
+        data = response.json()
+        if isinstance(data, dict) and data.get("success") is False:
+            print(f"Error en la respuesta de la API para el lote: {data}")
+            return None
+        
+        # Se aceptan {"variables": {nombre: {...}}} o {"variables": [{"name": ..., ...}]}
+        items = data.get("variables", data.get("values")) if isinstance(data, dict) else data
+        if isinstance(items, list):
+            items = {item.get("name") or item.get("variable"): item for item in items if isinstance(item, dict)}
+        if not isinstance(items, dict):
+            print(f"Respuesta de lote no reconocida: {data}")
+            return None
+        
+        _batch_endpoint_supported = True
+        results = {}
+        for name in variable_names:
+            if name in items:
+                results[name] = _parse_batch_item(items[name])
+            else:
+                results[name] = {"success": False, "error": "Variable ausente en la respuesta del lote"}
+        return results
+        
+    except requests.exceptions.RequestException as e:
+        print(f"Error de conexión en la lectura por lotes: {e}")
+        return None
+    except ValueError as e:
+        print(f"Respuesta de lote inválida: {e}")
+        return None
+
+def batch_endpoint_usable():
+    """
+    True si hay que intentar el endpoint de lotes: no se sabe, está disponible o toca volver a probarlo
+    
+    Un 404/405/501 puede ser pasajero (un proxy, un reinicio del servidor), así
+    que el endpoint solo se descarta durante BATCH_REPROBE_INTERVAL segundos.
+    """
+    return _batch_endpoint_supported is not False or time.monotonic() >= _batch_reprobe_at
+
+def convert_value_to_appropriate_type(value, data_type, converter=None):
     """
     Convierte el valor al tipo de dato apropiado
     """
@@ -69,175 +185,369 @@ def convert_value_to_appropriate_type(value, data_type):
         return None
     
     try:
-        if data_type == "Bool":
-            return bool(value)
-        elif data_type == "Byte":
-            return int(value)
-        elif data_type == "Int":
-            return int(value)
-        elif data_type == "Real":
-            return float(value)
-        else:
-            return str(value)
+        return (converter or converter_for(data_type))(value)
     except (ValueError, TypeError):
         return str(value)
 
-def upload_symbols_to_sql(symbols_data):
+def build_history_rows(symbols_data):
     """
-    Sube los datos de los símbolos a la base de datos SQL
+    Convierte las lecturas exitosas en filas para la tabla de históricos
     """
-    if not sql_connection or not sql_connection.connection:
-        print("Error: No hay conexión a la base de datos.")
-        return
+    registry = get_registry()
+    rows = []
+    for symbol_data in symbols_data:
+        if symbol_data.get("success") and symbol_data.get("value") is not None:
+            # Módulo y conversor del registro; si el símbolo no está, se deducen de la dirección
+            tag = registry.get(symbol_data.get("symbol"))
+            if tag is not None:
+                module, converter = tag.module, tag.converter
+            else:
+                module, converter = module_for_address(symbol_data.get("address", "")), None
+            
+            # Convertir el valor al tipo apropiado
+            converted_value = convert_value_to_appropriate_type(
+                symbol_data.get("value"), 
+                symbol_data.get("data_type"),
+                converter
+            )
+            
+            rows.append((
+                module,
+                symbol_data.get("address"),
+                symbol_data.get("symbol"),
+                symbol_data.get("data_type"),
+                "",  # Comment vacío
+                str(converted_value) if converted_value is not None else "",
+                symbol_data.get("timestamp")
+            ))
+    return rows
 
-    table_name = "chocolatin_variables_history"
+def upload_rows_to_sql(rows):
+    """
+    Sube filas ya preparadas a la base de datos SQL. Devuelve True si quedaron confirmadas.
     
-    insert_query = f"""
-    INSERT INTO {table_name} (module, address, symbol, data_type, comment, value, "timestamp")
-    VALUES (%s, %s, %s, %s, %s, %s, %s);
+    Cada hilo (escritor, reenviador) usa su propia conexión del pool; si la
+    conexión se cayó, se reintenta una vez con una conexión nueva.
     """
+    from pg8000.exceptions import DatabaseError
     
-    cursor = None
-    try:
-        cursor = sql_connection.connection.cursor()
-        
+    table_name = "chocolatin_variables_history"
+    
+    def write(connection):
+        writer = create_history_writer(connection, table_name=table_name)
+
         print("Insertando datos en la base de datos...")
-        for symbol_data in symbols_data:
-            if symbol_data.get("success") and symbol_data.get("value") is not None:
-                # Determinar el módulo basado en la dirección
-                address = symbol_data.get("address", "")
-                if address.startswith("%I"):
-                    module = "Digital_Inputs"
-                elif address.startswith("%Q"):
-                    module = "Digital_Outputs"
-                elif address.startswith("%M"):
-                    module = "Memory_Bits"
-                elif address.startswith("%MD"):
-                    module = "Memory_Double"
-                elif address.startswith("%MW"):
-                    module = "Memory_Word"
-                elif address.startswith("%MB"):
-                    module = "Memory_Byte"
-                else:
-                    module = "OPC_UA_Data"
-                
-                # Convertir el valor al tipo apropiado
-                converted_value = convert_value_to_appropriate_type(
-                    symbol_data.get("value"), 
-                    symbol_data.get("data_type")
-                )
-                
-                cursor.execute(insert_query, (
-                    module,
-                    symbol_data.get("address"),
-                    symbol_data.get("symbol"),
-                    symbol_data.get("data_type"),
-                    "",  # Comment vacío
-                    str(converted_value) if converted_value is not None else "",
-                    symbol_data.get("timestamp")
-                ))
+        writer.write_many(rows)
         
-        sql_connection.connection.commit()
+        writer.commit()
+        writer.report()
+    
+    try:
+        sql_pool.run(write)
         print("¡Datos insertados correctamente en Cloud SQL!")
+        return True
 
     except DatabaseError as e:
         print(f"Error de base de datos: {e}")
-        if sql_connection.connection:
-            sql_connection.connection.rollback()
+        return False
     except Exception as e:
         print(f"Ha ocurrido un error inesperado: {e}")
-        if sql_connection.connection:
-            sql_connection.connection.rollback()
-    finally:
-        if cursor:
-            cursor.close()
+        return False
+
+def upload_symbols_to_sql(symbols_data):
+    """
+    Sube los datos de los símbolos a la base de datos SQL
+    """
+    return upload_rows_to_sql(build_history_rows(symbols_data))
+
+def build_symbol_data(symbol_config, api_result, timestamp):
+    """
+    Construye el registro de un símbolo a partir del resultado de la API
+    """
+    symbol_name = symbol_config["symbol"]
+    
+    if api_result["success"]:
+        print(f"  ✓ {symbol_name}: {api_result['value']} ({api_result['data_type']})")
+        return {
+            "success": True,
+            "symbol": symbol_name,
+            "address": symbol_config["address"],
+            "data_type": symbol_config["data_type"],
+            "value": api_result["value"],
+            "timestamp": timestamp
+        }
+    
+    print(f"  ✗ {symbol_name}: Error - {api_result.get('error', 'Unknown error')}")
+    # Agregar entrada con valor vacío para mantener consistencia
+    return {
+        "success": False,
+        "symbol": symbol_name,
+        "address": symbol_config["address"],
+        "data_type": symbol_config["data_type"],
+        "value": None,
+        "timestamp": timestamp
+    }
+
+def _collect_in_batches(symbols_config, session, executor):
+    """
+    Lee los símbolos por lotes de BATCH_SIZE; devuelve None si hay que usar lecturas individuales
+    """
+    names = [symbol_config["symbol"] for symbol_config in symbols_config]
+    batch_size = max(1, api_config.BATCH_SIZE)
+    chunks = [names[i:i + batch_size] for i in range(0, len(names), batch_size)]
+    
+    chunk_results = list(executor.map(lambda chunk: get_variables_from_api(chunk, session), chunks))
+    if any(result is None for result in chunk_results):
+        return None
+    
+    results = {}
+    for chunk_result in chunk_results:
+        results.update(chunk_result)
+    return [results[name] for name in names]
 
-def collect_all_variables():
+def collect_all_variables(symbols_config=None, max_in_flight=None, session=None, executor=None):
     """
     Recolecta todos los valores de las variables desde la API
+    
+    Las peticiones se lanzan en paralelo sobre el pool de hilos compartido
+    (MAX_IN_FLIGHT hilos, creado una vez y reutilizado en cada escaneo) y una
+    sesión HTTP compartida, de modo que un escaneo completo tarda
+    aproximadamente lo que una sola petición. Si el servidor tiene el endpoint
+    de lotes, se piden BATCH_SIZE variables por petición; si no, se vuelve
+    automáticamente a una petición por variable. Con max_in_flight=1 se
+    consulta de forma secuencial, con una pausa de REQUEST_DELAY entre peticiones.
     """
     print("Iniciando recolección de datos desde la API OPC UA...")
     
-    symbols_data = []
+    symbols_config = SYMBOLS_CONFIG if symbols_config is None else symbols_config
+    max_in_flight = api_config.MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+    session = session or get_session()
+    executor = executor or get_executor()
     current_timestamp = datetime.now().isoformat()
     
-    for symbol_config in SYMBOLS_CONFIG:
-        symbol_name = symbol_config["symbol"]
-        print(f"Obteniendo valor para: {symbol_name}")
-        
-        # Obtener el valor desde la API
-        api_result = get_variable_from_api(symbol_name)
-        
-        if api_result["success"]:
-            symbol_data = {
-                "success": True,
-                "symbol": symbol_name,
-                "address": symbol_config["address"],
-                "data_type": symbol_config["data_type"],
-                "value": api_result["value"],
-                "timestamp": current_timestamp
-            }
-            symbols_data.append(symbol_data)
-            print(f"  ✓ {symbol_name}: {api_result['value']} ({api_result['data_type']})")
-        else:
-            print(f"  ✗ {symbol_name}: Error - {api_result.get('error', 'Unknown error')}")
-            # Agregar entrada con valor vacío para mantener consistencia
-            symbol_data = {
-                "success": False,
-                "symbol": symbol_name,
-                "address": symbol_config["address"],
-                "data_type": symbol_config["data_type"],
-                "value": None,
-                "timestamp": current_timestamp
-            }
-            symbols_data.append(symbol_data)
-        
-        # Pequeña pausa para no sobrecargar la API
-        time.sleep(api_config.REQUEST_DELAY)
+    api_results = None
+    if api_config.USE_BATCH_ENDPOINT and batch_endpoint_usable():
+        api_results = _collect_in_batches(symbols_config, session, executor)
+    
+    if api_results is None and max_in_flight <= 1:
+        api_results = []
+        for symbol_config in symbols_config:
+            print(f"Obteniendo valor para: {symbol_config['symbol']}")
+            api_results.append(get_variable_from_api(symbol_config["symbol"], session))
+            
+            # Pequeña pausa para no sobrecargar la API
+            time.sleep(api_config.REQUEST_DELAY)
+    elif api_results is None:
+        api_results = list(executor.map(
+            lambda symbol_config: get_variable_from_api(symbol_config["symbol"], session),
+            symbols_config
+        ))
+    
+    # Mantener el orden de SYMBOLS_CONFIG en el resultado
+    return [
+        build_symbol_data(symbol_config, api_result, current_timestamp)
+        for symbol_config, api_result in zip(symbols_config, api_results)
+    ]
+
+def group_symbols_by_scan_class(symbols_config=None):
+    """
+    Agrupa los símbolos por clase de escaneo, en el orden de SYMBOLS_CONFIG
+    """
+    symbols_config = SYMBOLS_CONFIG if symbols_config is None else symbols_config
+    groups = {}
+    for symbol_config in symbols_config:
+        groups.setdefault(symbol_config.get("scan_class", "normal"), []).append(symbol_config)
+    return groups
+
+def run_scan(scan_class, symbols_config, change_filter=None, forwarder=None, pipeline=None):
+    """
+    Ejecuta un escaneo: recolecta los símbolos de la clase, filtra y sube a la base de datos
+    
+    Con un reenviador, las filas se guardan en el búfer local y se suben en segundo plano.
+    Con una cola de subida, las filas se encolan para el hilo escritor.
+    """
+    print(f"\n{'='*50}")
+    print(f"Escaneo '{scan_class}' - {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
+    print(f"{'='*50}")
+    
+    # Recolectar todos los valores
+    symbols_data = collect_all_variables(symbols_config)
     
-    return symbols_data
+    # Mostrar resumen
+    successful_collections = sum(1 for s in symbols_data if s["success"])
+    print(f"\nResumen:")
+    print(f"  - Total de símbolos: {len(symbols_data)}")
+    print(f"  - Consultas exitosas: {successful_collections}")
+    print(f"  - Consultas fallidas: {len(symbols_data) - successful_collections}")
+    
+    # Reporte por excepción: descartar valores sin cambios
+    if change_filter:
+        symbols_data = change_filter.filter(symbols_data)
+        print(f"  - Valores con cambios: {len(symbols_data)} "
+              f"(reducción acumulada x{change_filter.reduction_ratio():.1f})")
+    
+    deliver_symbols(symbols_data, forwarder, pipeline)
+
+def deliver_symbols(symbols_data, forwarder=None, pipeline=None):
+    """
+    Entrega las lecturas al camino de subida: búfer local, cola del hilo escritor o subida directa
+    """
+    if not symbols_data:
+        print("No hay datos para subir a la base de datos.")
+    elif forwarder:
+        rows = build_history_rows(symbols_data)
+        forwarder.buffer.append(rows)
+        forwarder.notify()
+        print(f"Guardadas {len(rows)} filas en el búfer local ({forwarder.buffer.count()} pendientes).")
+    elif pipeline:
+        pipeline.put(build_history_rows(symbols_data))
+        print(f"Filas encoladas para subir: {pipeline.stats()}")
+    else:
+        print("\nSubiendo datos a la base de datos...")
+        upload_symbols_to_sql(symbols_data)
+        print("Proceso completado.")
+
+def start_upload_path():
+    """
+    Arranca el reenviador del búfer local (por defecto) o, con
+    OPC_ENABLE_STORE_AND_FORWARD=false, la cola de subida en memoria. Devuelve (forwarder, pipeline, spill_forwarder): forwarder o pipeline es None, y
+    spill_forwarder es el reenviador del búfer de desbordamiento de la cola (política spill).
+    """
+    forwarder = None
+    pipeline = None
+    spill_forwarder = None
+    if api_config.ENABLE_STORE_AND_FORWARD:
+        buffer = open_buffer(api_config.BUFFER_PATH, api_config.BUFFER_MAX_MB)
+        pending = buffer.count()
+        if pending:
+            print(f"Búfer local con {pending} filas pendientes de una ejecución anterior; se reenviarán.")
+        forwarder = Forwarder(
+            buffer,
+            upload_rows_to_sql,
+            batch_size=api_config.FORWARD_BATCH_SIZE,
+            interval=api_config.FORWARD_INTERVAL,
+            retry_delay=api_config.RETRY_DELAY
+        )
+        forwarder.start()
+    else:
+        # Sin búfer local: subir desde un hilo escritor para no frenar los escaneos
+        if api_config.UPLOAD_BACKPRESSURE == "spill":
+            spill_forwarder = Forwarder(
+                open_buffer(api_config.BUFFER_PATH, api_config.BUFFER_MAX_MB),
+                upload_rows_to_sql,
+                batch_size=api_config.FORWARD_BATCH_SIZE,
+                interval=api_config.FORWARD_INTERVAL,
+                retry_delay=api_config.RETRY_DELAY
+            )
+            spill_forwarder.start()
+        pipeline = UploadPipeline(
+            upload_rows_to_sql,
+            max_queue=api_config.UPLOAD_QUEUE_SIZE,
+            policy=api_config.UPLOAD_BACKPRESSURE,
+            max_batch_rows=api_config.FORWARD_BATCH_SIZE,
+            spill_buffer=spill_forwarder.buffer if spill_forwarder else None,
+            on_spill=spill_forwarder.notify if spill_forwarder else None
+        ).start()
+    return forwarder, pipeline, spill_forwarder
+
+def _stop_forwarder(forwarder):
+    """
+    Detiene el hilo reenviador, reenvía lo que quede pendiente y cierra el búfer.
+    """
+    forwarder.stop(timeout=api_config.REQUEST_TIMEOUT)
+    if not forwarder.is_alive():
+        # Con el hilo ya terminado, vaciar desde aquí sin riesgo de enviar dos veces
+        forwarder.drain(timeout=api_config.REQUEST_TIMEOUT)
+    print(f"Filas pendientes en el búfer local: {forwarder.buffer.count()}")
+    forwarder.buffer.close()
+
+def stop_upload_path(forwarder, pipeline, spill_forwarder=None):
+    """
+    Vacía la cola de subida y detiene los reenviadores antes de salir.
+    """
+    if pipeline:
+        print("Escribiendo las filas encoladas...")
+        pipeline.stop(timeout=api_config.REQUEST_TIMEOUT)
+        print(f"Cola de subida: {pipeline.stats()}")
+    # Después de la cola, que puede haber desbordado filas al búfer
+    for upload_forwarder in (forwarder, spill_forwarder):
+        if upload_forwarder:
+            _stop_forwarder(upload_forwarder)
+
+def run_opcua(groups, intervals, forwarder, pipeline):
+    """
+    Backend OPC UA: suscripciones con muestreo y banda muerta en el servidor,
+    cuyas notificaciones se entregan al mismo camino de subida que los escaneos.
+    """
+    from opcua_subscriber import OPCUASubscriber
+    
+    subscriber = OPCUASubscriber(
+        groups,
+        lambda symbols_data: deliver_symbols(symbols_data, forwarder, pipeline),
+        intervals=intervals
+    )
+    try:
+        subscriber.run_forever()
+    finally:
+        subscriber.report()
+
+def run_scans(groups, intervals, forwarder, pipeline):
+    """
+    Backend HTTP: cada clase de escaneo se lee a su propio periodo fijo.
+    """
+    change_filter = None
+    if api_config.ENABLE_CHANGE_FILTER:
+        change_filter = ChangeFilter.from_config(converter=convert_value_to_appropriate_type)
+    
+    scheduler = ScanScheduler(report_interval=api_config.SCAN_REPORT_INTERVAL)
+    for scan_class, symbols_config in groups.items():
+        scheduler.add(
+            scan_class,
+            intervals[scan_class],
+            lambda scan_class=scan_class, symbols_config=symbols_config: run_scan(scan_class, symbols_config, change_filter, forwarder, pipeline)
+        )
+    
+    try:
+        scheduler.run()
+    finally:
+        scheduler.report()
 
 def main():
     """
     Función principal para recolectar datos desde la API y subirlos a la base de datos
-    Se ejecuta cada 30 segundos de forma continua
+    Cada clase de escaneo se ejecuta de forma continua a su propio periodo fijo
+    (o, con OPC_BACKEND=opcua, como suscripción directa al servidor OPC UA)
     """
+    intervals = get_scan_intervals()
+    groups = group_symbols_by_scan_class()
+    use_opcua = api_config.BACKEND == "opcua"
+    
     print("=== Recolector de Datos OPC UA ===")
-    print(f"URL de la API: {api_config.API_BASE_URL}")
+    if use_opcua:
+        print(f"Servidor OPC UA: {api_config.OPCUA_ENDPOINT} (suscripciones)")
+    else:
+        print(f"URL de la API: {api_config.API_BASE_URL}")
     print(f"Total de símbolos a consultar: {len(SYMBOLS_CONFIG)}")
-    print("El programa se ejecutará cada 30 segundos...")
+    for scan_class, symbols_config in groups.items():
+        print(f"  - Clase '{scan_class}': {len(symbols_config)} símbolos cada {intervals[scan_class]} segundos")
     print("Presiona Ctrl+C para detener el programa.")
     print()
     
+    reporter = metrics.start_from_env()
+    forwarder, pipeline, spill_forwarder = start_upload_path()
     try:
-        while True:
-            print(f"\n{'='*50}")
-            print(f"Ejecutando recolección de datos - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"{'='*50}")
-            
-            # Recolectar todos los valores
-            symbols_data = collect_all_variables()
-            
-            # Mostrar resumen
-            successful_collections = sum(1 for s in symbols_data if s["success"])
-            print(f"\nResumen:")
-            print(f"  - Total de símbolos: {len(symbols_data)}")
-            print(f"  - Consultas exitosas: {successful_collections}")
-            print(f"  - Consultas fallidas: {len(symbols_data) - successful_collections}")
-            
-            # Subir a la base de datos
-            if symbols_data:
-                print("\nSubiendo datos a la base de datos...")
-                upload_symbols_to_sql(symbols_data)
-                print("Proceso completado.")
-            else:
-                print("No hay datos para subir a la base de datos.")
-            
-            print(f"\nEsperando 30 segundos para la próxima ejecución...")
-            time.sleep(2)
-            
+        if use_opcua:
+            run_opcua(groups, intervals, forwarder, pipeline)
+        else:
+            run_scans(groups, intervals, forwarder, pipeline)
     except KeyboardInterrupt:
         print("\n\nPrograma detenido por el usuario.")
+    finally:
+        # También ante cualquier otro error: las filas encoladas y del búfer no se pierden
+        shutdown_executor()
+        stop_upload_path(forwarder, pipeline, spill_forwarder)
+        if reporter:
+            print(reporter.summary_line())
         print("¡Hasta luego!")
 
 if __name__ == "__main__":
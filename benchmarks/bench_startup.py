@@ -0,0 +1,62 @@
+"""
+Presupuesto de tiempo de arranque: importar main y api_data_collector no debe
+cargar los backends pesados (Cloud SQL Connector, pg8000, openpyxl, requests,
+chardet) ni abrir conexiones, y debe tardar menos que el presupuesto.
+
+Uso: python benchmarks/bench_startup.py [presupuesto_ms]
+Devuelve código de salida 1 si se supera el presupuesto o se carga un backend pesado.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["main", "api_data_collector"]
+HEAVY_MODULES = ["google.cloud.sql.connector", "pg8000", "openpyxl", "requests", "chardet"]
+RUNS = 5
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed * 1000, ",".join(heavy))
+"""
+
+
+def measure(module):
+    """
+    Mejor tiempo de importación (ms) en varios procesos nuevos y backends pesados cargados.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    best = None
+    heavy = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        elapsed, _, loaded = output.partition(" ")
+        elapsed = float(elapsed)
+        best = elapsed if best is None else min(best, elapsed)
+        heavy = [m for m in loaded.split(",") if m]
+    return best, heavy
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else float(os.getenv("STARTUP_BUDGET_MS", "50"))
+    failed = False
+    for module in MODULES:
+        elapsed, heavy = measure(module)
+        status = "OK" if elapsed <= budget_ms and not heavy else "FALLO"
+        failed = failed or status != "OK"
+        print(f"{module:<22} {elapsed:7.1f} ms (presupuesto {budget_ms:.0f} ms)  {status}")
+        if heavy:
+            print(f"  backends cargados al importar: {', '.join(heavy)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
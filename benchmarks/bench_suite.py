@@ -0,0 +1,351 @@
+"""
+Suite de benchmarks reproducible con datos sintéticos de WinCC y sustitutos locales.
+
+Mide lectura de CSV y XLSX, recolección desde la API OPC (servidor local con
+latencia configurable) y las dos rutas de subida. Por defecto la base de datos
+es un sumidero DB-API en memoria; con --dsn se usa un PostgreSQL real (por
+ejemplo, uno local). Cada escenario corre en un proceso nuevo para medir su
+pico de memoria (RSS) por separado.
+
+Uso:
+  python benchmarks/bench_suite.py                       # todos los escenarios
+  python benchmarks/bench_suite.py --scenarios csv_read,upload_csv --rows 200000
+  python benchmarks/bench_suite.py --save                # guarda benchmarks/results/<commit>.json
+  python benchmarks/bench_suite.py --compare a1b2c3d     # compara con un resultado guardado
+
+Los escenarios usan funciones que se añadieron junto con la suite (subida por
+lotes, pool perezoso, sumidero en memoria), así que --compare solo sirve entre
+commits que ya incluyen benchmarks/; el código anterior (que además conectaba
+a Cloud SQL al importarse) no se puede medir con ella. En Windows el pico de
+memoria se lee con GetProcessMemoryInfo; si no hay forma de medirlo, la
+columna RSS queda vacía.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SCENARIOS = ["csv_read", "xlsx_read", "collect", "collect_nobatch", "upload_csv", "upload_rows"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Rango más cercano
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _windows_peak_rss_bytes():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    get_process_memory_info = ctypes.WinDLL("psapi").GetProcessMemoryInfo
+    get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    handle = ctypes.WinDLL("kernel32").GetCurrentProcess()
+    if not get_process_memory_info(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def peak_rss_mb():
+    """
+    Pico de memoria residente del proceso en MB, o None si la plataforma no lo permite.
+    """
+    try:
+        import resource
+    except ImportError:
+        if sys.platform != "win32":
+            return None
+        try:
+            peak = _windows_peak_rss_bytes()
+        except (OSError, AttributeError):
+            return None
+        return None if peak is None else peak / (1024 * 1024)
+    # En Linux ru_maxrss está en KB; en macOS, en bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _format_rss(value):
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+def data_path(args, kind):
+    os.makedirs(args.data_dir, exist_ok=True)
+    import synthetic
+    if kind == "csv":
+        path = os.path.join(args.data_dir, f"wincc_{args.tags}x{args.rows}_{args.encoding}.csv")
+        if not os.path.exists(path):
+            synthetic.write_wincc_csv(path + ".tmp", tags=args.tags, rows=args.rows, encoding=args.encoding)
+            os.replace(path + ".tmp", path)
+    else:
+        path = os.path.join(args.data_dir, f"tags_{args.xlsx_rows}.xlsx")
+        if not os.path.exists(path):
+            synthetic.write_tags_xlsx(path + ".tmp.xlsx", rows=args.xlsx_rows)
+            os.replace(path + ".tmp.xlsx", path)
+    return path
+
+
+def use_database(args, *modules):
+    """
+    Sustituye sql_pool por el sumidero en memoria salvo que se indique --dsn.
+    """
+    if args.dsn:
+        return None
+    import synthetic
+    pool = synthetic.FakePool(latency=args.db_latency)
+    for module in modules:
+        module.sql_pool = pool
+    return pool
+
+
+def count_records(symbols_data):
+    return sum(len(symbol_list) for symbol_list in (symbols_data or {}).values())
+
+
+def scenario_csv_read(args):
+    import main
+    path = data_path(args, "csv")
+    timings, records = [], 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        records = count_records(main.read_symbols_from_csv(path))
+        timings.append(time.perf_counter() - start)
+    return records, timings
+
+
+def scenario_xlsx_read(args):
+    import main
+    path = data_path(args, "xlsx")
+    timings, records = [], 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        records = count_records(main.read_symbols_from_xlsx(path))
+        timings.append(time.perf_counter() - start)
+    return records, timings
+
+
+def _collect(args, batch):
+    import api_data_collector
+    from api_config import api_config
+    import synthetic
+
+    with synthetic.StubOPCServer(latency=args.latency, jitter=args.latency / 2, batch=batch) as stub:
+        api_config.API_BASE_URL = stub.url
+        api_data_collector._batch_endpoint_supported = None
+        api_data_collector.collect_all_variables()  # calentar conexiones y detectar el endpoint
+        timings, records = [], 0
+        for _ in range(args.scans):
+            start = time.perf_counter()
+            records += len(api_data_collector.collect_all_variables())
+            timings.append(time.perf_counter() - start)
+    return records, timings
+
+
+def scenario_collect(args):
+    return _collect(args, batch=True)
+
+
+def scenario_collect_nobatch(args):
+    return _collect(args, batch=False)
+
+
+def scenario_upload_csv(args):
+    import main
+    use_database(args, main)
+    path = data_path(args, "csv")
+    timings, records = [], 0
+    for _ in range(args.repeat):
+        batches = list(main.iter_symbols_from_csv(path, batch_size=5000, compact=True))
+        start = time.perf_counter()
+        if not main.upload_symbols_to_sql(batches):
+            raise RuntimeError("La subida falló")
+        timings.append(time.perf_counter() - start)
+        records += sum(len(batch) for batch in batches)
+    return records, timings
+
+
+def scenario_upload_rows(args):
+    import api_data_collector
+    use_database(args, api_data_collector)
+    from datetime import datetime, timedelta
+    start_time = datetime(2025, 6, 26, 15, 0, 0)
+    timings, records = [], 0
+    for scan in range(args.scans):
+        timestamp = (start_time + timedelta(seconds=scan)).isoformat()
+        symbols_data = [
+            {"symbol": c["symbol"], "address": c["address"], "data_type": c["data_type"],
+             "value": (scan % 2 == 0) if c["data_type"] == "Bool" else scan * 0.5,
+             "timestamp": timestamp, "success": True}
+            for c in api_data_collector.SYMBOLS_CONFIG
+        ]
+        rows = api_data_collector.build_history_rows(symbols_data)
+        start = time.perf_counter()
+        if not api_data_collector.upload_rows_to_sql(rows):
+            raise RuntimeError("La subida falló")
+        timings.append(time.perf_counter() - start)
+        records += len(rows)
+    return records, timings
+
+
+def run_child(args):
+    """
+    Ejecuta un escenario en este proceso e imprime el resultado en JSON.
+    """
+    scenario = globals()[f"scenario_{args.child}"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        records, timings = scenario(args)
+        total = time.perf_counter() - start
+    busy = sum(timings)
+    print(json.dumps({
+        "scenario": args.child,
+        "records": records,
+        "operations": len(timings),
+        "seconds": busy,
+        "wall_seconds": total,
+        "throughput": records / busy if busy > 0 else 0.0,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "sin-git"
+
+
+def child_argv(args, scenario):
+    argv = [sys.executable, os.path.abspath(__file__), "--child", scenario,
+            "--rows", str(args.rows), "--tags", str(args.tags), "--encoding", args.encoding,
+            "--xlsx-rows", str(args.xlsx_rows), "--latency", str(args.latency),
+            "--db-latency", str(args.db_latency), "--scans", str(args.scans),
+            "--repeat", str(args.repeat), "--data-dir", args.data_dir]
+    if args.dsn:
+        argv += ["--dsn", args.dsn]
+    return argv
+
+
+def print_results(results):
+    print(f"{'escenario':<16} {'registros':>10} {'reg/s':>12} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'RSS MB':>8}")
+    for r in results:
+        print(f"{r['scenario']:<16} {r['records']:>10} {r['throughput']:>12,.0f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {_format_rss(r['peak_rss_mb'])}")
+
+
+def load_results(reference):
+    path = reference if os.path.exists(reference) else os.path.join(RESULTS_DIR, f"{reference}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_comparison(baseline, results):
+    print(f"\nComparación con {baseline['revision']} (>1 = mejor en reg/s; <1 = mejor en p95 y RSS):")
+    previous = {r["scenario"]: r for r in baseline["results"]}
+    for r in results:
+        old = previous.get(r["scenario"])
+        if not old:
+            print(f"{r['scenario']:<16} sin referencia")
+            continue
+        speed = r["throughput"] / old["throughput"] if old["throughput"] else float("nan")
+        p95 = r["p95_ms"] / old["p95_ms"] if old["p95_ms"] else float("nan")
+        rss = r["peak_rss_mb"] / old["peak_rss_mb"] if old["peak_rss_mb"] and r["peak_rss_mb"] else float("nan")
+        print(f"{r['scenario']:<16} reg/s x{speed:.2f}   p95 x{p95:.2f}   RSS x{rss:.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de lectura, recolección y subida.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Escenarios separados por comas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--rows", type=int, default=50_000, help="Filas del CSV sintético")
+    parser.add_argument("--tags", type=int, default=6, help="Tags (pares de columnas) del CSV sintético")
+    parser.add_argument("--encoding", default="utf-8-sig", help="Codificación del CSV sintético")
+    parser.add_argument("--xlsx-rows", type=int, default=20_000, help="Filas del XLSX sintético")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latencia por petición de la API (s)")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Latencia por sentencia del sumidero (s)")
+    parser.add_argument("--scans", type=int, default=50, help="Escaneos en los escenarios de la API")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de lectura y subida de archivos")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_DSN"),
+                        help="PostgreSQL real en lugar del sumidero en memoria")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "opc-bench-data"),
+                        help="Carpeta donde se generan y reutilizan los datos sintéticos")
+    parser.add_argument("--save", action="store_true", help="Guardar en benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="Commit o archivo JSON con el que comparar")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        if args.dsn:
+            os.environ["DATABASE_DSN"] = args.dsn
+        run_child(args)
+        return 0
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"Escenarios desconocidos: {', '.join(unknown)}")
+        return 2
+
+    revision = git_revision()
+    print(f"Revisión {revision}; CSV {args.tags} tags x {args.rows} filas, XLSX {args.xlsx_rows} filas, "
+          f"latencia API {args.latency * 1000:.0f} ms, BD {'PostgreSQL' if args.dsn else 'en memoria'}")
+
+    results = []
+    for scenario in scenarios:
+        completed = subprocess.run(child_argv(args, scenario), cwd=ROOT, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{scenario}: FALLO\n{completed.stderr.strip()}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    print_results(results)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{revision}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"revision": revision, "parameters": {k: v for k, v in vars(args).items()
+                                                            if k not in ("child", "dsn", "save", "compare")},
+                       "results": results}, f, indent=2)
+        print(f"Resultados guardados en {path}")
+
+    if args.compare:
+        print_comparison(load_results(args.compare), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark: parse_timestamp original (strptime) frente a TimestampParser.
+
+Uso: python benchmarks/bench_timestamps.py [filas]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timestamp_parser import TimestampParser, _parse_with_format
+
+VARIABLES_PER_ROW = 6
+
+
+def legacy_parse_timestamp(timestamp_str):
+    """
+    Implementación original de main.parse_timestamp.
+    """
+    try:
+        dt = datetime.strptime(timestamp_str, "%d/%m/%Y %H:%M:%S")
+        return dt.isoformat()
+    except ValueError:
+        try:
+            dt = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
+            return dt.isoformat()
+        except ValueError:
+            print(f"Warning: No se pudo parsear el timestamp: {timestamp_str}")
+            return timestamp_str
+
+
+def make_timestamps(rows):
+    """
+    Genera los timestamps como en un EXPORT.csv: varias filas por segundo.
+    """
+    start = datetime(2025, 6, 26, 15, 0, 0)
+    return [(start + timedelta(milliseconds=250 * i)).strftime("%d/%m/%Y %H:%M:%S") for i in range(rows)]
+
+
+def run(label, parse, timestamps):
+    start = time.perf_counter()
+    for timestamp_str in timestamps:
+        for _ in range(VARIABLES_PER_ROW):
+            parse(timestamp_str)
+    elapsed = time.perf_counter() - start
+    total = len(timestamps) * VARIABLES_PER_ROW
+    print(f"{label:<28} {elapsed:8.3f} s  {total / elapsed:12,.0f} timestamps/s")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    timestamps = make_timestamps(rows)
+    print(f"{rows} filas x {VARIABLES_PER_ROW} variables")
+
+    legacy = run("strptime (original)", legacy_parse_timestamp, timestamps)
+
+    _parse_with_format.cache_clear()
+    parsers = [TimestampParser() for _ in range(VARIABLES_PER_ROW)]
+    start = time.perf_counter()
+    for timestamp_str in timestamps:
+        for parser in parsers:
+            parser.parse(timestamp_str)
+    elapsed = time.perf_counter() - start
+    total = len(timestamps) * VARIABLES_PER_ROW
+    print(f"{'TimestampParser':<28} {elapsed:8.3f} s  {total / elapsed:12,.0f} timestamps/s")
+
+    run("ruta rápida sin caché", lambda s: _parse_with_format.__wrapped__(s, 0), timestamps)
+
+    print(f"Mejora con TimestampParser: x{legacy / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
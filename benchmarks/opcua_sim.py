@@ -0,0 +1,210 @@
+"""
+Servidor OPC UA de simulación (asyncua) con los tags de la línea de chocolatinas
+y de la cafetera, para probar el backend de suscripción sin un PLC.
+
+Los tags salen del registro (tags.json): los de la línea de chocolatinas y
+los de SYMBOLS_CONFIG. Cada NodeId es ns=<idx>;s="<símbolo>", como en un
+S7-1500. Los valores cambian solos: los Bool se conmutan, los Real derivan
+y los enteros cuentan.
+
+Uso:
+  python benchmarks/opcua_sim.py                  # sirve en opc.tcp://127.0.0.1:4840
+  python benchmarks/opcua_sim.py --check 10       # servidor + OPCUASubscriber 10 s, sin base de datos
+
+Con el servidor en marcha, el recolector se prueba contra él con:
+  OPC_BACKEND=opcua OPCUA_ENDPOINT=opc.tcp://127.0.0.1:4840 OPCUA_NODE_ID_TEMPLATE='ns=3;s="{symbol}"' \\
+      python api_data_collector.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Como en un S7-1500, los tags del PLC quedan en el namespace 3
+NAMESPACES = ["urn:opc-python-wincc:simulation", "http://www.siemens.com/simatic-s7-opcua"]
+TICK = 0.1
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _variant_type(data_type):
+    from asyncua import ua
+
+    return {
+        "BOOL": ua.VariantType.Boolean,
+        "BYTE": ua.VariantType.Byte,
+        "INT": ua.VariantType.Int16,
+        "WORD": ua.VariantType.UInt16,
+        "DINT": ua.VariantType.Int32,
+        "REAL": ua.VariantType.Float,
+    }.get(data_type.upper(), ua.VariantType.Double)
+
+
+def _initial_value(variant_type):
+    from asyncua import ua
+
+    if variant_type == ua.VariantType.Boolean:
+        return False
+    if variant_type in (ua.VariantType.Float, ua.VariantType.Double):
+        return 50.0
+    return 0
+
+
+class SimulationServer:
+    """
+    Servidor asyncua con un nodo por tag y un bucle que modifica los valores.
+    """
+
+    def __init__(self, tags, endpoint, change_rate=0.1, seed=1):
+        self.tags = tags
+        self.endpoint = endpoint
+        self.change_rate = change_rate
+        self.rng = random.Random(seed)
+        self.namespace_index = None
+        self.writes = 0
+        self._server = None
+        self._variables = []
+
+    @property
+    def node_id_template(self):
+        return f'ns={self.namespace_index};s="{{symbol}}"'
+
+    async def start(self):
+        from asyncua import Server, ua
+
+        server = Server()
+        await server.init()
+        server.set_endpoint(self.endpoint)
+        server.set_server_name("opc-python-wincc simulation")
+        for uri in NAMESPACES:
+            self.namespace_index = await server.register_namespace(uri)
+
+        plc = await server.nodes.objects.add_object(self.namespace_index, "PLC_1")
+        for tag in self.tags:
+            variant_type = _variant_type(tag.data_type)
+            node = await plc.add_variable(ua.NodeId(f'"{tag.symbol}"', self.namespace_index),
+                                          f"{self.namespace_index}:{tag.symbol}",
+                                          _initial_value(variant_type), varianttype=variant_type)
+            self._variables.append([node, variant_type, _initial_value(variant_type)])
+        await server.start()
+        self._server = server
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            await self._server.stop()
+            self._server = None
+
+    def _next_value(self, variant_type, value):
+        from asyncua import ua
+
+        if variant_type == ua.VariantType.Boolean:
+            return not value
+        if variant_type in (ua.VariantType.Float, ua.VariantType.Double):
+            return round(min(100.0, max(0.0, value + self.rng.uniform(-2.0, 2.0))), 2)
+        return (value + 1) % 32768
+
+    async def run(self):
+        """
+        Cambia en cada tick una fracción change_rate de los tags, con timestamp de origen.
+        """
+        from asyncua import ua
+
+        while True:
+            now = datetime.now(timezone.utc)
+            for variable in self._variables:
+                if self.rng.random() >= self.change_rate:
+                    continue
+                node, variant_type, value = variable
+                variable[2] = self._next_value(variant_type, value)
+                await node.write_value(ua.DataValue(ua.Variant(variable[2], variant_type),
+                                                    SourceTimestamp=now, ServerTimestamp=now))
+                self.writes += 1
+            await asyncio.sleep(TICK)
+
+
+async def check(server, seconds, deadband):
+    """
+    Suscribe OPCUASubscriber al servidor durante unos segundos y comprueba que
+    todos los tags de SYMBOLS_CONFIG notifican y se convierten en filas.
+    """
+    import metrics
+    from api_data_collector import SYMBOLS_CONFIG, build_history_rows, group_symbols_by_scan_class
+    from opcua_subscriber import OPCUASubscriber
+
+    metrics.enable()
+    rows = []
+    intervals = {"fast": 0.1, "normal": 0.5, "slow": 1.0}
+    subscriber = OPCUASubscriber(group_symbols_by_scan_class(), lambda data: rows.extend(build_history_rows(data)),
+                                 intervals, endpoint=server.endpoint, node_id_template=server.node_id_template,
+                                 deadband=deadband, flush_interval=0.5, reconnect_delay=1)
+    task = asyncio.create_task(subscriber.run())
+    await asyncio.sleep(seconds)
+    subscriber.stop()
+    await task
+
+    seen = {row[2] for row in rows}
+    missing = [c["symbol"] for c in SYMBOLS_CONFIG if c["symbol"] not in seen]
+    subscriber.report()
+    print(f"Escrituras en el servidor: {server.writes}; filas generadas: {len(rows)}")
+    for scan_class in intervals:
+        count = sum(child.value for values, child in metrics.OPCUA_NOTIFICATIONS.series() if values == (scan_class,))
+        print(f"  - Clase '{scan_class}': {count:g} notificaciones")
+    print(f"Retraso de notificación p50<={metrics.OPCUA_NOTIFICATION_DELAY_SECONDS.quantile(0.5) * 1000:g} ms, "
+          f"p95<={metrics.OPCUA_NOTIFICATION_DELAY_SECONDS.quantile(0.95) * 1000:g} ms")
+    if missing:
+        print(f"FALLO: tags sin notificaciones: {', '.join(missing)}")
+        return 1
+    print("OK: todos los tags de SYMBOLS_CONFIG notificaron")
+    return 0
+
+
+async def amain(args):
+    from tag_registry import get_registry
+
+    endpoint = args.endpoint or f"opc.tcp://127.0.0.1:{free_port() if args.check else 4840}"
+    server = SimulationServer(get_registry().tags, endpoint, change_rate=args.change_rate)
+    await server.start()
+    print(f"Servidor de simulación en {endpoint} con {len(server.tags)} tags "
+          f"(OPCUA_NODE_ID_TEMPLATE='{server.node_id_template}')")
+    simulation = asyncio.create_task(server.run())
+    try:
+        if args.check:
+            return await check(server, args.check, args.deadband)
+        await asyncio.Event().wait()
+    finally:
+        simulation.cancel()
+        await server.stop()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor OPC UA de simulación con los tags del registro.")
+    parser.add_argument("--endpoint", help="Endpoint a servir (por defecto opc.tcp://127.0.0.1:4840)")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="Fracción de tags que cambian en cada tick")
+    parser.add_argument("--check", type=float, default=0,
+                        help="Segundos de prueba del backend de suscripción (0 = solo servir)")
+    parser.add_argument("--deadband", type=float, default=0.5, help="Banda muerta absoluta de los Real en --check")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        code = asyncio.run(amain(args))
+    except KeyboardInterrupt:
+        code = 0
+    print(f"Duración: {time.perf_counter() - start:.1f} s")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
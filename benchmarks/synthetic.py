@@ -0,0 +1,253 @@
+"""
+Datos sintéticos y sustitutos locales para los benchmarks.
+
+- write_wincc_csv: CSV de WinCC separado por ';' con pares (timestamp, valor) por tag.
+- write_tags_xlsx: exportación de tags con las columnas de REPORTS_V2.xlsx.
+- StubOPCServer: API OPC local (/get-variable y /get-variables) con latencia configurable.
+- FakeConnection / FakePool: sumidero DB-API que acepta COPY e INSERT sin servidor.
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Tags del EXPORT.csv real; si se piden más se añaden Tag0001, Tag0002...
+WINCC_TAGS = ["MotorVerdesIn", "MotorRojosIn", "MotorMoradosIn", "MotorMoradosOut",
+              "Repeticiones", "CiclosTerminados"]
+WORD_TAGS = ("Repeticiones", "CiclosTerminados")
+
+
+def tag_names(count):
+    names = WINCC_TAGS[:count]
+    names += [f"Tag{i:04d}" for i in range(1, count - len(names) + 1)]
+    return names
+
+
+def write_wincc_csv(path, tags=6, rows=100_000, encoding="utf-8-sig", seed=1, rows_per_second=4):
+    """
+    Escribe un CSV como los de WinCC: "Tag";"Tag_valor" en la cabecera y
+    "dd/mm/aaaa hh:mm:ss";"valor" por cada tag en cada fila.
+    """
+    rng = random.Random(seed)
+    names = tag_names(tags)
+    start = datetime(2025, 6, 26, 15, 0, 0)
+    counters = {name: 0 for name in names}
+
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write(";".join(f'"{name}";"{name}_valor"' for name in names) + "\r\n")
+        for i in range(rows):
+            timestamp = (start + timedelta(seconds=i // rows_per_second)).strftime("%d/%m/%Y %H:%M:%S")
+            fields = []
+            for name in names:
+                if name in WORD_TAGS:
+                    counters[name] += rng.random() < 0.1
+                    value = counters[name]
+                else:
+                    value = int(rng.random() < 0.5)
+                fields.append(f'"{timestamp}";"{value}"')
+            f.write(";".join(fields) + "\r\n")
+    return path
+
+
+def write_tags_xlsx(path, rows=50_000, seed=1):
+    """
+    Escribe una exportación de tags con las columnas Name, Path, Data Type, Logical Address y Comment.
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Tags")
+    sheet.append(["Name", "Path", "Data Type", "Logical Address", "Comment", "Retain"])
+    for i in range(rows):
+        kind = rng.choice(("Bool", "Bool", "Int", "Real"))
+        if kind == "Bool":
+            address = f"%{rng.choice('IQ')}{i // 8 % 64}.{i % 8}"
+        else:
+            address = f"%{rng.choice(('IW', 'MW'))}{2 * (i % 1024)}"
+        sheet.append([f"Tag{i:05d}", f"PLC_{i // 1000}.Tabla de variables", kind, address,
+                      f"Variable sintética {i}", "False"])
+    workbook.save(path)
+    return path
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StubOPC/1.0"
+
+    def _reply(self, status, body=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        stub.record_request()
+        if stub.latency:
+            time.sleep(stub.latency + stub.jitter * stub.rng.random())
+
+        if url.path.endswith("/get-variables"):
+            if not stub.batch:
+                self._reply(404, {"success": False, "error": "Not found"})
+                return
+            names = parse_qs(url.query).get("names", [""])[0].split(",")
+            self._reply(200, {"success": True,
+                              "variables": {name: stub.value_for(name) for name in names if name}})
+        elif "/get-variable/" in url.path:
+            name = unquote(url.path.rsplit("/", 1)[-1])
+            self._reply(200, dict(success=True, **stub.value_for(name)))
+        else:
+            self._reply(404, {"success": False, "error": "Not found"})
+
+    def log_message(self, *args):
+        pass
+
+
+class StubOPCServer:
+    """
+    API OPC local para pruebas de rendimiento.
+
+    latency y jitter (segundos) se añaden a cada petición; batch=False simula un
+    servidor sin el endpoint de lotes.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, batch=True, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.batch = batch
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def value_for(self, name):
+        if "." in name or name.startswith("%I") or name.startswith("%Q"):
+            return {"value": self.rng.random() < 0.5, "data_type": "Bool"}
+        return {"value": round(self.rng.uniform(0, 100), 2), "data_type": "Real"}
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name="stub-opc", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def _returned_columns(query, rows):
+    # Deja de cada fila insertada solo las columnas de RETURNING, como el servidor
+    columns = [c.strip().strip('"') for c in query.split("(", 1)[1].split(")", 1)[0].split(",")]
+    returning = [c.strip().strip('"') for c in query.rsplit("RETURNING", 1)[1].split(",")]
+    positions = [columns.index(c) for c in returning]
+    return [tuple(row[i] for i in positions) for row in rows]
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self._staged = []
+
+    def execute(self, query, args=None, stream=None):
+        connection = self.connection
+        if connection.latency:
+            time.sleep(connection.latency)
+        connection.statements += 1
+        self._rows = []
+        if stream is not None:
+            data = stream.read()
+            connection.bytes_received += len(data)
+            connection.rows_received += data.count(b"\n")
+            # La fusión posterior desde staging "inserta" justo estas filas
+            self._staged = [tuple(None if v == "\\N" else v for v in line.split("\t"))
+                            for line in data.decode("utf-8").splitlines()]
+        elif args and query.lstrip().upper().startswith(("INSERT", "WITH")):
+            row_count = max(1, query.count("), (") + 1)
+            connection.rows_received += row_count
+            width = len(args) // row_count
+            self._rows = [tuple(args[i:i + width]) for i in range(0, len(args), width)]
+        upper = query.upper()
+        if "RETURNING ID" in upper:
+            self._rows = [(connection.statements,)]
+        elif "RETURNING" in upper and upper.lstrip().startswith("INSERT"):
+            self._rows = _returned_columns(query, self._rows if args else self._staged)
+        elif not upper.lstrip().startswith("WITH"):
+            self._rows = []
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """
+    Conexión DB-API mínima que descarta los datos y cuenta filas, sentencias y bytes.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.statements = 0
+        self.rows_received = 0
+        self.bytes_received = 0
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """
+    Sustituto de database.sql_pool con la misma interfaz (checkout, run, close).
+    """
+
+    def __init__(self, latency=0.0):
+        self.connection = FakeConnection(latency)
+
+    def checkout(self):
+        from contextlib import nullcontext
+        return nullcontext(self.connection)
+
+    def run(self, operation, retries=1):
+        return operation(self.connection)
+
+    def close(self):
+        pass
@@ -0,0 +1,360 @@
+import threading
+from bulk_writer import execute_sorted_upsert
+from normalized_schema import BOOL_TYPES, typed_value
+
+IMAGES_TABLE = "module_bit_images"
+BIT_MAP_TABLE = "module_bit_map"
+
+# Módulo -> (área, bytes): DI16xDC24V son 16 bits (I 0.0..I 1.7), DO8xDC24V_2A 8 bits (Q 0.0..Q 0.7)
+MODULE_LAYOUTS = {
+    'DI16xDC24V': ('I', 2),
+    'DO8xDC24V_2A': ('Q', 1),
+}
+
+IMAGE_COLUMNS = ("module", "timestamp", "bits", "present")
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _address_key(address):
+    # 'I 0.0', 'I0.0' y '%I0.0' son la misma dirección
+    return str(address).replace(' ', '').lstrip('%').upper()
+
+
+def bit_addresses(module):
+    """
+    Direcciones de los bits del módulo en orden de bit ('I 0.0', 'I 0.1', ...).
+    """
+    area, byte_count = MODULE_LAYOUTS[module]
+    return tuple(f"{area} {byte}.{bit}" for byte in range(byte_count) for bit in range(8))
+
+
+# (módulo, dirección normalizada) -> número de bit
+_BIT_INDEX = {
+    (module, _address_key(address)): bit
+    for module in MODULE_LAYOUTS
+    for bit, address in enumerate(bit_addresses(module))
+}
+
+
+def bit_for(module, address):
+    """
+    Número de bit de la dirección dentro de la imagen del módulo, o None si no se empaqueta.
+    """
+    return _BIT_INDEX.get((module, _address_key(address)))
+
+
+def pack(module, values):
+    """
+    Empaqueta pares (dirección, bool) en (bits, present).
+
+    present marca los bits que tienen valor en esta muestra; el resto no se conoce.
+    """
+    bits = present = 0
+    for address, value in values:
+        bit = bit_for(module, address)
+        if bit is None:
+            raise ValueError(f"{address} no es una dirección de {module}")
+        mask = 1 << bit
+        present |= mask
+        bits = bits | mask if value else bits & ~mask
+    return bits, present
+
+
+def unpack(module, bits, present=None):
+    """
+    Devuelve [(dirección, bool)] de los bits presentes en la imagen del módulo.
+    """
+    addresses = bit_addresses(module)
+    if present is None:
+        present = (1 << len(addresses)) - 1
+    return [(address, bool(bits >> bit & 1))
+            for bit, address in enumerate(addresses) if present >> bit & 1]
+
+
+def _bit_columns_sql(module):
+    return ",\n        ".join(
+        f'(bits >> {bit} & 1) = 1 AS "{address.replace(" ", "").replace(".", "_").lower()}"'
+        for bit, address in enumerate(bit_addresses(module))
+    )
+
+
+def _schema_queries():
+    queries = [
+        f"""
+        CREATE TABLE IF NOT EXISTS {IMAGES_TABLE} (
+            module VARCHAR(255) NOT NULL,
+            "timestamp" TIMESTAMPTZ NOT NULL,
+            bits INTEGER NOT NULL,
+            present INTEGER NOT NULL,
+            PRIMARY KEY (module, "timestamp")
+        );
+        """,
+        f"CREATE INDEX IF NOT EXISTS {IMAGES_TABLE}_timestamp_idx ON {IMAGES_TABLE} USING BRIN (\"timestamp\");",
+        f"""
+        CREATE TABLE IF NOT EXISTS {BIT_MAP_TABLE} (
+            module VARCHAR(255) NOT NULL,
+            bit SMALLINT NOT NULL,
+            address VARCHAR(255) NOT NULL,
+            symbol VARCHAR(255),
+            PRIMARY KEY (module, bit)
+        );
+        """,
+        # Un bit por fila, solo los que tienen valor en la muestra
+        f"""
+        CREATE OR REPLACE VIEW module_bit_samples AS
+        SELECT i.module, m.bit, m.address, m.symbol, i."timestamp", (i.bits >> m.bit & 1) = 1 AS value
+        FROM {IMAGES_TABLE} i
+        JOIN {BIT_MAP_TABLE} m ON m.module = i.module
+        WHERE (i.present >> m.bit & 1) = 1;
+        """,
+        # Mismas columnas que la tabla ancha de históricos, para poder unirlas
+        """
+        CREATE OR REPLACE VIEW module_bit_history AS
+        SELECT module, address, symbol, 'BOOL'::VARCHAR(50) AS data_type, ''::TEXT AS comment,
+               CASE WHEN value THEN 'true' ELSE 'false' END AS value, "timestamp"
+        FROM module_bit_samples;
+        """,
+    ]
+    # Una columna booleana por dirección para cada módulo (i0_0, i0_1, ...)
+    for module in MODULE_LAYOUTS:
+        queries.append(f"""
+        CREATE OR REPLACE VIEW {module.lower()}_bits AS
+        SELECT "timestamp", bits, present,
+        {_bit_columns_sql(module)}
+        FROM {IMAGES_TABLE}
+        WHERE module = '{module}';
+        """)
+    return queries
+
+
+def ensure_bit_image_tables(connection):
+    """
+    Crea la tabla de imágenes, el mapa de bits y las vistas una sola vez por proceso.
+    """
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        cursor = connection.cursor()
+        try:
+            for query in _schema_queries():
+                cursor.execute(query)
+        finally:
+            cursor.close()
+        connection.commit()
+        _schema_ready = True
+
+
+def _upsert_images_query(row_count):
+    placeholders = "(%s, %s, %s, %s)"
+    return f"""
+    INSERT INTO {IMAGES_TABLE} (module, "timestamp", bits, present)
+    VALUES {", ".join([placeholders] * row_count)}
+    ON CONFLICT (module, "timestamp") DO UPDATE SET
+        bits = ({IMAGES_TABLE}.bits & ~EXCLUDED.present) | EXCLUDED.bits,
+        present = {IMAGES_TABLE}.present | EXCLUDED.present
+    """
+
+
+def _upsert_images_returning_query(row_count):
+    """
+    Como _upsert_images_query, pero devuelve por imagen los bits que no estaban
+    ya guardados (new_present), para no contar dos veces una recarga.
+    """
+    placeholders = "(%s, %s::timestamptz, %s::integer, %s::integer)"
+    return f"""
+    WITH incoming (module, "timestamp", bits, present) AS (
+        VALUES {", ".join([placeholders] * row_count)}
+    ),
+    -- Misma instantánea que el upsert: son las imágenes tal como estaban antes de él
+    previous AS (
+        SELECT i.module, i."timestamp", i.present
+        FROM {IMAGES_TABLE} i
+        JOIN incoming n ON n.module = i.module AND n."timestamp" = i."timestamp"
+    ),
+    upserted AS (
+        INSERT INTO {IMAGES_TABLE} (module, "timestamp", bits, present)
+        SELECT module, "timestamp", bits, present FROM incoming
+        ON CONFLICT (module, "timestamp") DO UPDATE SET
+            bits = ({IMAGES_TABLE}.bits & ~EXCLUDED.present) | EXCLUDED.bits,
+            present = {IMAGES_TABLE}.present | EXCLUDED.present
+    )
+    SELECT n.module, n."timestamp", n.bits, n.present & ~COALESCE(p.present, 0) AS new_present
+    FROM incoming n
+    LEFT JOIN previous p ON p.module = n.module AND p."timestamp" = n."timestamp"
+    """
+
+
+def _upsert_bit_map_query(row_count):
+    return f"""
+    INSERT INTO {BIT_MAP_TABLE} (module, bit, address, symbol)
+    VALUES {", ".join(["(%s, %s, %s, %s)"] * row_count)}
+    ON CONFLICT (module, bit) DO UPDATE SET address = EXCLUDED.address, symbol = EXCLUDED.symbol
+    """
+
+
+def read_module_images(connection, module, start=None, end=None):
+    """
+    Genera (timestamp, {dirección: bool}) de las imágenes del módulo entre start y end.
+    """
+    query = f'SELECT "timestamp", bits, present FROM {IMAGES_TABLE} WHERE module = %s'
+    args = [module]
+    if start is not None:
+        query += ' AND "timestamp" >= %s'
+        args.append(start)
+    if end is not None:
+        query += ' AND "timestamp" < %s'
+        args.append(end)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query + ' ORDER BY "timestamp"', args)
+        for timestamp, bits, present in cursor.fetchall():
+            yield timestamp, dict(unpack(module, bits, present))
+    finally:
+        cursor.close()
+
+
+class PackedBoolWriter:
+    """
+    Envoltorio de un escritor de históricos que guarda los BOOL de las tarjetas
+    de E/S digitales como una imagen de bits por módulo y timestamp.
+
+    Las filas de DI16xDC24V y DO8xDC24V_2A con tipo booleano y dirección de la
+    tarjeta se agrupan en (bits, present); el resto pasa al escritor envuelto.
+    Las imágenes se envían cada batch_size filas y antes de cada commit, y si
+    un mismo timestamp llega en dos lotes los bits se combinan en la tabla.
+    on_inserted recibe las filas del escritor envuelto que entraron y, como
+    filas BOOL, los bits que no estaban ya en su imagen. Como los ids de
+    NormalizedHistoryWriter, las entradas del mapa de bits enviadas solo pasan
+    a la caché compartida tras el commit y se descartan con un rollback.
+    """
+
+    # (módulo, bit) -> (dirección, símbolo) ya confirmados en el mapa de bits
+    _mapped = {}
+    _mapped_lock = threading.Lock()
+
+    def __init__(self, writer, connection, batch_size):
+        ensure_bit_image_tables(connection)
+        self.writer = writer
+        self.connection = connection
+        self.batch_size = batch_size
+        self.packed_rows = 0
+        self.images_written = 0
+        self._images = {}
+        # Entradas del mapa de bits nuevas desde el último envío, y las ya enviadas en esta transacción
+        self._bit_map = {}
+        self._bit_map_sent = {}
+        self._pending_rows = 0
+        # (módulo, bit) -> (dirección, símbolo, tipo, comentario) para rehacer las filas de los bits nuevos
+        self._bit_rows = {}
+        self._on_inserted = None
+
+    @property
+    def rows_written(self):
+        return self.writer.rows_written + self.images_written
+
+    @property
+    def on_inserted(self):
+        return self._on_inserted
+
+    @on_inserted.setter
+    def on_inserted(self, callback):
+        self._on_inserted = callback
+        self.writer.on_inserted = callback
+
+    def _bits_inserted(self, images):
+        rows = []
+        for module, timestamp, bits, new_present in images:
+            for bit in range(len(bit_addresses(module))):
+                if new_present >> bit & 1 and (module, bit) in self._bit_rows:
+                    address, symbol, data_type, comment = self._bit_rows[(module, bit)]
+                    rows.append((module, address, symbol, data_type, comment,
+                                 'true' if bits >> bit & 1 else 'false', timestamp))
+        self._on_inserted(rows)
+
+    def write(self, row):
+        module, address, symbol, data_type, comment, value, timestamp = row
+        bit = bit_for(module, address) if module in MODULE_LAYOUTS else None
+        value_bool = typed_value(value, 'BOOL')[0] if bit is not None else None
+        if value_bool is None or (data_type or '').upper() not in BOOL_TYPES:
+            self.writer.write(row)
+            return
+
+        image = self._images.get((module, timestamp))
+        if image is None:
+            image = self._images[(module, timestamp)] = [0, 0]
+        mask = 1 << bit
+        image[0] = image[0] | mask if value_bool else image[0] & ~mask
+        image[1] |= mask
+        if self._on_inserted is not None:
+            self._bit_rows[(module, bit)] = (address, symbol, data_type, comment)
+        entry = (address, symbol)
+        if self._bit_map_sent.get((module, bit)) != entry and self._mapped.get((module, bit)) != entry:
+            self._bit_map[(module, bit)] = entry
+
+        self.packed_rows += 1
+        self._pending_rows += 1
+        if self._pending_rows >= self.batch_size:
+            self._flush_images()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def _flush_images(self):
+        if not self._images and not self._bit_map:
+            return
+        cursor = self.connection.cursor()
+        try:
+            execute_sorted_upsert(cursor, _upsert_bit_map_query,
+                                  [(module, bit, address, symbol)
+                                   for (module, bit), (address, symbol) in self._bit_map.items()])
+            images = [(module, timestamp, bits, present)
+                      for (module, timestamp), (bits, present) in self._images.items()]
+            if self._on_inserted is not None:
+                self._bits_inserted(execute_sorted_upsert(cursor, _upsert_images_returning_query, images,
+                                                          fetch=True))
+            else:
+                execute_sorted_upsert(cursor, _upsert_images_query, images)
+        finally:
+            cursor.close()
+        self.images_written += len(self._images)
+        self._images = {}
+        self._bit_map_sent.update(self._bit_map)
+        self._bit_map = {}
+        self._pending_rows = 0
+
+    def flush(self):
+        self.writer.flush()
+        self._flush_images()
+
+    def commit(self):
+        self.writer.flush()
+        self._flush_images()
+        self.writer.commit()
+        if self._bit_map_sent:
+            with self._mapped_lock:
+                self._mapped.update(self._bit_map_sent)
+            self._bit_map_sent = {}
+
+    def report(self):
+        self.writer.report()
+        if self.packed_rows:
+            print(f"Empaquetadas {self.packed_rows} muestras booleanas en {self.images_written} imágenes de bits")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            # Lo enviado en esta transacción se pierde con el rollback
+            self._images = {}
+            self._bit_map = {}
+            self._bit_map_sent = {}
+            self._pending_rows = 0
+            self.writer.__exit__(exc_type, exc, tb)
+        return False
@@ -0,0 +1,302 @@
+import io
+import time
+import metrics
+from config import config
+
+HISTORY_TABLE = "chocolatin_variables_history"
+HISTORY_COLUMNS = ("module", "address", "symbol", "data_type", "comment", "value", "timestamp")
+# Clave natural de una muestra: un valor por módulo, símbolo e instante
+HISTORY_KEY = ("module", "symbol", "timestamp")
+# Columnas que devuelve RETURNING para los agregados (el resto es fijo por símbolo)
+HISTORY_RETURNING = ("module", "symbol", "value", "timestamp")
+
+# PostgreSQL admite como máximo 32767 parámetros por sentencia
+MAX_QUERY_PARAMETERS = 32767
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _copy_escape(value):
+    """
+    Serializa un valor al formato de texto de COPY (tabuladores y \\N para NULL).
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    text = str(value)
+    if any(c in text for c in "\\\t\n\r"):
+        text = (text.replace("\\", "\\\\")
+                    .replace("\t", "\\t")
+                    .replace("\n", "\\n")
+                    .replace("\r", "\\r"))
+    return text
+
+
+def execute_sorted_upsert(cursor, build_query, rows, key=None, fetch=False):
+    """
+    Envía las filas con INSERT ... ON CONFLICT multi-fila, en trozos que no
+    superan MAX_QUERY_PARAMETERS. build_query(n) devuelve la sentencia para n filas.
+
+    Las filas se ordenan por clave (key) antes de enviarlas: dos transacciones
+    que actualizan las mismas filas las bloquean en el mismo orden y no se
+    interbloquean. Con fetch=True devuelve las filas que devolvió cada sentencia.
+    """
+    fetched = []
+    if not rows:
+        return fetched
+    rows = sorted(rows, key=key)
+    chunk_size = max(1, MAX_QUERY_PARAMETERS // len(rows[0]))
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        cursor.execute(build_query(len(chunk)), [value for row in chunk for value in row])
+        if fetch:
+            fetched.extend(cursor.fetchall())
+    return fetched
+
+
+def _rowcount(cursor):
+    count = getattr(cursor, "rowcount", -1)
+    return count if count is not None and count >= 0 else None
+
+
+class BulkWriter:
+    """
+    Escritor por lotes para la tabla de históricos.
+
+    Acumula filas en memoria y las envía en lotes usando COPY FROM STDIN.
+    Si el servidor o el driver no admiten COPY, se usa un INSERT multi-fila.
+
+    Con conflict_key (columnas de un índice único) la carga no duplica filas:
+    el COPY va a una tabla temporal de staging que se fusiona con
+    INSERT ... ON CONFLICT DO NOTHING, y el INSERT multi-fila lleva la misma
+    cláusula. Las filas descartadas se cuentan en rows_skipped.
+
+    Si se asigna on_inserted, se llama en cada lote con las filas que de verdad
+    entraron en la tabla (con conflict_key, las que devuelve RETURNING), para
+    que lo que se deriva de ellas (agregados) no cuente dos veces una recarga.
+    RETURNING trae solo las columnas de returning (por defecto, todas); las
+    demás llegan a on_inserted como None, para no devolver el lote entero.
+    """
+
+    def __init__(self, connection, table_name=HISTORY_TABLE, columns=HISTORY_COLUMNS,
+                 batch_size=None, commit_interval=None, use_copy=None, conflict_key=None,
+                 returning=None):
+        self.connection = connection
+        self.table_name = table_name
+        self.columns = tuple(columns)
+        self.batch_size = batch_size or config.SQL_BULK_BATCH_SIZE
+        # Número de filas entre commits (0 = un solo commit al cerrar)
+        self.commit_interval = config.SQL_BULK_COMMIT_INTERVAL if commit_interval is None else commit_interval
+        self._copy_supported = None if (config.SQL_BULK_USE_COPY if use_copy is None else use_copy) else False
+
+        self._buffer = []
+        self._rows_since_commit = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.batches_written = 0
+        self._elapsed = 0.0
+
+        column_list = ", ".join(_quote_identifier(c) for c in self.columns)
+        self._copy_query = f"COPY {self.table_name} ({column_list}) FROM STDIN"
+        self._insert_prefix = f"INSERT INTO {self.table_name} ({column_list}) VALUES "
+        self._row_placeholder = "(" + ", ".join(["%s"] * len(self.columns)) + ")"
+        self._on_conflict = ""
+        returning = tuple(returning or self.columns)
+        self._returning = " RETURNING " + ", ".join(_quote_identifier(c) for c in returning)
+        # Posición de cada columna devuelta en la fila completa (None si son todas, en orden)
+        self._returning_positions = (None if returning == self.columns
+                                     else [self.columns.index(c) for c in returning])
+        self._stage_queries = None
+        self.on_inserted = None
+
+        if conflict_key:
+            key_list = ", ".join(_quote_identifier(c) for c in conflict_key)
+            self._on_conflict = f" ON CONFLICT ({key_list}) DO NOTHING"
+            # Tabla temporal de la sesión con las mismas columnas, sin restricciones
+            stage_table = f"{self.table_name}_stage"
+            self._copy_query = f"COPY {stage_table} ({column_list}) FROM STDIN"
+            self._stage_queries = (
+                f"CREATE TEMP TABLE IF NOT EXISTS {stage_table} AS "
+                f"SELECT {column_list} FROM {self.table_name} WITH NO DATA",
+                f"INSERT INTO {self.table_name} ({column_list}) "
+                f"SELECT {column_list} FROM {stage_table}{self._on_conflict}",
+                f"TRUNCATE {stage_table}",
+            )
+
+    @property
+    def mode(self):
+        return "COPY" if self._copy_supported is not False else "INSERT"
+
+    def write(self, row):
+        """
+        Añade una fila (tupla en el orden de las columnas) al lote actual.
+        """
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """
+        Envía el lote pendiente y hace commit si se alcanzó el intervalo.
+        """
+        if not self._buffer:
+            return
+
+        rows = self._buffer
+        self._buffer = []
+        mode = self.mode
+        start = time.perf_counter()
+
+        cursor = self.connection.cursor()
+        try:
+            if self._copy_supported is not False:
+                inserted = self._send_copy_with_fallback(cursor, rows)
+            else:
+                inserted = self._send_insert(cursor, rows)
+        finally:
+            cursor.close()
+
+        if self.on_inserted is not None:
+            # Sin clave de conflicto no se descarta nada: entraron todas
+            inserted_rows = rows if not self._on_conflict else inserted
+            self.on_inserted(inserted_rows)
+            inserted = len(inserted_rows)
+        # El driver puede no informar del número de filas (None): se asume que entraron todas
+        inserted = len(rows) if inserted is None else inserted
+        metrics.DB_BATCH_SECONDS.labels(mode).observe(time.perf_counter() - start)
+        metrics.DB_ROWS_WRITTEN.inc(inserted)
+        self.rows_written += inserted
+        self.rows_skipped += len(rows) - inserted
+        self.batches_written += 1
+        self._rows_since_commit += len(rows)
+
+        if self.commit_interval and self._rows_since_commit >= self.commit_interval:
+            with metrics.DB_COMMIT_SECONDS.time():
+                self.connection.commit()
+            self._rows_since_commit = 0
+
+        self._elapsed += time.perf_counter() - start
+
+    def commit(self):
+        """
+        Envía lo pendiente y confirma la transacción.
+        """
+        start = time.perf_counter()
+        self.flush()
+        with metrics.DB_COMMIT_SECONDS.time():
+            self.connection.commit()
+        self._rows_since_commit = 0
+        self._elapsed += time.perf_counter() - start
+
+    def rows_per_second(self):
+        if self._elapsed <= 0:
+            return 0.0
+        return self.rows_written / self._elapsed
+
+    def report(self):
+        """
+        Imprime el rendimiento de la carga.
+        """
+        print(f"Insertadas {self.rows_written} filas en {self.batches_written} lotes "
+              f"({self._elapsed:.2f} s, {self.rows_per_second():.0f} filas/s, modo {self.mode})")
+        if self.rows_skipped:
+            print(f"Omitidas {self.rows_skipped} filas que ya estaban en {self.table_name}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self._buffer = []
+        return False
+
+    def _send_copy_with_fallback(self, cursor, rows):
+        if self._copy_supported:
+            return self._send_copy(cursor, rows)
+
+        from pg8000.exceptions import DatabaseError, InterfaceError
+
+        # Primer lote: probar COPY dentro de un savepoint para poder volver atrás
+        # sin perder lo que ya se ejecutó en la transacción.
+        cursor.execute("SAVEPOINT bulk_writer_copy")
+        try:
+            inserted = self._send_copy(cursor, rows)
+        except (DatabaseError, InterfaceError, NotImplementedError) as e:
+            print(f"COPY no disponible ({e}); usando INSERT multi-fila.")
+            cursor.execute("ROLLBACK TO SAVEPOINT bulk_writer_copy")
+            self._copy_supported = False
+            inserted = self._send_insert(cursor, rows)
+        else:
+            self._copy_supported = True
+        cursor.execute("RELEASE SAVEPOINT bulk_writer_copy")
+        return inserted
+
+    def _returns_rows(self):
+        return self.on_inserted is not None and bool(self._on_conflict)
+
+    def _returned_rows(self, cursor):
+        positions = self._returning_positions
+        if positions is None:
+            return [tuple(row) for row in cursor.fetchall()]
+        rows = []
+        for returned in cursor.fetchall():
+            row = [None] * len(self.columns)
+            for position, value in zip(positions, returned):
+                row[position] = value
+            rows.append(tuple(row))
+        return rows
+
+    def _send_copy(self, cursor, rows):
+        """
+        Envía las filas con COPY y devuelve cuántas se insertaron (None si no se sabe),
+        o la lista de filas insertadas si hay que avisar a on_inserted.
+        """
+        payload = "".join(
+            "\t".join(_copy_escape(value) for value in row) + "\n" for row in rows
+        )
+        if self._stage_queries is None:
+            cursor.execute(self._copy_query, stream=io.BytesIO(payload.encode("utf-8")))
+            return len(rows)
+
+        create_stage, merge, truncate_stage = self._stage_queries
+        cursor.execute(create_stage)
+        cursor.execute(self._copy_query, stream=io.BytesIO(payload.encode("utf-8")))
+        if self._returns_rows():
+            cursor.execute(merge + self._returning)
+            inserted = self._returned_rows(cursor)
+        else:
+            cursor.execute(merge)
+            inserted = _rowcount(cursor)
+        cursor.execute(truncate_stage)
+        return inserted
+
+    def _send_insert(self, cursor, rows):
+        """
+        Envía las filas con INSERT multi-fila y devuelve cuántas se insertaron (None si no se sabe),
+        o la lista de filas insertadas si hay que avisar a on_inserted.
+        """
+        returns_rows = self._returns_rows()
+        inserted = [] if returns_rows else 0
+        chunk_size = max(1, MAX_QUERY_PARAMETERS // len(self.columns))
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            query = self._insert_prefix + ", ".join([self._row_placeholder] * len(chunk)) + self._on_conflict
+            params = [value for row in chunk for value in row]
+            if returns_rows:
+                cursor.execute(query + self._returning, params)
+                inserted.extend(self._returned_rows(cursor))
+            else:
+                cursor.execute(query, params)
+                if inserted is not None:
+                    count = _rowcount(cursor) if self._on_conflict else len(chunk)
+                    inserted = None if count is None else inserted + count
+        return inserted
@@ -0,0 +1,112 @@
+import time
+from api_config import api_config
+
+
+class ChangeFilter:
+    """
+    Filtro de reporte por excepción entre la recolección y la subida.
+
+    Guarda el último valor escrito de cada símbolo y solo deja pasar las
+    lecturas que cambiaron según la regla de su tipo: cualquier cambio para
+    Bool/Int, y banda muerta absoluta y/o porcentual para Real. Si un símbolo
+    lleva max_silence segundos sin escribirse, se escribe igualmente
+    (latido) aunque no haya cambiado.
+    """
+
+    def __init__(self, real_deadband=0.0, real_deadband_percent=0.0, max_silence=300.0,
+                 converter=None, clock=time.monotonic):
+        self.real_deadband = real_deadband
+        self.real_deadband_percent = real_deadband_percent
+        self.max_silence = max_silence
+        self.converter = converter
+        self.clock = clock
+        # símbolo -> (último valor escrito, instante de la escritura)
+        self._last = {}
+        self.received = 0
+        self.passed = 0
+
+    @classmethod
+    def from_config(cls, converter=None):
+        return cls(
+            real_deadband=api_config.DEADBAND_REAL_ABS,
+            real_deadband_percent=api_config.DEADBAND_REAL_PERCENT,
+            max_silence=api_config.MAX_SILENCE,
+            converter=converter,
+        )
+
+    def _convert(self, value, data_type):
+        if self.converter:
+            return self.converter(value, data_type)
+        return value
+
+    def has_changed(self, data_type, previous, current):
+        """
+        Indica si el nuevo valor supera la regla de cambio del tipo de dato.
+        """
+        # Bool, Int y demás tipos discretos: cualquier cambio
+        if data_type != "Real":
+            return current != previous
+
+        try:
+            delta = abs(float(current) - float(previous))
+        except (TypeError, ValueError):
+            return current != previous
+
+        if self.real_deadband and delta > self.real_deadband:
+            return True
+        if self.real_deadband_percent:
+            reference = abs(float(previous))
+            if reference == 0:
+                return delta > 0
+            if delta * 100.0 / reference > self.real_deadband_percent:
+                return True
+        if not self.real_deadband and not self.real_deadband_percent:
+            return delta > 0
+        return False
+
+    def should_write(self, symbol_data, now=None):
+        """
+        Decide si la lectura de un símbolo debe subirse y actualiza la caché.
+        """
+        if not symbol_data.get("success") or symbol_data.get("value") is None:
+            return False
+
+        now = self.clock() if now is None else now
+        symbol = symbol_data.get("symbol")
+        data_type = symbol_data.get("data_type")
+        value = self._convert(symbol_data.get("value"), data_type)
+
+        last = self._last.get(symbol)
+        if last is not None:
+            previous, written_at = last
+            silent_for = now - written_at
+            if not self.has_changed(data_type, previous, value) and (
+                    not self.max_silence or silent_for < self.max_silence):
+                return False
+
+        self._last[symbol] = (value, now)
+        return True
+
+    def filter(self, symbols_data, now=None):
+        """
+        Devuelve solo las lecturas que deben subirse a la base de datos.
+        """
+        now = self.clock() if now is None else now
+        result = [symbol_data for symbol_data in symbols_data if self.should_write(symbol_data, now)]
+        self.received += len(symbols_data)
+        self.passed += len(result)
+        return result
+
+    def reset(self, symbol=None):
+        """
+        Olvida el último valor de un símbolo (o de todos) para forzar su escritura.
+        """
+        if symbol is None:
+            self._last.clear()
+        else:
+            self._last.pop(symbol, None)
+
+    def reduction_ratio(self):
+        if not self.passed:
+            return 0.0
+        return self.received / self.passed
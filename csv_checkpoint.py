@@ -0,0 +1,79 @@
+import json
+import os
+
+
+class FollowCheckpoint:
+    """
+    Punto de control persistente para el modo seguimiento (tail) del CSV.
+
+    Guarda el inodo y el offset en bytes ya procesado del archivo, la
+    codificación y cabeceras detectadas y el último timestamp por variable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.size = 0
+        self.encoding = None
+        self.headers = None
+        self.last_timestamps = {}
+
+    @classmethod
+    def load(cls, path):
+        checkpoint = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return checkpoint
+        except (OSError, ValueError) as e:
+            print(f"Warning: Checkpoint ilegible en {path}, se empieza desde el inicio: {e}")
+            return checkpoint
+
+        checkpoint.inode = data.get('inode')
+        checkpoint.offset = data.get('offset', 0)
+        checkpoint.size = data.get('size', 0)
+        checkpoint.encoding = data.get('encoding')
+        checkpoint.headers = data.get('headers')
+        checkpoint.last_timestamps = data.get('last_timestamps', {})
+        return checkpoint
+
+    def save(self):
+        """
+        Escribe el checkpoint de forma atómica (archivo temporal + rename).
+        """
+        data = {
+            'inode': self.inode,
+            'offset': self.offset,
+            'size': self.size,
+            'encoding': self.encoding,
+            'headers': self.headers,
+            'last_timestamps': self.last_timestamps,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_same_file(self, stat):
+        """
+        Indica si el archivo es el mismo que se procesó y no fue truncado.
+        """
+        if self.inode is None:
+            return False
+        return stat.st_ino == self.inode and stat.st_size >= self.offset
+
+    def reset(self, stat):
+        """
+        Reinicia la lectura desde el principio (archivo nuevo, rotado o truncado).
+
+        Se conservan los últimos timestamps para no reinsertar datos ya cargados.
+        """
+        self.inode = stat.st_ino
+        self.offset = 0
+        self.size = stat.st_size
+        self.encoding = None
+        self.headers = None
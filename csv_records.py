@@ -0,0 +1,77 @@
+import codecs
+from tag_registry import get_registry
+
+
+def stream_codec(encoding, head):
+    """
+    Devuelve (codec, bytes de salto de línea, longitud del BOM) para leer el archivo por offsets.
+    """
+    codec = codecs.lookup(encoding).name
+    if codec == 'utf-16':
+        codec = 'utf-16-be' if head.startswith(codecs.BOM_UTF16_BE) else 'utf-16-le'
+        bom_length = 2 if head[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 0
+    elif codec == 'utf-32':
+        codec = 'utf-32-be' if head.startswith(codecs.BOM_UTF32_BE) else 'utf-32-le'
+        bom_length = 4 if head[:4] in (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE) else 0
+    elif codec == 'utf-8-sig':
+        codec = 'utf-8'
+        bom_length = 3 if head.startswith(codecs.BOM_UTF8) else 0
+    else:
+        bom_length = 0
+    return codec, '\n'.encode(codec), bom_length
+
+
+def build_variable_mapping(headers):
+    """
+    Crea un mapeo de pares (timestamp, valor) para cada variable a partir de las cabeceras.
+    """
+    # Los nombres de variables están en índices pares (0, 2, 4, 6, 8, 10)
+    variable_mapping = {}
+    for i in range(0, len(headers), 2):
+        if i + 1 < len(headers):
+            variable_name = headers[i].strip('"')
+            timestamp_index = i
+            value_index = i + 1
+            variable_mapping[variable_name] = (timestamp_index, value_index)
+    return variable_mapping
+
+
+def iter_row_records(rows, variable_mapping, timestamp_parsers, parsed=None):
+    """
+    Genera tuplas (módulo, entrada) para cada variable de cada fila.
+
+    parsed es un contador opcional (metrics.RECORDS_PARSED) que se incrementa
+    por registro; en los procesos del pool no se pasa y cuenta el proceso padre.
+    """
+    # Módulo, dirección y tipo se resuelven una vez por columna, no por celda
+    registry = get_registry()
+    columns = [(variable_name, timestamp_index, value_index, registry.resolve(variable_name))
+               for variable_name, (timestamp_index, value_index) in variable_mapping.items()]
+
+    # Procesar cada fila de datos
+    for row in rows:
+        if len(row) < 2:  # Saltar filas vacías
+            continue
+
+        # Procesar cada variable y su par (timestamp, valor)
+        for variable_name, timestamp_index, value_index, (module, address, data_type) in columns:
+            if timestamp_index < len(row) and value_index < len(row):
+                timestamp_str = row[timestamp_index].strip('"')
+                value = row[value_index].strip('"')
+
+                # Parsear el timestamp
+                parsed_timestamp = timestamp_parsers[variable_name].parse(timestamp_str)
+
+                # Crear entrada para la variable
+                symbol_entry = {
+                    'Address': address,
+                    'Symbol': variable_name,
+                    'Data type': data_type,
+                    'Comment': '',
+                    'value': value,
+                    'timestamp': parsed_timestamp
+                }
+
+                if parsed is not None:
+                    parsed.inc()
+                yield module, symbol_entry
@@ -1,20 +1,73 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import unquote, urlparse
 from config import config
-from google.cloud.sql.connector import Connector
-from pg8000 import Connection
 
 
-class CloudSQLConnection:
-    connector = Connector()
-    connection: Connection = None
+def connection_errors():
+    """
+    Errores que indican que la conexión ya no sirve y hay que descartarla.
+
+    pg8000 se importa aquí y no al cargar el módulo para no retrasar el arranque.
+    """
+    from pg8000.exceptions import InterfaceError
+    return (InterfaceError, OSError)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Pool pequeño de conexiones pg8000 que conecta en el primer uso.
+
+    Cada hilo obtiene una conexión exclusiva con checkout(); si el mismo hilo
+    vuelve a pedir una, recibe la que ya tiene. Antes de entregar una
+    conexión inactiva se comprueba con SELECT 1 y, si se cayó, se reconecta
+    con espera exponencial. Con DATABASE_DSN se conecta directamente a un
+    PostgreSQL (por ejemplo, uno local para pruebas) en lugar del Connector
+    de Cloud SQL.
+    """
+
+    def __init__(self, dsn=None, max_size=None, health_check_interval=None,
+                 connect_retries=None, retry_delay=None, checkout_timeout=None):
+        self.dsn = config.DATABASE_DSN if dsn is None else dsn
+        self.max_size = max_size or config.SQL_POOL_SIZE
+        self.health_check_interval = (config.SQL_POOL_HEALTH_CHECK_INTERVAL
+                                      if health_check_interval is None else health_check_interval)
+        self.connect_retries = config.SQL_CONNECT_RETRIES if connect_retries is None else connect_retries
+        self.retry_delay = config.SQL_CONNECT_RETRY_DELAY if retry_delay is None else retry_delay
+        self.checkout_timeout = config.SQL_POOL_TIMEOUT if checkout_timeout is None else checkout_timeout
+
+        self._connector = None
+        self._idle = []  # [(conexión, instante en que quedó libre)]
+        self._size = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self.reconnects = 0
 
     def _connection_string(self) -> str:
         return config.PROJECT_ID + ":" + config.SQL_DATABASE_REGION + ":" + config.SQL_DATABASE_INSTANCE
 
-    def connect(self) -> None:
-        if self.connection != None:
-            return
+    def _open(self):
+        if self.dsn:
+            import pg8000
+            url = urlparse(self.dsn)
+            return pg8000.connect(
+                user=unquote(url.username or ""),
+                password=unquote(url.password) if url.password else None,
+                host=url.hostname or "localhost",
+                port=url.port or 5432,
+                database=url.path.lstrip("/") or None,
+            )
 
-        self.connection: Connection = self.connector.connect(
+        config.require_database()
+        if self._connector is None:
+            from google.cloud.sql.connector import Connector
+            self._connector = Connector()
+        return self._connector.connect(
             self._connection_string(),
             "pg8000",
             user=config.SQL_DATABASE_USERNAME,
@@ -22,10 +75,148 @@ class CloudSQLConnection:
             db=config.SQL_DATABASE_NAME,
         )
 
-# Create global instances
-try:
-    sql_connection = CloudSQLConnection()
+    def _connect_with_backoff(self):
+        delay = self.retry_delay
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                return self._open()
+            except Exception as e:
+                if attempt == self.connect_retries:
+                    raise
+                print(f"Error al conectar con la base de datos (intento {attempt}/{self.connect_retries}): {e}. "
+                      f"Reintento en {delay:.1f} s.")
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, connection):
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+        finally:
+            if cursor:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, idle_since = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No hay conexiones libres tras {self.checkout_timeout} s")
+                self._condition.wait(remaining)
+
+        try:
+            if connection is not None and time.monotonic() - idle_since >= self.health_check_interval:
+                if not self._is_healthy(connection):
+                    print("Conexión a la base de datos caída; reconectando...")
+                    self._close_quietly(connection)
+                    connection = None
+                    self.reconnects += 1
+            if connection is None:
+                connection = self._connect_with_backoff()
+        except BaseException:
+            self._release_slot()
+            raise
+        return connection
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _release(self, connection, broken=False):
+        if broken:
+            self._close_quietly(connection)
+            self._release_slot()
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Entrega una conexión exclusiva para el hilo actual y la devuelve al pool al salir.
+
+        Si ocurre un error de conexión, la conexión se descarta; ante otros
+        errores se hace rollback antes de devolverla.
+        """
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            # Checkout anidado en el mismo hilo: reutilizar la conexión
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        connection = self._acquire()
+        self._local.held = connection
+        self._local.depth = 1
+        broken = False
+        try:
+            yield connection
+        except connection_errors():
+            broken = True
+            raise
+        except BaseException:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._local.held = None
+            self._local.depth = 0
+            self._release(connection, broken)
+
+    def run(self, operation, retries=1):
+        """
+        Ejecuta operation(conexión); si la conexión se cae, reintenta con otra nueva.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.checkout() as connection:
+                    return operation(connection)
+            except connection_errors() as e:
+                if attempt == retries:
+                    raise
+                self.reconnects += 1
+                print(f"Conexión a la base de datos perdida ({e}); reintentando...")
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            self._close_quietly(connection)
+        if self._connector is not None:
+            self._connector.close()
+            self._connector = None
+
 
-    sql_connection.connect()
-except Exception as e:
-    print(f"Error initializing cloud services: {e}") 
\ No newline at end of file
+# Pool global; no abre ninguna conexión hasta el primer checkout
+sql_pool = ConnectionPool()
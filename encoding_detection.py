@@ -0,0 +1,199 @@
+import codecs
+import json
+import os
+import re
+import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Bytes máximos que se leen para detectar la codificación
+SAMPLE_SIZE = int(os.getenv("CSV_ENCODING_SAMPLE_SIZE", str(64 * 1024)))
+CHUNK_SIZE = 4096
+
+# Archivo donde se guarda la codificación detectada por huella de archivo; una ruta
+# relativa se toma respecto a la carpeta del módulo, como la caché del registro de tags
+CACHE_PATH = os.path.join(ROOT, os.getenv("CSV_ENCODING_CACHE", ".encoding_cache.json"))
+MAX_CACHE_ENTRIES = 256
+
+# Codificaciones a probar cuando la detectada no sirve. UTF-16 no se incluye
+# porque casi cualquier muestra de longitud par "decodifica"; se detecta por BOM.
+ENCODINGS_TO_TRY = ['utf-8-sig', 'cp1252', 'latin-1']
+
+# Una muestra 'ascii' no dice nada del resto del archivo: se miran también la mitad
+# y el final y se prueban estas codificaciones, en orden, sin reemplazar caracteres
+ASCII_PROMOTIONS = ['utf-8', 'cp1252', 'latin-1']
+NON_ASCII = re.compile(rb'[\x80-\xff]')
+# Bytes de continuación UTF-8 con los que puede empezar una ventana que corta un carácter
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_memory_cache = {}
+
+
+def _fingerprint(file_path):
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    # Conservar solo las entradas más recientes
+    if len(cache) > MAX_CACHE_ENTRIES:
+        cache = dict(list(cache.items())[-MAX_CACHE_ENTRIES:])
+    try:
+        tmp_path = CACHE_PATH + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: No se pudo guardar la caché de codificaciones: {e}")
+
+
+def detect_bom(sample):
+    """
+    Devuelve la codificación indicada por el BOM de la muestra, o None.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    return None
+
+
+def detect_encoding_from_sample(file_path, sample_size=SAMPLE_SIZE):
+    """
+    Detecta la codificación leyendo como máximo sample_size bytes del inicio del archivo.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(CHUNK_SIZE)
+        encoding = detect_bom(head)
+        if encoding:
+            return encoding
+
+        from chardet.universaldetector import UniversalDetector
+        detector = UniversalDetector()
+        read = 0
+        chunk = head
+        while chunk:
+            detector.feed(chunk)
+            read += len(chunk)
+            # Parar en cuanto el detector esté seguro o se agote la muestra
+            if detector.done or read >= sample_size:
+                break
+            chunk = f.read(min(CHUNK_SIZE, sample_size - read))
+        detector.close()
+
+    encoding = detector.result.get('encoding')
+    if encoding and encoding.lower() == 'ascii':
+        # Los lectores nunca reciben 'ascii': un 'año' después de la muestra se perdería
+        return promote_ascii(file_path)
+    return encoding
+
+
+def _sample_windows(file_path, sample_size):
+    """
+    Ventanas de como mucho sample_size bytes al inicio, a la mitad y al final del archivo.
+    """
+    size = os.path.getsize(file_path)
+    offsets = sorted({0, max(0, (size - sample_size) // 2), max(0, size - sample_size)})
+    with open(file_path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            yield offset, f.read(sample_size)
+
+
+def decodes_strictly(data, encoding):
+    """
+    True si los bytes se decodifican con la codificación sin ningún error
+    (un carácter cortado al final no cuenta como error).
+    """
+    try:
+        codecs.getincrementaldecoder(encoding)(errors='strict').decode(data, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def promote_ascii(file_path, encodings=ASCII_PROMOTIONS, sample_size=SAMPLE_SIZE):
+    """
+    Codificación para un archivo cuya muestra parecía ASCII.
+
+    Lee como mucho tres ventanas acotadas (inicio, mitad y final) y, en la
+    primera que tenga un byte no ASCII, prueba las codificaciones desde ese
+    byte. Si ninguna ventana lo tiene se devuelve la primera (utf-8 incluye
+    a ASCII); un carácter fuera de las ventanas se decodifica en la lectura
+    con la misma política de reemplazo que el resto del archivo.
+    """
+    for offset, window in _sample_windows(file_path, sample_size):
+        if offset:
+            window = window.lstrip(CONTINUATION_BYTES)
+        match = NON_ASCII.search(window)
+        if match is None:
+            continue
+        window = window[match.start():]
+        for encoding in encodings:
+            if decodes_strictly(window, encoding):
+                return encoding
+        return encodings[-1]
+    return encodings[0]
+
+
+def detect_encoding(file_path, sample_size=SAMPLE_SIZE):
+    """
+    Detecta la codificación del archivo usando la caché por (ruta, tamaño, mtime).
+    """
+    key = _fingerprint(file_path)
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    cache = _load_cache()
+    # Las entradas 'ascii' de versiones anteriores se vuelven a detectar
+    if cache.get(key) not in (None, 'ascii'):
+        _memory_cache[key] = cache[key]
+        return cache[key]
+
+    with metrics.ENCODING_DETECTION_SECONDS.time():
+        encoding = detect_encoding_from_sample(file_path, sample_size)
+
+    _memory_cache[key] = encoding
+    if encoding:
+        # Quitar huellas antiguas del mismo archivo
+        path_prefix = key.rsplit('|', 2)[0] + '|'
+        cache = {k: v for k, v in cache.items() if not k.startswith(path_prefix)}
+        cache[key] = encoding
+        _save_cache(cache)
+    return encoding
+
+
+def find_decodable_encoding(file_path, encodings=ENCODINGS_TO_TRY, sample_size=SAMPLE_SIZE):
+    """
+    Devuelve la primera codificación que decodifica sin errores la muestra del archivo.
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    encoding = detect_bom(sample)
+    if encoding:
+        return encoding
+
+    for enc in encodings:
+        try:
+            # Decodificador incremental: un carácter cortado al final de la muestra no es un error
+            codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None
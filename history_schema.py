@@ -0,0 +1,309 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from bit_image import PackedBoolWriter
+from bulk_writer import BulkWriter, HISTORY_KEY, HISTORY_RETURNING, HISTORY_TABLE
+from config import config
+from normalized_schema import NormalizedHistoryWriter, deduplicate_samples
+from rollups import RollupHistoryWriter
+
+PARTITION_PERIODS = ("none", "day", "month")
+
+# Se repite como mucho una vez al día en procesos de larga duración
+MAINTENANCE_INTERVAL = timedelta(days=1)
+
+_ready = {}  # tabla -> (instante de la última revisión, periodo efectivo)
+_keyed = {}  # tabla -> si tiene el índice único de HISTORY_KEY
+_lock = threading.Lock()
+
+
+def _columns_sql(primary_key):
+    return f"""
+        id BIGSERIAL,
+        module VARCHAR(255) NOT NULL,
+        address VARCHAR(255) NOT NULL,
+        symbol VARCHAR(255),
+        data_type VARCHAR(50),
+        comment TEXT,
+        value TEXT,
+        "timestamp" TIMESTAMPTZ NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT NOW(),
+        {primary_key}
+    """
+
+
+def _period_start(moment, period):
+    moment = moment.astimezone(timezone.utc)
+    if period == "day":
+        return datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_period(start, period):
+    if period == "day":
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(table_name, start, period):
+    suffix = start.strftime("%Y%m%d" if period == "day" else "%Y%m")
+    return f"{table_name}_p{suffix}"
+
+
+def _parse_partition_start(table_name, name, period):
+    prefix = f"{table_name}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], "%Y%m%d" if period == "day" else "%Y%m").replace(
+            tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _table_kind(cursor, table_name):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table_name,))
+    rows = cursor.fetchall()
+    return rows[0][0] if rows else None
+
+
+def _lock_table_maintenance(cursor, table_name):
+    """
+    Serializa el DDL de la tabla entre procesos (otros recolectores, cargas de CSV)
+    hasta el final de la transacción actual.
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"history_schema:{table_name}",))
+
+
+def _existing_partitions(cursor, table_name):
+    cursor.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (table_name,)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _create_partition(cursor, table_name, start, period):
+    """
+    Crea la partición [start, siguiente periodo) moviendo antes las filas
+    que hubieran caído en la partición por defecto para ese rango.
+    """
+    name = partition_name(table_name, start, period)
+    end = _next_period(start, period)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {table_name} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {table_name}_default '
+        f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved',
+        (start, end)
+    )
+    cursor.execute(
+        f"ALTER TABLE {table_name} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    print(f"Creada la partición {name}.")
+
+
+def _apply_retention(cursor, table_name, partitions, period, now):
+    retention_days = config.SQL_HISTORY_RETENTION_DAYS
+    if retention_days <= 0:
+        return
+    horizon = now - timedelta(days=retention_days)
+    for name in sorted(partitions):
+        start = _parse_partition_start(table_name, name, period)
+        if start is None or _next_period(start, period) > horizon:
+            continue
+        cursor.execute(f"ALTER TABLE {table_name} DETACH PARTITION {name}")
+        if config.SQL_HISTORY_RETENTION_ACTION == "drop":
+            cursor.execute(f"DROP TABLE {name}")
+            print(f"Eliminada la partición {name} (retención de {retention_days} días).")
+        else:
+            print(f"Desacoplada la partición {name} (retención de {retention_days} días).")
+
+
+def maintain_partitions(connection, table_name=HISTORY_TABLE, period=None, now=None):
+    """
+    Crea las particiones de los próximos periodos y aplica la retención.
+
+    Las particiones se listan después de tomar el bloqueo, así que si otro
+    proceso acaba de crear o desacoplar una, aquí ya no se repite.
+    """
+    period = period or config.SQL_HISTORY_PARTITION
+    now = now or datetime.now(timezone.utc)
+    cursor = connection.cursor()
+    try:
+        _lock_table_maintenance(cursor, table_name)
+        partitions = _existing_partitions(cursor, table_name)
+        start = _period_start(now, period)
+        for _ in range(config.SQL_HISTORY_PRECREATE + 1):
+            if partition_name(table_name, start, period) not in partitions:
+                _create_partition(cursor, table_name, start, period)
+            start = _next_period(start, period)
+        _apply_retention(cursor, table_name, partitions, period, now)
+    finally:
+        cursor.close()
+    connection.commit()
+
+
+def _create_table(cursor, table_name, period):
+    if period == "none":
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({_columns_sql('PRIMARY KEY (id)')})")
+        return
+    # En una tabla particionada la clave primaria debe incluir la columna de partición
+    columns = _columns_sql('PRIMARY KEY (id, "timestamp")')
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {table_name} ({columns}) PARTITION BY RANGE ("timestamp")')
+    # Recoge filas fuera de las particiones creadas (por ejemplo, cargas de CSV antiguos)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT")
+
+
+def _create_indexes(cursor, table_name):
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {table_name}_timestamp_brin '
+                   f'ON {table_name} USING BRIN ("timestamp")')
+    return _ensure_natural_key(cursor, table_name)
+
+
+def _natural_key_index(table_name):
+    return f"{table_name}_symbol_timestamp_module_key"
+
+
+def _history_duplicates(cursor, table_name, same_value=False):
+    # Claves (module, symbol, "timestamp") repetidas; con same_value, solo las de filas idénticas
+    value = ", value" if same_value else ""
+    cursor.execute(
+        f'SELECT count(*) FROM (SELECT 1 FROM {table_name} '
+        f'GROUP BY module, symbol, "timestamp"{value} HAVING count(*) > 1) d'
+    )
+    rows = cursor.fetchall()
+    return rows[0][0] if rows else 0
+
+
+def _ensure_natural_key(cursor, table_name):
+    """
+    Crea el índice único (module, symbol, "timestamp") que usan las cargas sin
+    duplicados y devuelve si existe.
+
+    Nunca borra filas: si la tabla ya tiene claves repetidas (muestras reales
+    dentro del mismo segundo o recargas anteriores) no se crea el índice, se
+    avisa y las cargas siguen sin evitar duplicados hasta que el operador
+    ejecute deduplicate_history (python main.py --deduplicate-history).
+    """
+    index_name = _natural_key_index(table_name)
+    cursor.execute("SELECT to_regclass(%s)", (index_name,))
+    rows = cursor.fetchall()
+    if rows and rows[0][0] is not None:
+        return True
+    duplicates = _history_duplicates(cursor, table_name)
+    if duplicates:
+        print(f"Warning: '{table_name}' tiene {duplicates} claves (module, symbol, timestamp) repetidas; "
+              f"no se crea el índice único y las cargas no evitarán duplicados. Revíselas y ejecute "
+              f"'python main.py --deduplicate-history' para borrar las filas idénticas.")
+        return False
+    # symbol y "timestamp" primero: el índice sirve también a las consultas por símbolo
+    cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {index_name} '
+                   f'ON {table_name} (symbol, "timestamp", module)')
+    # Sustituye al índice normal sobre (symbol, "timestamp") y a la clave anterior sin módulo
+    cursor.execute(f'DROP INDEX IF EXISTS {table_name}_symbol_timestamp_idx')
+    cursor.execute(f'DROP INDEX IF EXISTS {table_name}_symbol_timestamp_key')
+    return True
+
+
+def deduplicate_history(connection, table_name=HISTORY_TABLE):
+    """
+    Migración explícita: borra las filas idénticas (mismo module, symbol,
+    "timestamp" y value, conservando la primera) y crea el índice único.
+
+    Las claves repetidas con valores distintos no se tocan; si quedan, se
+    informa de cuántas son y el índice no se crea. Devuelve si el índice existe.
+    Con SQL_HISTORY_SCHEMA=normalized se aplica a symbol_samples.
+    """
+    if config.SQL_HISTORY_SCHEMA == "normalized":
+        return deduplicate_samples(connection)
+    cursor = connection.cursor()
+    try:
+        _lock_table_maintenance(cursor, table_name)
+        cursor.execute(
+            f'DELETE FROM {table_name} a USING {table_name} b '
+            f'WHERE a.module = b.module AND a.symbol = b.symbol AND a."timestamp" = b."timestamp" '
+            f'AND a.value IS NOT DISTINCT FROM b.value AND a.id > b.id'
+        )
+        deleted = getattr(cursor, "rowcount", -1)
+        print(f"Eliminadas {deleted if deleted and deleted > 0 else 0} filas idénticas de '{table_name}'.")
+        conflicting = _history_duplicates(cursor, table_name)
+        if conflicting:
+            print(f"Quedan {conflicting} claves repetidas con valores distintos; hay que resolverlas a mano.")
+        keyed = _ensure_natural_key(cursor, table_name)
+    finally:
+        cursor.close()
+    connection.commit()
+    with _lock:
+        _ready.pop(table_name, None)
+    return keyed
+
+
+def ensure_history_table(connection, table_name=HISTORY_TABLE, now=None):
+    """
+    Prepara la tabla de históricos una sola vez por proceso (y una vez al día
+    para crear las particiones nuevas en procesos de larga duración).
+
+    Con SQL_HISTORY_PARTITION=day|month la tabla se crea particionada por
+    "timestamp". Si ya existe sin particionar se mantiene tal cual y solo se
+    añaden los índices. Devuelve si la tabla tiene el índice único de HISTORY_KEY.
+    """
+    period = config.SQL_HISTORY_PARTITION
+    if period not in PARTITION_PERIODS:
+        raise ValueError(f"SQL_HISTORY_PARTITION desconocido: {period}")
+    now = now or datetime.now(timezone.utc)
+
+    with _lock:
+        if table_name in _ready:
+            checked_at, period = _ready[table_name]
+            if period == "none" or now - checked_at < MAINTENANCE_INTERVAL:
+                return _keyed[table_name]
+        else:
+            print(f"Verificando y/o creando la tabla '{table_name}'...")
+            cursor = connection.cursor()
+            try:
+                _lock_table_maintenance(cursor, table_name)
+                kind = _table_kind(cursor, table_name)
+                if kind is None:
+                    _create_table(cursor, table_name, period)
+                elif kind != "p" and period != "none":
+                    print(f"Warning: La tabla '{table_name}' ya existe sin particionar; "
+                          f"se mantiene y solo se añaden índices.")
+                    period = "none"
+                _keyed[table_name] = _create_indexes(cursor, table_name)
+            finally:
+                cursor.close()
+            connection.commit()
+            print("Tabla lista.")
+
+        if period != "none":
+            maintain_partitions(connection, table_name, period, now)
+        _ready[table_name] = (now, period)
+        return _keyed[table_name]
+
+
+def create_history_writer(connection, table_name=HISTORY_TABLE, **kwargs):
+    """
+    Devuelve el escritor de históricos según SQL_HISTORY_SCHEMA ("wide" o "normalized"),
+    con los BOOL de las tarjetas digitales empaquetados si SQL_PACK_DIGITAL_IO está activo
+    y envuelto para mantener los agregados si SQL_ENABLE_ROLLUPS está activo.
+    """
+    if config.SQL_HISTORY_SCHEMA == "normalized":
+        writer = NormalizedHistoryWriter(connection, **kwargs)
+    else:
+        keyed = ensure_history_table(connection, table_name)
+        writer = BulkWriter(connection, table_name=table_name, conflict_key=HISTORY_KEY if keyed else None,
+                            returning=HISTORY_RETURNING, **kwargs)
+
+    batch_size = kwargs.get("batch_size") or config.SQL_BULK_BATCH_SIZE
+    if config.SQL_PACK_DIGITAL_IO:
+        writer = PackedBoolWriter(writer, connection, batch_size)
+    if config.SQL_ENABLE_ROLLUPS:
+        return RollupHistoryWriter(writer, connection, batch_size)
+    return writer
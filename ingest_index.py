@@ -0,0 +1,139 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+# Archivo SQLite con las huellas de lo que ya se cargó en la base de datos
+INDEX_PATH = os.getenv("INGEST_INDEX_PATH", ".ingest_index.sqlite3")
+# Líneas por rango: un CSV que crece solo vuelve a enviar sus últimos rangos
+RANGE_LINES = int(os.getenv("INGEST_RANGE_LINES", "10000"))
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_digest(file_path):
+    """
+    Huella del contenido completo del archivo.
+    """
+    digest = _new_hash()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestIndex:
+    """
+    Índice local de archivos y rangos de líneas ya cargados.
+
+    Antes de leer un archivo se comprueba la huella de su contenido, y al
+    leer un CSV cada bloque de range_lines líneas se identifica por la huella
+    de la cabecera más sus líneas: si un EXPORT.csv se vuelve a cargar, o se
+    carga una exportación que repite el principio de otra, esas partes no se
+    parsean ni se envían. Las huellas nuevas quedan pendientes hasta commit(),
+    que se llama solo cuando la subida quedó confirmada en la base de datos.
+    """
+
+    def __init__(self, path=INDEX_PATH, range_lines=RANGE_LINES):
+        self.path = path
+        self.range_lines = max(1, range_lines)
+        self.files_skipped = 0
+        self.lines_skipped = 0
+        self._pending_files = {}
+        self._pending_ranges = {}
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS loaded_files ("
+            "digest TEXT PRIMARY KEY, path TEXT, size INTEGER, loaded_at REAL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS loaded_ranges ("
+            "digest TEXT PRIMARY KEY, lines INTEGER, loaded_at REAL)"
+        )
+        self._connection.commit()
+
+    def _known(self, table, digest):
+        return self._connection.execute(
+            f"SELECT 1 FROM {table} WHERE digest = ?", (digest,)
+        ).fetchone() is not None
+
+    def seen_file(self, file_path):
+        """
+        True si el contenido del archivo ya se cargó; si no, queda pendiente de confirmar.
+        """
+        digest = file_digest(file_path)
+        if digest in self._pending_files or self._known("loaded_files", digest):
+            self.files_skipped += 1
+            return True
+        self._pending_files[digest] = (os.path.abspath(file_path), os.path.getsize(file_path))
+        return False
+
+    def _new_range(self, header, lines):
+        digest = _new_hash()
+        digest.update(header.encode('utf-8', 'surrogatepass'))
+        for line in lines:
+            digest.update(line.encode('utf-8', 'surrogatepass'))
+        digest = digest.hexdigest()
+        if digest in self._pending_ranges or self._known("loaded_ranges", digest):
+            self.lines_skipped += len(lines)
+            return False
+        self._pending_ranges[digest] = len(lines)
+        return True
+
+    def iter_new_lines(self, lines, header=''):
+        """
+        Genera las líneas de los rangos que no se cargaron antes.
+        """
+        block = []
+        for line in lines:
+            block.append(line)
+            if len(block) >= self.range_lines:
+                if self._new_range(header, block):
+                    yield from block
+                block = []
+        if block and self._new_range(header, block):
+            yield from block
+
+    def commit(self):
+        """
+        Guarda como cargados los archivos y rangos pendientes.
+        """
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO loaded_files (digest, path, size, loaded_at) VALUES (?, ?, ?, ?)",
+                [(digest, path, size, now) for digest, (path, size) in self._pending_files.items()]
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO loaded_ranges (digest, lines, loaded_at) VALUES (?, ?, ?)",
+                [(digest, lines, now) for digest, lines in self._pending_ranges.items()]
+            )
+        self._pending_files = {}
+        self._pending_ranges = {}
+
+    def discard(self):
+        """
+        Olvida lo pendiente (la subida falló y hay que volver a enviarlo).
+        """
+        self._pending_files = {}
+        self._pending_ranges = {}
+
+    def report(self):
+        if self.files_skipped or self.lines_skipped:
+            print(f"Omitidos por estar ya cargados: {self.files_skipped} archivos, "
+                  f"{self.lines_skipped} líneas de CSV")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,134 +1,102 @@
+import argparse
 import csv
+import io
 import os
-import chardet
+import time
 from datetime import datetime
-from database import sql_connection
-from pg8000.exceptions import DatabaseError
-import openpyxl
-from openpyxl import load_workbook
+from database import sql_pool
+from history_schema import create_history_writer, deduplicate_history
+from encoding_detection import detect_encoding, find_decodable_encoding
+from timestamp_parser import TimestampParser
+from csv_records import build_variable_mapping, iter_row_records, stream_codec
+from csv_checkpoint import FollowCheckpoint
+from sample_batch import SampleBatch
+from tag_registry import get_registry
+from parallel_csv import find_export_files, iter_symbols_parallel
+from ingest_index import INDEX_PATH as INGEST_INDEX_PATH, IngestIndex
+import metrics
 
-def detect_encoding(file_path):
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def get_module_for_symbol(symbol_name):
     """
-    Detecta la codificación del archivo CSV.
+    Asigna un módulo basado en el nombre del símbolo (registro de tags, ver tags.json).
     """
-    with open(file_path, 'rb') as f:
-        raw_data = f.read()
-        result = chardet.detect(raw_data)
-        return result['encoding']
+    return get_registry().module_for(symbol_name)
 
-def parse_timestamp(timestamp_str):
+def get_address_for_symbol(symbol_name):
     """
-    Convierte el timestamp del formato CSV al formato ISO para PostgreSQL.
+    Asigna una dirección basada en el nombre del símbolo.
     """
-    try:
-        # Parsear el formato "26/06/2025 15:01:52"
-        dt = datetime.strptime(timestamp_str, "%d/%m/%Y %H:%M:%S")
-        return dt.isoformat()
-    except ValueError:
-        # Si falla, intentar otros formatos
-        try:
-            dt = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-            return dt.isoformat()
-        except ValueError:
-            print(f"Warning: No se pudo parsear el timestamp: {timestamp_str}")
-            return timestamp_str
+    return get_registry().address_for(symbol_name)
 
-def get_module_for_symbol(symbol_name):
+def get_data_type_for_symbol(symbol_name):
     """
-    Asigna un módulo basado en el nombre del símbolo.
-    """
-    # Mapeo de símbolos a módulos basado en la estructura proporcionada
-    symbol_to_module = {
-        # DI16xDC24V - Entradas digitales
-        'Start': 'DI16xDC24V',
-        'Emergencia': 'DI16xDC24V',
-        'BandaVI': 'DI16xDC24V',
-        'BandaRI': 'DI16xDC24V',
-        'BandaMI': 'DI16xDC24V',
-        'TarrosListos': 'DI16xDC24V',
-        'TarrosVM': 'DI16xDC24V',
-        'TarrosRM': 'DI16xDC24V',
-        'OnRotator': 'DI16xDC24V',
-        
-        # DO8xDC24V_2A - Salidas digitales
-        'Rotador': 'DO8xDC24V_2A',
-        'FinRojoVerde': 'DO8xDC24V_2A',
-        'MotorVI': 'DO8xDC24V_2A',
-        'MotorRI': 'DO8xDC24V_2A',
-        'MotorMI': 'DO8xDC24V_2A',
-        'MotorVO': 'DO8xDC24V_2A',
-        'MotorRO': 'DO8xDC24V_2A',
-        'MotorMO': 'DO8xDC24V_2A',
-        
-        # AI8x13Bit - Entradas analógicas
-        'Repeticiones': 'AI8x13Bit',
-        
-        # Mapeo para los nombres del CSV
-        'MotorVerdesIn': 'DO8xDC24V_2A',  # MotorVI
-        'MotorRojosIn': 'DO8xDC24V_2A',   # MotorRI
-        'MotorMoradosIn': 'DO8xDC24V_2A', # MotorMI
-        'MotorMoradosOut': 'DO8xDC24V_2A', # MotorMO
-    }
-    
-    return symbol_to_module.get(symbol_name, 'CSV_Data')
+    Asigna el tipo de dato basado en el nombre del símbolo.
+    """
+    return get_registry().data_type_for(symbol_name)
 
-def get_address_for_symbol(symbol_name):
+def _iter_csv_records(file_path, encoding, ingest_index=None):
     """
-    Asigna una dirección basada en el nombre del símbolo.
+    Genera tuplas (módulo, entrada) leyendo el CSV fila a fila con la codificación indicada.
+
+    Con ingest_index se saltan los rangos de líneas que ya se cargaron.
     """
-    # Mapeo de símbolos a direcciones basado en la estructura proporcionada
-    symbol_to_address = {
-        # DI16xDC24V - Entradas digitales
-        'Start': 'I 0.0',
-        'Emergencia': 'I 0.1',
-        'BandaVI': 'I 0.2',
-        'BandaRI': 'I 0.3',
-        'BandaMI': 'I 0.4',
-        'TarrosListos': 'I 1.0',
-        'TarrosVM': 'I 1.1',
-        'TarrosRM': 'I 1.2',
-        'OnRotator': 'I 1.3',
+    with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+        # Leer la primera fila para obtener los nombres de las variables
+        header_line = f.readline()
+        headers = next(csv.reader([header_line], delimiter=';'), [])
+        print(f"Headers encontrados: {headers}")
         
-        # DO8xDC24V_2A - Salidas digitales
-        'Rotador': 'Q 0.0',
-        'FinRojoVerde': 'Q 0.1',
-        'MotorVI': 'Q 0.2',
-        'MotorRI': 'Q 0.3',
-        'MotorMI': 'Q 0.4',
-        'MotorVO': 'Q 0.5',
-        'MotorRO': 'Q 0.6',
-        'MotorMO': 'Q 0.7',
+        lines = ingest_index.iter_new_lines(f, header_line) if ingest_index is not None else f
+        csv_reader = csv.reader(lines, delimiter=';')
         
-        # AI8x13Bit - Entradas analógicas
-        'Repeticiones': 'MW 512',
+        variable_mapping = build_variable_mapping(headers)
+        print(f"Mapeo de variables: {variable_mapping}")
         
-        # Mapeo para los nombres del CSV
-        'MotorVerdesIn': 'Q 0.2',    # MotorVI
-        'MotorRojosIn': 'Q 0.3',     # MotorRI
-        'MotorMoradosIn': 'Q 0.4',   # MotorMI
-        'MotorMoradosOut': 'Q 0.7',  # MotorMO
-    }
-    
-    return symbol_to_address.get(symbol_name, '')
+        # Un parser por columna: el formato se infiere una sola vez
+        timestamp_parsers = {variable_name: TimestampParser() for variable_name in variable_mapping}
+        
+        yield from iter_row_records(csv_reader, variable_mapping, timestamp_parsers,
+                                    metrics.RECORDS_PARSED.labels("csv"))
 
-def get_data_type_for_symbol(symbol_name):
+def _batched(records, batch_size, compact=False):
     """
-    Asigna el tipo de dato basado en el nombre del símbolo.
+    Agrupa un iterable de registros en listas (o SampleBatch si compact) de como máximo batch_size elementos.
     """
-    if symbol_name == 'Repeticiones' or symbol_name == 'CiclosTerminados':
-        return 'WORD'
+    new_batch = SampleBatch if compact else list
+    batch = new_batch()
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = new_batch()
+    if batch:
+        yield batch
+
+def _grouped(records, batch_size, compact):
+    if batch_size:
+        yield from _batched(records, batch_size, compact)
+    elif compact:
+        yield SampleBatch(records)
     else:
-        return 'BOOL'
+        yield from records
 
-def read_symbols_from_csv(file_path):
+def iter_symbols_from_csv(file_path, batch_size=None, encoding=None, compact=False, ingest_index=None):
     """
-    Lee los símbolos desde un archivo CSV.
+    Lee los símbolos desde un archivo CSV como un generador de tuplas (módulo, entrada).
+
+    Si se indica batch_size, genera listas de como máximo batch_size tuplas.
+    Con compact=True los lotes son SampleBatch (columnar, unos 16 bytes por
+    muestra); sin batch_size se genera un único SampleBatch con todo el archivo.
+    La memoria usada no depende del tamaño del archivo. Con ingest_index
+    (IngestIndex) se omiten los rangos de líneas que ya se cargaron.
     """
     if not os.path.exists(file_path):
         print(f"Error: El archivo {file_path} no fue encontrado.")
-        return None
-        
-    try:
+        return
+    
+    if encoding is None:
         # Detectar la codificación del archivo
         encoding = detect_encoding(file_path)
         print(f"Detectada codificación: {encoding}")
@@ -136,182 +104,256 @@ def read_symbols_from_csv(file_path):
         # Si la detección falla, usar una codificación por defecto
         if not encoding:
             encoding = 'latin-1'  # Codificación común para archivos CSV en Windows
+    
+    yield from _grouped(_iter_csv_records(file_path, encoding, ingest_index), batch_size, compact)
+
+def group_symbols_by_module(records):
+    """
+    Agrupa tuplas (módulo, entrada) en el diccionario {módulo: [entradas]}.
+    """
+    symbols_data = {}
+    for module, symbol_entry in records:
+        if module not in symbols_data:
+            symbols_data[module] = []
+        symbols_data[module].append(symbol_entry)
+    return symbols_data
+
+def read_symbols_from_csv(file_path):
+    """
+    Lee los símbolos desde un archivo CSV.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: El archivo {file_path} no fue encontrado.")
+        return None
         
-        symbols_data = {}
-        
-        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-            csv_reader = csv.reader(f, delimiter=';')
-            
-            # Leer la primera fila para obtener los nombres de las variables
-            headers = next(csv_reader)
-            print(f"Headers encontrados: {headers}")
-            
-            # Crear un mapeo de pares (timestamp, valor) para cada variable
-            # Los nombres de variables están en índices pares (0, 2, 4, 6, 8, 10)
-            variable_mapping = {}
-            for i in range(0, len(headers), 2):
-                if i + 1 < len(headers):
-                    variable_name = headers[i].strip('"')
-                    timestamp_index = i
-                    value_index = i + 1
-                    variable_mapping[variable_name] = (timestamp_index, value_index)
-            
-            print(f"Mapeo de variables: {variable_mapping}")
-            
-            # Procesar cada fila de datos
-            for row_num, row in enumerate(csv_reader, 1):
-                if len(row) < 2:  # Saltar filas vacías
-                    continue
-                
-                # Procesar cada variable y su par (timestamp, valor)
-                for variable_name, (timestamp_index, value_index) in variable_mapping.items():
-                    if timestamp_index < len(row) and value_index < len(row):
-                        timestamp_str = row[timestamp_index].strip('"')
-                        value = row[value_index].strip('"')
-                        
-                        # Parsear el timestamp
-                        parsed_timestamp = parse_timestamp(timestamp_str)
-                        
-                        # Determinar el módulo y dirección basado en el símbolo
-                        module = get_module_for_symbol(variable_name)
-                        address = get_address_for_symbol(variable_name)
-                        
-                        # Crear entrada para la variable
-                        symbol_entry = {
-                            'Address': address,
-                            'Symbol': variable_name,
-                            'Data type': get_data_type_for_symbol(variable_name),
-                            'Comment': '',
-                            'value': value,
-                            'timestamp': parsed_timestamp
-                        }
-                        
-                        # Agrupar por módulo
-                        if module not in symbols_data:
-                            symbols_data[module] = []
-                        
-                        symbols_data[module].append(symbol_entry)
-        
-        return symbols_data
+    try:
+        return group_symbols_by_module(iter_symbols_from_csv(file_path))
         
     except UnicodeDecodeError as e:
         print(f"Error de codificación: {e}")
-        print("Intentando con diferentes codificaciones...")
-        
-        # Intentar con diferentes codificaciones comunes
-        encodings_to_try = ['latin-1', 'cp1252', 'iso-8859-1', 'utf-16', 'utf-8-sig']
+        print("Probando codificaciones alternativas...")
         
-        for enc in encodings_to_try:
-            try:
-                print(f"Intentando con codificación: {enc}")
-                symbols_data = {}
-                
-                with open(file_path, 'r', encoding=enc, errors='replace') as f:
-                    csv_reader = csv.reader(f, delimiter=';')
-                    
-                    # Leer la primera fila para obtener los nombres de las variables
-                    headers = next(csv_reader)
-                    print(f"Headers encontrados: {headers}")
-                    
-                    # Crear un mapeo de pares (timestamp, valor) para cada variable
-                    # Los nombres de variables están en índices pares (0, 2, 4, 6, 8, 10)
-                    variable_mapping = {}
-                    for i in range(0, len(headers), 2):
-                        if i + 1 < len(headers):
-                            variable_name = headers[i].strip('"')
-                            timestamp_index = i
-                            value_index = i + 1
-                            variable_mapping[variable_name] = (timestamp_index, value_index)
-                    
-                    print(f"Mapeo de variables: {variable_mapping}")
-                    
-                    # Procesar cada fila de datos
-                    for row_num, row in enumerate(csv_reader, 1):
-                        if len(row) < 2:  # Saltar filas vacías
-                            continue
-                        
-                        # Procesar cada variable y su par (timestamp, valor)
-                        for variable_name, (timestamp_index, value_index) in variable_mapping.items():
-                            if timestamp_index < len(row) and value_index < len(row):
-                                timestamp_str = row[timestamp_index].strip('"')
-                                value = row[value_index].strip('"')
-                                
-                                # Parsear el timestamp
-                                parsed_timestamp = parse_timestamp(timestamp_str)
-                                
-                                # Determinar el módulo y dirección basado en el símbolo
-                                module = get_module_for_symbol(variable_name)
-                                address = get_address_for_symbol(variable_name)
-                                
-                                # Crear entrada para la variable
-                                symbol_entry = {
-                                    'Address': address,
-                                    'Symbol': variable_name,
-                                    'Data type': 'BOOL' if variable_name != 'Repeticiones' else 'WORD',
-                                    'Comment': '',
-                                    'value': value,
-                                    'timestamp': parsed_timestamp
-                                }
-                                
-                                # Agrupar por módulo
-                                if module not in symbols_data:
-                                    symbols_data[module] = []
-                                
-                                symbols_data[module].append(symbol_entry)
-                
-                print(f"Archivo leído exitosamente con codificación: {enc}")
-                return symbols_data
-                
-            except Exception as inner_e:
-                print(f"Falló con codificación {enc}: {inner_e}")
-                continue
+        # Una sola pasada de prueba sobre una muestra del archivo
+        enc = find_decodable_encoding(file_path)
+        if not enc:
+            print("No se pudo leer el archivo con ninguna codificación conocida.")
+            return None
         
-        print("No se pudo leer el archivo con ninguna codificación conocida.")
-        return None
+        try:
+            symbols_data = group_symbols_by_module(iter_symbols_from_csv(file_path, encoding=enc))
+            print(f"Archivo leído exitosamente con codificación: {enc}")
+            return symbols_data
+        except Exception as inner_e:
+            print(f"Falló con codificación {enc}: {inner_e}")
+            return None
         
     except Exception as e:
         print(f"Ha ocurrido un error inesperado al leer el archivo CSV: {e}")
         return None
 
-def read_symbols_from_xlsx(file_path):
+# Tamaño de lectura del modo seguimiento (bytes)
+FOLLOW_CHUNK_SIZE = 1024 * 1024
+
+def default_checkpoint_path(file_path):
+    return file_path + ".checkpoint.json"
+
+def _last_line_end(data, newline):
     """
-    Lee los símbolos desde un archivo XLSX.
+    Posición justo después del último salto de línea completo en data, o -1.
+    """
+    width = len(newline)
+    i = data.rfind(newline)
+    # En codificaciones de varios bytes el salto debe estar alineado
+    while i >= 0 and i % width:
+        i = data.rfind(newline, 0, i + width - 1)
+    return i + width if i >= 0 else -1
+
+def follow_symbols_from_csv(file_path, checkpoint_path=None, chunk_size=FOLLOW_CHUNK_SIZE):
+    """
+    Lee solo las líneas nuevas de un CSV que sigue creciendo (modo tail).
+
+    Genera lotes (SampleBatch de tuplas (módulo, entrada)) a partir del offset guardado
+    en el checkpoint. El checkpoint avanza cuando se pide el siguiente lote, es
+    decir, después de que el consumidor procesó el anterior. Si el archivo fue
+    rotado (otro inodo) o truncado, se relee desde el inicio descartando las
+    entradas con timestamp anterior o igual al último ya cargado de cada variable.
     """
     if not os.path.exists(file_path):
         print(f"Error: El archivo {file_path} no fue encontrado.")
-        return None
-        
+        return
+
+    checkpoint = FollowCheckpoint.load(checkpoint_path or default_checkpoint_path(file_path))
+    stat = os.stat(file_path)
+    rewound = False
+
+    if not checkpoint.is_same_file(stat):
+        if checkpoint.inode is not None:
+            print(f"Archivo rotado o truncado: {file_path}. Se relee desde el inicio.")
+            rewound = True
+        checkpoint.reset(stat)
+
+    if checkpoint.offset >= stat.st_size:
+        print("No hay datos nuevos en el archivo.")
+        return
+
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+
+        if checkpoint.encoding is None:
+            encoding = detect_encoding(file_path) or 'latin-1'
+            print(f"Detectada codificación: {encoding}")
+            checkpoint.encoding, _, bom_length = stream_codec(encoding, head)
+            checkpoint.offset = bom_length
+        codec = checkpoint.encoding
+        newline = '\n'.encode(codec)
+
+        f.seek(checkpoint.offset)
+        pending = b''
+
+        if checkpoint.headers is None:
+            # Leer la cabecera; si todavía no está completa, esperar al siguiente ciclo
+            while True:
+                chunk = f.read(chunk_size)
+                pending += chunk
+                cut = _last_line_end(pending, newline)
+                if cut >= 0 or not chunk:
+                    break
+            first_end = pending.find(newline)
+            while first_end >= 0 and first_end % len(newline):
+                first_end = pending.find(newline, first_end + 1)
+            if first_end < 0:
+                print("La cabecera del archivo aún no está completa.")
+                return
+            first_end += len(newline)
+            header_line = pending[:first_end].decode(codec, errors='replace')
+            checkpoint.headers = next(csv.reader([header_line.rstrip('\r\n')], delimiter=';'))
+            checkpoint.offset += first_end
+            pending = pending[first_end:]
+            print(f"Headers encontrados: {checkpoint.headers}")
+
+        variable_mapping = build_variable_mapping(checkpoint.headers)
+        timestamp_parsers = {variable_name: TimestampParser() for variable_name in variable_mapping}
+        last_timestamps = dict(checkpoint.last_timestamps)
+
+        while True:
+            chunk = f.read(chunk_size)
+            data = pending + chunk
+            cut = _last_line_end(data, newline)
+            if cut < 0:
+                if not chunk:
+                    break
+                pending = data
+                continue
+
+            # Solo se procesan líneas completas; el resto queda para la próxima lectura
+            complete, pending = data[:cut], data[cut:]
+            text = complete.decode(codec, errors='replace')
+            rows = csv.reader(io.StringIO(text), delimiter=';')
+
+            batch = SampleBatch()
+            for module, symbol_entry in iter_row_records(rows, variable_mapping, timestamp_parsers,
+                                                        metrics.RECORDS_PARSED.labels("csv")):
+                symbol = symbol_entry['Symbol']
+                timestamp = symbol_entry['timestamp']
+                last = last_timestamps.get(symbol)
+                if rewound and last is not None and timestamp <= last:
+                    continue
+                if last is None or timestamp > last:
+                    last_timestamps[symbol] = timestamp
+                batch.append((module, symbol_entry))
+
+            if batch:
+                yield batch
+
+            checkpoint.offset += len(complete)
+            checkpoint.size = stat.st_size
+            checkpoint.last_timestamps = dict(last_timestamps)
+            checkpoint.save()
+
+            if not chunk:
+                break
+
+    # Guardar también la cabecera aunque no hubiera filas nuevas
+    checkpoint.save()
+
+def follow_csv(file_path, checkpoint_path=None, poll_interval=5.0, once=False):
+    """
+    Sube periódicamente a Cloud SQL las líneas nuevas del CSV.
+
+    Si una subida falla, el checkpoint no avanza y el lote se reintenta en el siguiente ciclo.
+    """
+    print(f"Siguiendo el archivo {file_path} (cada {poll_interval} segundos)...")
+    try:
+        while True:
+            for batch in follow_symbols_from_csv(file_path, checkpoint_path):
+                if not upload_symbols_to_sql(batch):
+                    print("La subida falló; se reintentará en el siguiente ciclo.")
+                    break
+            if once:
+                return
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\n\nSeguimiento detenido por el usuario.")
+
+# Archivo XLSX de tags por defecto: WINCC_XLSX_PATH (absoluta o relativa al repositorio)
+DEFAULT_XLSX_PATH = os.path.join(ROOT, os.getenv("WINCC_XLSX_PATH", "REPORTS_V2.xlsx"))
+
+XLSX_COLUMNS = ['Name', 'Path', 'Data Type', 'Logical Address', 'Comment']
+
+def iter_symbols_from_xlsx(file_path, batch_size=None, compact=False):
+    """
+    Lee los símbolos desde un archivo XLSX como un generador de tuplas (módulo, entrada).
+
+    Recorre la hoja una sola vez con iter_rows y solo lee las columnas necesarias.
+    Si se indica batch_size, genera listas de como máximo batch_size tuplas
+    (SampleBatch con compact=True, como en iter_symbols_from_csv).
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: El archivo {file_path} no fue encontrado.")
+        return
+    
+    yield from _grouped(_iter_xlsx_records(file_path), batch_size, compact)
+
+def _iter_xlsx_records(file_path):
+    from openpyxl import load_workbook
+    
+    print(f"Leyendo archivo XLSX: {file_path}")
+    workbook = load_workbook(filename=file_path, read_only=True)
+    
     try:
-        print(f"Leyendo archivo XLSX: {file_path}")
-        workbook = load_workbook(filename=file_path, read_only=True)
-        
         # Obtener la primera hoja
         sheet = workbook.active
         
-        symbols_data = {}
-        
         # Leer la primera fila para obtener los nombres de las columnas
-        headers = []
-        for cell in sheet[1]:
-            headers.append(cell.value)
-        
+        headers = list(next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ()))
         print(f"Headers encontrados: {headers}")
         
-        # Mapear las columnas que nos interesan
+        # Mapear las columnas que nos interesan (índices base 0 dentro de la fila)
         column_mapping = {}
-        for i, header in enumerate(headers, 1):
-            if header in ['Name', 'Path', 'Data Type', 'Logical Address', 'Comment']:
+        for i, header in enumerate(headers):
+            if header in XLSX_COLUMNS:
                 column_mapping[header] = i
         
         print(f"Mapeo de columnas: {column_mapping}")
         
-        # Procesar cada fila de datos (empezando desde la fila 2)
-        for row_num in range(2, sheet.max_row + 1):
+        if not column_mapping:
+            return
+        
+        # Proyección de columnas: no leer más allá de la última columna necesaria
+        max_col = max(column_mapping.values()) + 1
+        projection = list(column_mapping.items())
+        
+        # Timestamp de la carga, común a todas las filas del archivo
+        load_timestamp = datetime.now().isoformat()
+        parsed = metrics.RECORDS_PARSED.labels("xlsx")
+        
+        # Procesar cada fila de datos (la cabecera ya fue consumida)
+        for row in sheet.iter_rows(min_row=2, max_col=max_col, values_only=True):
             row_data = {}
             
             # Leer los valores de las columnas que nos interesan
-            for column_name, col_index in column_mapping.items():
-                cell_value = sheet.cell(row=row_num, column=col_index).value
+            for column_name, col_index in projection:
+                cell_value = row[col_index] if col_index < len(row) else None
                 row_data[column_name] = str(cell_value) if cell_value is not None else ''
             
             # Solo procesar filas que tengan al menos un Name
@@ -331,16 +373,24 @@ def read_symbols_from_xlsx(file_path):
                     'Data type': row_data.get('Data Type', ''),
                     'Comment': row_data.get('Comment', ''),
                     'value': '',  # Valor vacío para datos del XLSX
-                    'timestamp': datetime.now().isoformat()  # Timestamp actual
+                    'timestamp': load_timestamp
                 }
                 
-                # Agrupar por módulo
-                if module not in symbols_data:
-                    symbols_data[module] = []
-                
-                symbols_data[module].append(symbol_entry)
-        
+                parsed.inc()
+                yield module, symbol_entry
+    finally:
         workbook.close()
+
+def read_symbols_from_xlsx(file_path):
+    """
+    Lee los símbolos desde un archivo XLSX.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: El archivo {file_path} no fue encontrado.")
+        return None
+        
+    try:
+        symbols_data = group_symbols_by_module(iter_symbols_from_xlsx(file_path))
         print(f"Archivo XLSX leído exitosamente. Módulos encontrados: {list(symbols_data.keys())}")
         return symbols_data
         
@@ -349,100 +399,224 @@ def read_symbols_from_xlsx(file_path):
         return None
 
 def convert_value_to_boolean_or_word(value, symbol):
-    if symbol.get('Symbol') != 'Repeticiones' or symbol.get('Symbol') != 'CiclosTerminados':
-        return True if value == '1' else False
-    else:
-        return int(value)
+    """
+    Convierte el valor del CSV según el tipo de dato del tag en el registro
+    (los símbolos que no están en él se tratan como BOOL).
+    """
+    tag = get_registry().get(symbol.get('Symbol'))
+    if tag is None or tag.data_type.upper() == 'BOOL':
+        return value == '1'
+    try:
+        return tag.converter(value)
+    except ValueError:
+        return value
 
-def upload_symbols_to_sql(symbols_data):
+def format_sql_value(value):
     """
-    Crea la tabla si no existe y sube los datos de los símbolos a Cloud SQL.
+    Convierte el valor a texto tal como lo guardaría PostgreSQL en la columna TEXT.
     """
-    if not sql_connection or not sql_connection.connection:
-        print("Error: No hay conexión a la base de datos.")
-        return
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
 
-    table_name = "chocolatin_variables_history"
-    
-    create_table_query = f"""
-    CREATE TABLE IF NOT EXISTS {table_name} (
-        id SERIAL PRIMARY KEY,
-        module VARCHAR(255) NOT NULL,
-        address VARCHAR(255) NOT NULL,
-        symbol VARCHAR(255),
-        data_type VARCHAR(50),
-        comment TEXT,
-        value TEXT,
-        "timestamp" TIMESTAMPTZ NOT NULL,
-        created_at TIMESTAMPTZ DEFAULT NOW()
-    );
-    """
-
-    insert_query = f"""
-    INSERT INTO {table_name} (module, address, symbol, data_type, comment, value, "timestamp")
-    VALUES (%s, %s, %s, %s, %s, %s, %s);
+def iter_symbol_records(symbols_data):
     """
-    
-    cursor = None
-    try:
-        cursor = sql_connection.connection.cursor()
-        print(f"Verificando y/o creando la tabla '{table_name}'...")
-        cursor.execute(create_table_query)
-        print("Tabla lista.")
+    Normaliza los datos a tuplas (módulo, entrada).
 
-        print("Insertando datos en la base de datos...")
+    Acepta el diccionario {módulo: [entradas]}, un iterable de tuplas
+    (módulo, entrada) o un iterable de lotes (listas o SampleBatch) de esas tuplas.
+    """
+    if isinstance(symbols_data, dict):
         for module, symbol_list in symbols_data.items():
             for symbol in symbol_list:
-                if symbol.get('Symbol'):
-                    value = str(symbol.get('value'))
-                    cursor.execute(insert_query, (
-                        module,
-                        symbol.get('Address'),
-                        symbol.get('Symbol'),
-                        symbol.get('Data type'),
-                        symbol.get('Comment'),
-                        convert_value_to_boolean_or_word(value, symbol),
-                        symbol.get('timestamp')
-                    ))
-        
-        sql_connection.connection.commit()
+                yield module, symbol
+        return
+
+    if isinstance(symbols_data, SampleBatch):
+        yield from symbols_data
+        return
+
+    for item in symbols_data:
+        if isinstance(item, (list, SampleBatch)):
+            yield from item
+        else:
+            yield item
+
+def iter_symbol_fields(symbols_data):
+    """
+    Como iter_symbol_records, pero genera tuplas planas
+    (module, address, symbol, data_type, comment, value, timestamp).
+
+    Los SampleBatch se recorren directamente, sin crear un diccionario por muestra.
+    """
+    if isinstance(symbols_data, SampleBatch):
+        yield from symbols_data.iter_fields()
+        return
+
+    items = iter_symbol_records(symbols_data) if isinstance(symbols_data, dict) else symbols_data
+    for item in items:
+        if isinstance(item, SampleBatch):
+            yield from item.iter_fields()
+            continue
+        for module, symbol in (item if isinstance(item, list) else (item,)):
+            yield (module, symbol.get('Address'), symbol.get('Symbol'), symbol.get('Data type'),
+                   symbol.get('Comment'), symbol.get('value'), symbol.get('timestamp'))
+
+def upload_symbols_to_sql(symbols_data, batch_size=None, commit_interval=None):
+    """
+    Prepara la tabla (una vez por proceso) y sube los datos de los símbolos a Cloud SQL.
+
+    symbols_data puede ser el diccionario por módulo o un generador como
+    iter_symbols_from_csv. Las filas se envían por lotes con BulkWriter
+    (COPY o INSERT multi-fila), o al esquema normalizado si
+    SQL_HISTORY_SCHEMA=normalized. Devuelve True si los datos quedaron confirmados.
+    """
+    from pg8000.exceptions import DatabaseError
+    
+    table_name = "chocolatin_variables_history"
+
+    try:
+        # El pool hace rollback (o descarta la conexión caída) si algo falla
+        with sql_pool.checkout() as connection:
+            writer = create_history_writer(connection, table_name=table_name,
+                                           batch_size=batch_size, commit_interval=commit_interval)
+            print("Insertando datos en la base de datos...")
+            # El valor convertido solo depende de (símbolo, valor): se calcula una vez
+            formatted_values = {}
+            for module, address, symbol, data_type, comment, value, timestamp in iter_symbol_fields(symbols_data):
+                if symbol:
+                    key = (symbol, value)
+                    formatted = formatted_values.get(key)
+                    if formatted is None:
+                        formatted = formatted_values[key] = format_sql_value(
+                            convert_value_to_boolean_or_word(str(value), {'Symbol': symbol}))
+                    writer.write((module, address, symbol, data_type, comment, formatted, timestamp))
+            
+            writer.commit()
+            writer.report()
         print("¡Datos insertados correctamente en Cloud SQL!")
+        return True
 
     except DatabaseError as e:
         print(f"Error de base de datos: {e}")
-        if sql_connection.connection:
-            sql_connection.connection.rollback()
+        return False
     except Exception as e:
         print(f"Ha ocurrido un error inesperado: {e}")
-        if sql_connection.connection:
-            sql_connection.connection.rollback()
-    finally:
-        if cursor:
-            cursor.close()
+        return False
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Carga símbolos de WinCC en Cloud SQL.")
+    parser.add_argument("--csv", help="Archivo EXPORT.csv a cargar")
+    parser.add_argument("--xlsx", default=DEFAULT_XLSX_PATH, help="Archivo XLSX de tags a cargar")
+    parser.add_argument("--follow", action="store_true",
+                        help="Modo seguimiento: cargar solo las líneas nuevas del CSV")
+    parser.add_argument("--once", action="store_true",
+                        help="En modo seguimiento, procesar las líneas nuevas una vez y salir")
+    parser.add_argument("--checkpoint", help="Ruta del checkpoint del modo seguimiento")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="Segundos entre lecturas en modo seguimiento")
+    parser.add_argument("--parse-only", action="store_true",
+                        help="Solo leer y contar los registros, sin conectar a la base de datos")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Parsear el CSV en paralelo con varios procesos")
+    parser.add_argument("--dir", help="Cargar en paralelo todos los CSV de esta carpeta")
+    parser.add_argument("--pattern", default="*.csv", help="Patrón de archivos del modo carpeta")
+    parser.add_argument("--workers", type=int, help="Procesos del modo paralelo (por defecto, uno por núcleo)")
+    parser.add_argument("--force", action="store_true",
+                        help="Cargar aunque el archivo o sus líneas ya se hayan cargado antes")
+    parser.add_argument("--deduplicate-history", action="store_true",
+                        help="Borrar las filas idénticas del histórico y crear su índice único")
+    return parser.parse_args(argv)
+
+def parse_only(records):
+    """
+    Recorre los registros sin subirlos e imprime cuántos se leyeron y en cuánto tiempo.
+    """
+    start = time.perf_counter()
+    if isinstance(records, dict):
+        count = sum(1 for _ in iter_symbol_records(records))
+    else:
+        # Los lotes se cuentan sin recorrer sus registros
+        count = sum(len(item) if isinstance(item, (list, SampleBatch)) else 1 for item in records)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Registros leídos: {count} en {elapsed:.2f} s ({rate:.0f} registros/s)")
+    return count
 
-def main():
+def main(argv=None):
     """
     Función principal para cargar símbolos y subirlos a la base de datos.
     """
-    # symbols = read_symbols_from_csv('C:/Users/Juan/Desktop/Projects/Universidad/automatica-dsc/opc-python-wincc/EXPORT.csv')
+    args = parse_args(argv)
+    reporter = metrics.start_from_env()
+    try:
+        _run(args)
+    finally:
+        if reporter:
+            print(reporter.summary_line())
 
-    # if symbols:
-    #     print("Símbolos cargados correctamente desde el archivo CSV:")
-    #     for module, symbol_list in symbols.items():
-    #         print(f"\nMódulo: {module}")
-    #         for symbol in symbol_list:
-    #             if symbol.get('Symbol'):
-    #                 print(f"  - Símbolo: {symbol['Symbol']}, Dirección: {symbol['Address']}, Tipo: {symbol['Data type']}, Valor: {symbol.get('value')}, Timestamp: {symbol.get('timestamp')}")
+def _upload_once(ingest_index, symbols_data):
+    """
+    Sube los datos y marca en el índice lo leído solo si la subida quedó confirmada.
+    """
+    if upload_symbols_to_sql(symbols_data):
+        ingest_index.commit()
+    else:
+        ingest_index.discard()
+    ingest_index.report()
 
-    #     print("\n--- Lectura de datos finalizada ---")
-    #     for module, symbol_list in symbols.items():
-    #         for symbol in symbol_list:
-    #             if symbol.get('Symbol'):
-    #                 print(f"Leyendo valor para el símbolo: {symbol['Symbol']}. Valor actual: {symbol.get('value')}")
+def _run(args):
+    """
+    Ejecuta el modo elegido en la línea de comandos.
+    """
+    if args.deduplicate_history:
+        with sql_pool.checkout() as connection:
+            deduplicate_history(connection)
+        return
 
-    #     upload_symbols_to_sql(symbols)
+    parallel = args.dir or (args.csv and args.parallel)
+    if args.csv and args.follow and not parallel:
+        follow_csv(args.csv, args.checkpoint, args.poll_interval, once=args.once)
+        return
+
+    if args.parse_only:
+        if parallel:
+            files = find_export_files(args.dir, args.pattern) if args.dir else [args.csv]
+            parse_only(iter_symbols_parallel(files, workers=args.workers))
+        else:
+            parse_only(iter_symbols_from_csv(args.csv) if args.csv else iter_symbols_from_xlsx(args.xlsx))
+        return
+
+    # Con --force se usa un índice en memoria: se carga todo y no se recuerda nada
+    with IngestIndex(":memory:" if args.force else INGEST_INDEX_PATH) as ingest_index:
+        _run_upload(args, ingest_index)
+
+def _run_upload(args, ingest_index):
+    """
+    Carga el CSV, la carpeta o el XLSX omitiendo lo que el índice ya tiene registrado.
+    """
+    if args.dir or (args.csv and args.parallel):
+        files = find_export_files(args.dir, args.pattern) if args.dir else [args.csv]
+        files = [path for path in files if not ingest_index.seen_file(path)]
+        if not files:
+            print(f"No hay archivos {args.pattern} nuevos que cargar.")
+            ingest_index.report()
+            return
+        _upload_once(ingest_index, iter_symbols_parallel(files, workers=args.workers))
+        return
+
+    if args.csv:
+        if os.path.exists(args.csv) and ingest_index.seen_file(args.csv):
+            print(f"El archivo {args.csv} ya se cargó; se omite (use --force para cargarlo de nuevo).")
+            return
+        _upload_once(ingest_index, iter_symbols_from_csv(args.csv, ingest_index=ingest_index))
+        return
+
+    if os.path.exists(args.xlsx) and ingest_index.seen_file(args.xlsx):
+        print(f"El archivo {args.xlsx} ya se cargó; se omite (use --force para cargarlo de nuevo).")
+        return
 
-    symbols_xlsx = read_symbols_from_xlsx('C:/Users/Juan/Desktop/Projects/Universidad/automatica-dsc/opc-python-wincc/REPORTS_V2.xlsx')
+    symbols_xlsx = read_symbols_from_xlsx(args.xlsx)
 
     if symbols_xlsx:
         print("Símbolos cargados correctamente desde el archivo XLSX:")
@@ -458,7 +632,7 @@ def main():
                 if symbol.get('Symbol'):
                     print(f"Leyendo valor para el símbolo: {symbol['Symbol']}. Valor actual: {symbol.get('value')}")
 
-        upload_symbols_to_sql(symbols_xlsx)
+        _upload_once(ingest_index, symbols_xlsx)
 
 if __name__ == "__main__":
     main()
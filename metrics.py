@@ -0,0 +1,381 @@
+import bisect
+import os
+import threading
+import time
+
+# Desactivadas por defecto: cada llamada se reduce a comprobar un booleano
+ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+# Puerto del endpoint de texto estilo Prometheus (0 = sin endpoint)
+PORT = int(os.getenv("METRICS_PORT", "0"))
+HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Segundos entre líneas de resumen (0 = sin resumen periódico)
+SUMMARY_INTERVAL = float(os.getenv("METRICS_SUMMARY_INTERVAL", "60"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def enabled():
+    return ENABLED
+
+
+def enable(value=True):
+    global ENABLED
+    ENABLED = value
+
+
+class _NoopChild:
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+_NOOP = _NoopChild()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values):
+        """
+        Devuelve la serie para esos valores de etiqueta (una serie nula si las métricas están desactivadas).
+        """
+        if not ENABLED:
+            return _NOOP
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.label_names, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def series(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        if ENABLED:
+            self._default().inc(amount)
+
+    def total(self):
+        return sum(child.value for _, child in self.series())
+
+    def render(self):
+        return [f"{self.name}{self._label_text(values)} {child.value:g}" for values, child in self.series()]
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        if ENABLED:
+            self._default().set(value)
+
+    def total(self):
+        return sum(child.value for _, child in self.series())
+
+    def render(self):
+        return [f"{self.name}{self._label_text(values)} {child.value:g}" for values, child in self.series()]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        if ENABLED:
+            self._default().observe(value)
+
+    def time(self, *label_values):
+        """
+        Context manager que observa la duración del bloque (no mide nada si están desactivadas).
+        """
+        if not ENABLED:
+            return _NULL_TIMER
+        return _Timer(self.labels(*label_values))
+
+    def merged(self):
+        """
+        Devuelve (conteos por bucket, suma, total) sumando todas las series.
+        """
+        counts = [0] * (len(self.buckets) + 1)
+        total_sum = 0.0
+        total = 0
+        for _, child in self.series():
+            for i, c in enumerate(child.counts):
+                counts[i] += c
+            total_sum += child.sum
+            total += child.count
+        return counts, total_sum, total
+
+    def quantile(self, fraction):
+        """
+        Cuantil aproximado (límite superior del bucket) sobre todas las series.
+        """
+        counts, _, total = self.merged()
+        if not total:
+            return 0.0
+        target = fraction * total
+        running = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            running += c
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = []
+        for values, child in self.series():
+            running = 0
+            for bound, c in zip(self.buckets + (float("inf"),), child.counts):
+                running += c
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {running}")
+            lines.append(f"{self.name}_sum{self._label_text(values)} {child.sum:g}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def render():
+    """
+    Todas las métricas en el formato de texto de Prometheus.
+    """
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class SummaryReporter(threading.Thread):
+    """
+    Imprime cada cierto tiempo una línea con los totales y tasas de cada métrica.
+    """
+
+    def __init__(self, interval=SUMMARY_INTERVAL):
+        super().__init__(name="metrics-summary", daemon=True)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._last = {}
+        self._last_time = time.monotonic()
+
+    def summary_line(self):
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-9)
+        self._last_time = now
+        parts = []
+        with _registry_lock:
+            metrics = list(_registry)
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                _, total_sum, count = metric.merged()
+                if count:
+                    parts.append(f"{metric.name}: n={count} media={total_sum / count * 1000:.1f}ms "
+                                 f"p95<={metric.quantile(0.95) * 1000:g}ms")
+            elif isinstance(metric, Counter):
+                total = metric.total()
+                if total:
+                    rate = (total - self._last.get(metric.name, 0.0)) / elapsed
+                    self._last[metric.name] = total
+                    parts.append(f"{metric.name}={total:g} ({rate:.1f}/s)")
+            elif metric.series():
+                parts.append(f"{metric.name}={metric.total():g}")
+        return "[métricas] " + ("; ".join(parts) if parts else "sin datos")
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            print(self.summary_line())
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_http_server(port=PORT, host=HOST):
+    """
+    Sirve /metrics en un hilo en segundo plano. Devuelve el servidor.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Métricas disponibles en http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_from_env():
+    """
+    Arranca el endpoint y el resumen periódico según METRICS_*; no hace nada si están desactivadas.
+    """
+    if not ENABLED:
+        return None
+    reporter = None
+    if PORT:
+        start_http_server(PORT, HOST)
+    if SUMMARY_INTERVAL > 0:
+        reporter = SummaryReporter(SUMMARY_INTERVAL)
+        reporter.start()
+    return reporter
+
+
+# Métricas de cada etapa
+ENCODING_DETECTION_SECONDS = Histogram(
+    "opc_encoding_detection_seconds", "Tiempo de detección de la codificación de un archivo")
+RECORDS_PARSED = Counter(
+    "opc_records_parsed_total", "Registros (variable, timestamp, valor) leídos de archivos", ("source",))
+HTTP_REQUEST_SECONDS = Histogram(
+    "opc_http_request_seconds", "Latencia de las peticiones a la API OPC por tag", ("tag",))
+HTTP_ERRORS = Counter(
+    "opc_http_errors_total", "Errores de las peticiones a la API OPC por tag y motivo", ("tag", "reason"))
+HTTP_BATCH_SECONDS = Histogram(
+    "opc_http_batch_request_seconds", "Latencia de las lecturas por lotes a la API OPC")
+DB_BATCH_SECONDS = Histogram(
+    "opc_db_batch_seconds", "Latencia del envío de un lote a la base de datos", ("mode",))
+DB_COMMIT_SECONDS = Histogram(
+    "opc_db_commit_seconds", "Latencia de los commits en la base de datos")
+DB_ROWS_WRITTEN = Counter(
+    "opc_db_rows_written_total", "Filas enviadas a la base de datos")
+OPCUA_NOTIFICATIONS = Counter(
+    "opc_opcua_notifications_total", "Notificaciones de cambio recibidas por suscripción OPC UA", ("scan_class",))
+OPCUA_NOTIFICATION_DELAY_SECONDS = Histogram(
+    "opc_opcua_notification_delay_seconds", "Retraso entre el timestamp de origen y la recepción de la notificación")
+SCAN_SECONDS = Histogram(
+    "opc_scan_seconds", "Duración de cada escaneo por clase", ("scan_class",))
+SCAN_OVERRUNS = Counter(
+    "opc_scan_overruns_total", "Escaneos que terminaron después del siguiente disparo", ("scan_class",))
+UPLOAD_QUEUE_DEPTH = Gauge(
+    "opc_upload_queue_depth", "Escaneos esperando en la cola de subida")
+BUFFER_ROWS = Gauge(
+    "opc_buffer_rows", "Filas pendientes en el búfer local")
@@ -0,0 +1,367 @@
+import threading
+from bulk_writer import BulkWriter, HISTORY_TABLE
+
+SYMBOLS_TABLE = "symbols"
+SAMPLES_TABLE = "symbol_samples"
+SAMPLE_COLUMNS = ("symbol_id", "ts", "value_bool", "value_int", "value_real")
+SAMPLE_KEY = ("symbol_id", "ts")
+
+BOOL_TYPES = ("BOOL",)
+INT_TYPES = ("BYTE", "WORD", "INT", "DINT", "UINT", "USINT", "SINT")
+REAL_TYPES = ("REAL", "LREAL")
+
+# Rango de value_int (INTEGER); los enteros fuera de rango se guardan en value_real
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+SCHEMA_QUERIES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {SYMBOLS_TABLE} (
+        id SMALLSERIAL PRIMARY KEY,
+        module VARCHAR(255) NOT NULL,
+        symbol VARCHAR(255) NOT NULL,
+        address VARCHAR(255) NOT NULL DEFAULT '',
+        data_type VARCHAR(50),
+        comment TEXT,
+        UNIQUE (module, symbol)
+    );
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {SAMPLES_TABLE} (
+        symbol_id SMALLINT NOT NULL REFERENCES {SYMBOLS_TABLE} (id),
+        ts TIMESTAMPTZ NOT NULL,
+        value_bool BOOLEAN,
+        value_int INTEGER,
+        value_real DOUBLE PRECISION
+    );
+    """,
+    # Vista con el mismo aspecto que la tabla ancha, para consultas existentes
+    f"""
+    CREATE OR REPLACE VIEW {SAMPLES_TABLE}_wide AS
+    SELECT s.module, s.address, s.symbol, s.data_type, s.comment,
+           COALESCE(v.value_bool::text, v.value_int::text, v.value_real::text) AS value,
+           v.ts AS "timestamp"
+    FROM {SAMPLES_TABLE} v
+    JOIN {SYMBOLS_TABLE} s ON s.id = v.symbol_id;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name VARCHAR(255) PRIMARY KEY,
+        applied_at TIMESTAMPTZ DEFAULT NOW()
+    );
+    """,
+]
+
+
+def _sql_list(values):
+    return "(" + ", ".join(f"'{v}'" for v in values) + ")"
+
+
+MIGRATION_NAME = "normalize_chocolatin_variables_history"
+
+MIGRATION_QUERIES = [
+    f"""
+    INSERT INTO {SYMBOLS_TABLE} (module, symbol, address, data_type, comment)
+    SELECT DISTINCT ON (module, symbol) module, symbol, address, data_type, comment
+    FROM {HISTORY_TABLE}
+    WHERE symbol IS NOT NULL AND symbol <> ''
+    ORDER BY module, symbol, "timestamp" DESC
+    ON CONFLICT (module, symbol) DO NOTHING;
+    """,
+    f"""
+    INSERT INTO {SAMPLES_TABLE} (symbol_id, ts, value_bool, value_int, value_real)
+    SELECT s.id, h."timestamp",
+           CASE WHEN upper(h.data_type) IN {_sql_list(BOOL_TYPES)} AND h.value <> ''
+                THEN lower(h.value) IN ('true', 't', '1') END,
+           CASE WHEN upper(h.data_type) IN {_sql_list(INT_TYPES)} AND h.value ~ '^-?[0-9]+$'
+                     AND h.value::numeric BETWEEN {INT_MIN} AND {INT_MAX}
+                THEN h.value::integer END,
+           CASE WHEN upper(h.data_type) IN {_sql_list(REAL_TYPES)}
+                     AND h.value ~ '^-?[0-9]+(\\.[0-9]+)?([eE][-+]?[0-9]+)?$'
+                THEN h.value::double precision
+                WHEN upper(h.data_type) IN {_sql_list(INT_TYPES)} AND h.value ~ '^-?[0-9]+$'
+                     AND h.value::numeric NOT BETWEEN {INT_MIN} AND {INT_MAX}
+                THEN h.value::numeric::double precision END
+    FROM {HISTORY_TABLE} h
+    JOIN {SYMBOLS_TABLE} s ON s.module = h.module AND s.symbol = h.symbol
+    ON CONFLICT (symbol_id, ts) DO NOTHING;
+    """,
+]
+
+_schema_ready = False
+_sample_keyed = False
+_schema_lock = threading.Lock()
+
+
+def _bool_value(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "t", "1")
+
+
+def _int_value(value):
+    number = int(value)
+    if INT_MIN <= number <= INT_MAX:
+        return None, number, None
+    return None, None, float(number)
+
+
+def typed_value(value, data_type):
+    """
+    Devuelve (value_bool, value_int, value_real) según el tipo de dato del símbolo.
+    """
+    if value is None or value == '':
+        return None, None, None
+
+    data_type = (data_type or '').upper()
+    try:
+        if data_type in BOOL_TYPES:
+            return _bool_value(value), None, None
+        if data_type in INT_TYPES:
+            return _int_value(value)
+        if data_type in REAL_TYPES:
+            return None, None, float(value)
+    except (TypeError, ValueError):
+        return None, None, None
+
+    # Tipo desconocido: deducirlo del valor
+    if isinstance(value, bool) or str(value).lower() in ("true", "false"):
+        return _bool_value(value), None, None
+    try:
+        return _int_value(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return None, None, float(value)
+    except (TypeError, ValueError):
+        return None, None, None
+
+
+def ensure_schema(connection):
+    """
+    Crea las tablas normalizadas y migra la tabla ancha una sola vez por proceso.
+    Devuelve si symbol_samples tiene el índice único de SAMPLE_KEY.
+    """
+    global _schema_ready, _sample_keyed
+    with _schema_lock:
+        if _schema_ready:
+            return _sample_keyed
+        cursor = connection.cursor()
+        try:
+            for query in SCHEMA_QUERIES:
+                cursor.execute(query)
+            _sample_keyed = _ensure_sample_key(cursor)
+            if _sample_keyed:
+                migrate_from_history(connection, cursor)
+            else:
+                print("Warning: La migración desde la tabla ancha se aplaza hasta que exista el índice único.")
+        finally:
+            cursor.close()
+        connection.commit()
+        _schema_ready = True
+        return _sample_keyed
+
+
+def _sample_duplicates(cursor):
+    cursor.execute(
+        f"SELECT count(*) FROM (SELECT 1 FROM {SAMPLES_TABLE} "
+        f"GROUP BY symbol_id, ts HAVING count(*) > 1) d"
+    )
+    rows = cursor.fetchall()
+    return rows[0][0] if rows else 0
+
+
+def _ensure_sample_key(cursor):
+    """
+    Crea el índice único (symbol_id, ts) y devuelve si existe. Como en la tabla
+    ancha, nunca borra filas: con muestras repetidas avisa y no crea el índice.
+    """
+    index_name = f"{SAMPLES_TABLE}_symbol_ts_key"
+    cursor.execute("SELECT to_regclass(%s)", (index_name,))
+    rows = cursor.fetchall()
+    if rows and rows[0][0] is not None:
+        return True
+    duplicates = _sample_duplicates(cursor)
+    if duplicates:
+        print(f"Warning: '{SAMPLES_TABLE}' tiene {duplicates} claves (symbol_id, ts) repetidas; "
+              f"no se crea el índice único y las cargas no evitarán duplicados. Revíselas y ejecute "
+              f"'python main.py --deduplicate-history' para borrar las filas idénticas.")
+        return False
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {SAMPLES_TABLE} (symbol_id, ts)")
+    cursor.execute(f"DROP INDEX IF EXISTS {SAMPLES_TABLE}_symbol_ts_idx")
+    return True
+
+
+def deduplicate_samples(connection):
+    """
+    Migración explícita: borra las muestras idénticas (mismo symbol_id, ts y
+    valor) y crea el índice único. Devuelve si el índice existe.
+    """
+    global _schema_ready
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"DELETE FROM {SAMPLES_TABLE} a USING {SAMPLES_TABLE} b "
+            f"WHERE a.symbol_id = b.symbol_id AND a.ts = b.ts "
+            f"AND a.value_bool IS NOT DISTINCT FROM b.value_bool "
+            f"AND a.value_int IS NOT DISTINCT FROM b.value_int "
+            f"AND a.value_real IS NOT DISTINCT FROM b.value_real AND a.ctid > b.ctid"
+        )
+        deleted = getattr(cursor, "rowcount", -1)
+        print(f"Eliminadas {deleted if deleted and deleted > 0 else 0} muestras idénticas de '{SAMPLES_TABLE}'.")
+        conflicting = _sample_duplicates(cursor)
+        if conflicting:
+            print(f"Quedan {conflicting} claves repetidas con valores distintos; hay que resolverlas a mano.")
+        keyed = _ensure_sample_key(cursor)
+    finally:
+        cursor.close()
+    connection.commit()
+    with _schema_lock:
+        _schema_ready = False
+    return keyed
+
+
+def migrate_from_history(connection, cursor=None):
+    """
+    Copia una única vez los datos de la tabla ancha al esquema normalizado.
+    """
+    own_cursor = cursor is None
+    cursor = cursor or connection.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM schema_migrations WHERE name = %s", (MIGRATION_NAME,))
+        if cursor.fetchall():
+            return False
+        cursor.execute("SELECT to_regclass(%s)", (HISTORY_TABLE,))
+        if cursor.fetchall()[0][0] is not None:
+            print(f"Migrando '{HISTORY_TABLE}' al esquema normalizado...")
+            for query in MIGRATION_QUERIES:
+                cursor.execute(query)
+            print("Migración completada.")
+        cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (MIGRATION_NAME,))
+        return True
+    finally:
+        if own_cursor:
+            cursor.close()
+
+
+class NormalizedHistoryWriter:
+    """
+    Escritor para el esquema normalizado: tabla de símbolos + muestras estrechas.
+
+    Acepta las mismas filas que BulkWriter para la tabla ancha
+    (module, address, symbol, data_type, comment, value, timestamp) y guarda
+    solo (symbol_id, ts, valor tipado). Los id de símbolo se cachean en memoria;
+    los creados en la transacción actual solo pasan a la caché compartida
+    tras el commit, para que un rollback no deje ids inexistentes en ella.
+    on_inserted recibe, como filas de la tabla ancha, las muestras que entraron.
+    """
+
+    # Caché compartida entre escritores del proceso: (module, symbol) -> id
+    _symbol_ids = {}
+    _symbol_lock = threading.Lock()
+
+    def __init__(self, connection, batch_size=None, commit_interval=None, use_copy=None):
+        self.connection = connection
+        keyed = ensure_schema(connection)
+        self._samples = BulkWriter(connection, table_name=SAMPLES_TABLE, columns=SAMPLE_COLUMNS,
+                                   batch_size=batch_size, commit_interval=commit_interval,
+                                   use_copy=use_copy, conflict_key=SAMPLE_KEY if keyed else None)
+        self._pending_ids = {}
+        # symbol_id -> (module, address, symbol, data_type, comment) de las filas escritas
+        self._symbol_rows = {}
+        self._on_inserted = None
+        if not self._symbol_ids:
+            self._load_symbol_ids()
+
+    @property
+    def rows_written(self):
+        return self._samples.rows_written
+
+    @property
+    def on_inserted(self):
+        return self._on_inserted
+
+    @on_inserted.setter
+    def on_inserted(self, callback):
+        self._on_inserted = callback
+        self._samples.on_inserted = self._samples_inserted if callback is not None else None
+
+    def _samples_inserted(self, samples):
+        rows = []
+        for symbol_id, ts, value_bool, value_int, value_real in samples:
+            module, address, symbol, data_type, comment = self._symbol_rows[symbol_id]
+            if value_bool is not None:
+                value = 'true' if value_bool else 'false'
+            else:
+                value = next((str(v) for v in (value_int, value_real) if v is not None), '')
+            rows.append((module, address, symbol, data_type, comment, value, ts))
+        self._on_inserted(rows)
+
+    def _load_symbol_ids(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"SELECT module, symbol, id FROM {SYMBOLS_TABLE}")
+            with self._symbol_lock:
+                for module, symbol, symbol_id in cursor.fetchall():
+                    self._symbol_ids[(module, symbol)] = symbol_id
+        finally:
+            cursor.close()
+
+    def symbol_id(self, module, address, symbol, data_type, comment):
+        """
+        Devuelve el id del símbolo, creándolo si no existe.
+        """
+        key = (module, symbol)
+        symbol_id = self._symbol_ids.get(key) or self._pending_ids.get(key)
+        if symbol_id is not None:
+            return symbol_id
+
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                f"""
+                INSERT INTO {SYMBOLS_TABLE} (module, symbol, address, data_type, comment)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (module, symbol) DO UPDATE SET address = EXCLUDED.address
+                RETURNING id
+                """,
+                (module, symbol, address or '', data_type, comment)
+            )
+            symbol_id = cursor.fetchall()[0][0]
+        finally:
+            cursor.close()
+        self._pending_ids[key] = symbol_id
+        return symbol_id
+
+    def write(self, row):
+        module, address, symbol, data_type, comment, value, timestamp = row
+        symbol_id = self.symbol_id(module, address, symbol, data_type, comment)
+        self._symbol_rows[symbol_id] = (module, address, symbol, data_type, comment)
+        self._samples.write((symbol_id, timestamp) + typed_value(value, data_type))
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        self._samples.flush()
+
+    def commit(self):
+        self._samples.commit()
+        if self._pending_ids:
+            with self._symbol_lock:
+                self._symbol_ids.update(self._pending_ids)
+            self._pending_ids = {}
+
+    def report(self):
+        self._samples.report()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self._pending_ids = {}
+            self._samples.__exit__(exc_type, exc, tb)
+        return False
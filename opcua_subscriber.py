@@ -0,0 +1,215 @@
+import asyncio
+from datetime import datetime, timezone
+from api_config import api_config
+import metrics
+
+# Tipos con banda muerta absoluta en el servidor (en los Bool/Int basta con el cambio de valor)
+DEADBAND_TYPES = ("REAL", "LREAL")
+
+
+def _as_utc(moment):
+    # asyncua devuelve los timestamps en UTC, con o sin zona según la versión
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+def local_timestamp(moment):
+    """
+    Timestamp ISO en hora local sin zona, el mismo formato que usa el sondeo HTTP.
+    """
+    if moment is None:
+        return datetime.now().isoformat()
+    return _as_utc(moment).astimezone().replace(tzinfo=None).isoformat()
+
+
+class _SubscriptionHandler:
+    """
+    Recibe las notificaciones de una suscripción de asyncua (una por clase de escaneo).
+    """
+
+    def __init__(self, subscriber, scan_class):
+        self.subscriber = subscriber
+        self.scan_class = scan_class
+
+    def datachange_notification(self, node, val, data):
+        self.subscriber.on_data_change(self.scan_class, node, val, data.monitored_item.Value)
+
+    def status_change_notification(self, status):
+        print(f"Cambio de estado en la suscripción '{self.scan_class}': {status}")
+
+
+class OPCUASubscriber:
+    """
+    Backend de adquisición por suscripción directa a un servidor OPC UA (asyncua).
+
+    Crea una suscripción por clase de escaneo cuyo periodo de publicación y
+    de muestreo es el de la clase, con un monitored item por símbolo; los Real
+    llevan banda muerta absoluta (DEADBAND_REAL_ABS) aplicada en el servidor.
+    Las notificaciones llegan solo cuando un valor cambia y se entregan cada
+    flush_interval segundos a deliver como lista de lecturas con el formato de
+    build_symbol_data, con el timestamp de origen del servidor. Si la sesión
+    se pierde se reconecta y se vuelven a crear las suscripciones.
+    """
+
+    def __init__(self, groups, deliver, intervals, endpoint=None, node_id_template=None,
+                 deadband=None, queue_size=None, flush_interval=None, reconnect_delay=None, timeout=None):
+        self.groups = groups
+        self.deliver = deliver
+        self.intervals = intervals
+        self.endpoint = endpoint or api_config.OPCUA_ENDPOINT
+        self.node_id_template = node_id_template or api_config.OPCUA_NODE_ID_TEMPLATE
+        self.deadband = api_config.DEADBAND_REAL_ABS if deadband is None else deadband
+        self.queue_size = api_config.OPCUA_QUEUE_SIZE if queue_size is None else queue_size
+        self.flush_interval = flush_interval or api_config.OPCUA_FLUSH_INTERVAL
+        self.reconnect_delay = api_config.OPCUA_RECONNECT_DELAY if reconnect_delay is None else reconnect_delay
+        self.timeout = timeout or api_config.OPCUA_TIMEOUT
+
+        self.notifications = 0
+        self.bad_values = 0
+        self.delivered = 0
+        self.sessions = 0
+        self.monitored_items = 0
+        self._tags = {}
+        self._pending = []
+        self._loop = None
+        self._stop = None
+
+    def node_id(self, symbol_config):
+        return self.node_id_template.format(symbol=symbol_config["symbol"])
+
+    def on_data_change(self, scan_class, node, value, data_value):
+        """
+        Convierte una notificación en una lectura y la deja pendiente de entrega.
+        """
+        symbol_config = self._tags.get(node.nodeid)
+        if symbol_config is None:
+            return
+        status = getattr(data_value, "StatusCode", None)
+        success = status is None or status.is_good()
+        source_time = data_value.SourceTimestamp or data_value.ServerTimestamp
+
+        self.notifications += 1
+        if not success:
+            self.bad_values += 1
+        metrics.OPCUA_NOTIFICATIONS.labels(scan_class).inc()
+        if source_time is not None and metrics.enabled():
+            delay = (datetime.now(timezone.utc) - _as_utc(source_time)).total_seconds()
+            metrics.OPCUA_NOTIFICATION_DELAY_SECONDS.observe(max(delay, 0.0))
+
+        self._pending.append({
+            "success": success,
+            "symbol": symbol_config["symbol"],
+            "address": symbol_config["address"],
+            "data_type": symbol_config["data_type"],
+            "value": value if success else None,
+            "timestamp": local_timestamp(source_time)
+        })
+
+    def _take_pending(self):
+        symbols_data, self._pending = self._pending, []
+        self.delivered += len(symbols_data)
+        return symbols_data
+
+    async def _flush(self):
+        if self._pending:
+            # La entrega puede bloquear (cola llena, SQLite): fuera del bucle de eventos
+            await asyncio.get_running_loop().run_in_executor(None, self.deliver, self._take_pending())
+
+    def _monitored_item_request(self, ua, node, symbol_config, handle, interval_ms):
+        parameters = ua.MonitoringParameters()
+        parameters.ClientHandle = handle
+        parameters.SamplingInterval = interval_ms
+        parameters.QueueSize = self.queue_size
+        parameters.DiscardOldest = True
+        if self.deadband > 0 and symbol_config["data_type"].upper() in DEADBAND_TYPES:
+            data_filter = ua.DataChangeFilter()
+            data_filter.Trigger = ua.DataChangeTrigger.StatusValue
+            data_filter.DeadbandType = ua.DeadbandType.Absolute
+            data_filter.DeadbandValue = self.deadband
+            parameters.Filter = data_filter
+
+        request = ua.MonitoredItemCreateRequest()
+        request.ItemToMonitor = ua.ReadValueId(NodeId=node.nodeid, AttributeId=ua.AttributeIds.Value)
+        request.MonitoringMode = ua.MonitoringMode.Reporting
+        request.RequestedParameters = parameters
+        return request
+
+    async def _subscribe(self, client):
+        from asyncua import ua
+
+        self._tags = {}
+        self.monitored_items = 0
+        for scan_class, symbols_config in self.groups.items():
+            interval_ms = self.intervals[scan_class] * 1000
+            subscription = await client.create_subscription(interval_ms, _SubscriptionHandler(self, scan_class))
+
+            # Un único CreateMonitoredItems por clase, con muestreo y filtro explícitos
+            requests = []
+            for handle, symbol_config in enumerate(symbols_config, start=1):
+                node = client.get_node(self.node_id(symbol_config))
+                self._tags[node.nodeid] = symbol_config
+                requests.append(self._monitored_item_request(ua, node, symbol_config, handle, interval_ms))
+            if not requests:
+                continue
+
+            try:
+                results = await subscription.create_monitored_items(requests)
+            except ua.UaError as e:
+                print(f"Warning: No se pudieron monitorizar los tags de '{scan_class}': {e}")
+                continue
+            for symbol_config, request, result in zip(symbols_config, requests, results):
+                if isinstance(result, ua.StatusCode):
+                    print(f"Warning: No se pudo monitorizar {symbol_config['symbol']} "
+                          f"({request.ItemToMonitor.NodeId}): {result}")
+                else:
+                    self.monitored_items += 1
+
+    async def _run_session(self):
+        from asyncua import Client
+
+        async with Client(url=self.endpoint, timeout=self.timeout) as client:
+            self.sessions += 1
+            await self._subscribe(client)
+            print(f"Conectado a {self.endpoint}: {self.monitored_items} de {len(self._tags)} tags suscritos")
+            while not self._stop.is_set():
+                try:
+                    await asyncio.wait_for(self._stop.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self._flush()
+                await client.check_connection()
+
+    async def run(self):
+        """
+        Mantiene la sesión y las suscripciones hasta que se llame a stop().
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        try:
+            while not self._stop.is_set():
+                try:
+                    await self._run_session()
+                except Exception as e:
+                    print(f"Sesión OPC UA interrumpida ({e}); reconectando en {self.reconnect_delay} s")
+                    await self._flush()
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), self.reconnect_delay)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            # También al cancelar (Ctrl+C): no perder lo ya recibido
+            if self._pending:
+                self.deliver(self._take_pending())
+
+    def run_forever(self):
+        asyncio.run(self.run())
+
+    def stop(self):
+        """
+        Pide terminar; se puede llamar desde otro hilo.
+        """
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def report(self):
+        print(f"OPC UA: {self.notifications} notificaciones ({self.bad_values} con calidad mala), "
+              f"{self.delivered} lecturas entregadas, {self.sessions} sesiones")
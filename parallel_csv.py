@@ -0,0 +1,159 @@
+import csv
+import glob
+import io
+import mmap
+import os
+from collections import deque
+from csv_records import build_variable_mapping, iter_row_records, stream_codec
+from encoding_detection import detect_encoding
+import metrics
+
+# Tamaño objetivo de cada trozo que procesa un worker (bytes)
+CHUNK_SIZE = int(os.getenv("CSV_PARALLEL_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Trozos en vuelo por worker: limita la memoria sin dejar procesos ociosos
+IN_FLIGHT_PER_WORKER = 2
+
+
+class CsvLayout:
+    """
+    Lo que todos los trozos de un archivo comparten: codificación, salto de línea y cabecera.
+    """
+
+    __slots__ = ("path", "codec", "newline", "headers", "data_start", "size")
+
+    def __init__(self, path, codec, newline, headers, data_start, size):
+        self.path = path
+        self.codec = codec
+        self.newline = newline
+        self.headers = headers
+        self.data_start = data_start
+        self.size = size
+
+
+def _aligned_find(data, newline, start, end=None):
+    """
+    Primer salto de línea en data[start:end] alineado al ancho del carácter, o -1.
+    """
+    width = len(newline)
+    i = data.find(newline, start, end) if end is not None else data.find(newline, start)
+    while i >= 0 and i % width:
+        i = data.find(newline, i + 1, end) if end is not None else data.find(newline, i + 1)
+    return i
+
+
+def read_layout(file_path, encoding=None):
+    """
+    Detecta la codificación y lee la cabecera del archivo. Devuelve None si está vacío.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return None
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        encoding = encoding or detect_encoding(file_path) or 'latin-1'
+        codec, newline, bom_length = stream_codec(encoding, data[:4])
+        header_end = _aligned_find(data, newline, bom_length)
+        header_end = size if header_end < 0 else header_end + len(newline)
+        header_line = data[bom_length:header_end].decode(codec, errors='replace').rstrip('\r\n')
+    headers = next(csv.reader([header_line], delimiter=';'), [])
+    return CsvLayout(file_path, codec, newline, headers, header_end, size)
+
+
+def chunk_ranges(layout, chunk_size=CHUNK_SIZE):
+    """
+    Divide el cuerpo del archivo en rangos [inicio, fin) que terminan en un salto de línea.
+    """
+    if layout.data_start >= layout.size:
+        return []
+    ranges = []
+    with open(layout.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = layout.data_start
+        while start < layout.size:
+            target = start + chunk_size
+            if target >= layout.size:
+                end = layout.size
+            else:
+                i = _aligned_find(data, layout.newline, target)
+                end = layout.size if i < 0 else i + len(layout.newline)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_chunk(file_path, start, end, codec, headers):
+    """
+    Parsea las líneas del rango [start, end) y devuelve un SampleBatch.
+
+    Se ejecuta en los procesos del pool: solo recibe datos simples y el
+    resultado columnar se serializa de forma compacta. Los registros no se
+    cuentan aquí (las métricas de un worker no llegan al proceso padre), sino
+    en iter_symbols_parallel con el tamaño de cada lote devuelto.
+    """
+    from sample_batch import SampleBatch
+    from timestamp_parser import TimestampParser
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end].decode(codec, errors='replace')
+
+    variable_mapping = build_variable_mapping(headers)
+    timestamp_parsers = {variable_name: TimestampParser() for variable_name in variable_mapping}
+    rows = csv.reader(io.StringIO(text), delimiter=';')
+    return SampleBatch(iter_row_records(rows, variable_mapping, timestamp_parsers))
+
+
+def _iter_tasks(file_paths, chunk_size):
+    for file_path in file_paths:
+        layout = read_layout(file_path)
+        if layout is None:
+            print(f"Archivo vacío: {file_path}")
+            continue
+        ranges = chunk_ranges(layout, chunk_size)
+        print(f"{file_path}: {len(ranges)} trozos, codificación {layout.codec}")
+        for start, end in ranges:
+            yield (file_path, start, end, layout.codec, layout.headers)
+
+
+def iter_symbols_parallel(file_paths, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Parsea uno o varios CSV en paralelo y genera un SampleBatch por trozo.
+
+    Cada archivo se mapea en memoria y se divide en trozos alineados a salto de
+    línea que se reparten entre workers procesos con la cabecera compartida.
+    Los lotes se generan en el orden del archivo (que en las exportaciones de
+    WinCC es el orden de timestamps) y con un número acotado de trozos en
+    vuelo, así que se pueden pasar directamente a upload_symbols_to_sql.
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    workers = workers or os.cpu_count() or 1
+
+    parsed = metrics.RECORDS_PARSED.labels("csv")
+    tasks = _iter_tasks(file_paths, chunk_size)
+    if workers == 1:
+        for task in tasks:
+            batch = parse_chunk(*task)
+            parsed.inc(len(batch))
+            yield batch
+        return
+
+    # multiprocessing se importa aquí para no retrasar el arranque
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task in tasks:
+            pending.append(executor.submit(parse_chunk, *task))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                batch = pending.popleft().result()
+                parsed.inc(len(batch))
+                yield batch
+        while pending:
+            batch = pending.popleft().result()
+            parsed.inc(len(batch))
+            yield batch
+
+
+def find_export_files(directory, pattern="*.csv"):
+    """
+    Archivos de exportación de la carpeta, ordenados por nombre.
+    """
+    return sorted(path for path in glob.glob(os.path.join(directory, pattern)) if os.path.isfile(path))
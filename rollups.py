@@ -0,0 +1,315 @@
+import threading
+from datetime import datetime, timedelta
+from bulk_writer import execute_sorted_upsert
+from normalized_schema import typed_value
+
+# Tabla de agregados -> duración del intervalo
+ROLLUP_TABLES = {
+    "history_rollup_1m": timedelta(minutes=1),
+    "history_rollup_1h": timedelta(hours=1),
+}
+
+ROLLUP_COLUMNS = ("module", "symbol", "bucket", "samples", "min_value", "max_value", "sum_value",
+                  "last_value", "last_ts", "true_count", "on_seconds", "transitions")
+
+# Huecos mayores entre dos muestras booleanas no se cuentan como tiempo en true
+MAX_LINK_GAP = timedelta(hours=1)
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _schema_queries(table_name):
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            module VARCHAR(255) NOT NULL,
+            symbol VARCHAR(255) NOT NULL,
+            bucket TIMESTAMPTZ NOT NULL,
+            samples BIGINT NOT NULL DEFAULT 0,
+            min_value DOUBLE PRECISION,
+            max_value DOUBLE PRECISION,
+            sum_value DOUBLE PRECISION,
+            avg_value DOUBLE PRECISION GENERATED ALWAYS AS (sum_value / NULLIF(samples, 0)) STORED,
+            last_value DOUBLE PRECISION,
+            last_ts TIMESTAMPTZ,
+            true_count BIGINT NOT NULL DEFAULT 0,
+            on_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            transitions BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (module, symbol, bucket)
+        );
+        """,
+        f"CREATE INDEX IF NOT EXISTS {table_name}_bucket_idx ON {table_name} (bucket);",
+    ]
+
+
+def _upsert_query(table_name, row_count):
+    placeholders = "(" + ", ".join(["%s"] * len(ROLLUP_COLUMNS)) + ")"
+    return f"""
+    INSERT INTO {table_name} ({", ".join(ROLLUP_COLUMNS)})
+    VALUES {", ".join([placeholders] * row_count)}
+    ON CONFLICT (module, symbol, bucket) DO UPDATE SET
+        samples = {table_name}.samples + EXCLUDED.samples,
+        min_value = LEAST({table_name}.min_value, EXCLUDED.min_value),
+        max_value = GREATEST({table_name}.max_value, EXCLUDED.max_value),
+        sum_value = COALESCE({table_name}.sum_value + EXCLUDED.sum_value,
+                             {table_name}.sum_value, EXCLUDED.sum_value),
+        last_value = CASE WHEN {table_name}.last_ts IS NULL OR EXCLUDED.last_ts >= {table_name}.last_ts
+                          THEN EXCLUDED.last_value ELSE {table_name}.last_value END,
+        last_ts = GREATEST({table_name}.last_ts, EXCLUDED.last_ts),
+        true_count = {table_name}.true_count + EXCLUDED.true_count,
+        on_seconds = {table_name}.on_seconds + EXCLUDED.on_seconds,
+        transitions = {table_name}.transitions + EXCLUDED.transitions
+    """
+
+
+def ensure_rollup_tables(connection):
+    """
+    Crea las tablas de agregados una sola vez por proceso.
+    """
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        cursor = connection.cursor()
+        try:
+            for table_name in ROLLUP_TABLES:
+                for query in _schema_queries(table_name):
+                    cursor.execute(query)
+        finally:
+            cursor.close()
+        connection.commit()
+        _schema_ready = True
+
+
+def _to_datetime(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp
+    try:
+        return datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return None
+
+
+def _bucket_start(moment, width):
+    if width >= timedelta(hours=1):
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+class _Bucket:
+    __slots__ = ("samples", "min_value", "max_value", "sum_value", "last_value", "last_ts",
+                 "true_count", "on_seconds", "transitions")
+
+    def __init__(self):
+        self.samples = 0
+        self.min_value = None
+        self.max_value = None
+        self.sum_value = None
+        self.last_value = None
+        self.last_ts = None
+        self.true_count = 0
+        self.on_seconds = 0.0
+        self.transitions = 0
+
+
+class RollupAggregator:
+    """
+    Agrega en memoria las muestras de un lote por símbolo en intervalos de 1 minuto y 1 hora.
+
+    Real/Int: mínimo, máximo, suma (la media la calcula la tabla) y último valor.
+    Bool: muestras a true, segundos en true y número de transiciones. El tiempo
+    en true se reparte entre los intervalos que cruza, y el último estado de
+    cada símbolo se recuerda entre lotes para enlazar un lote con el siguiente.
+    Los estados vistos en la transacción actual solo pasan al estado compartido
+    con commit(), para que un rollback no deje enlaces a muestras que no se guardaron.
+    """
+
+    # Último (timestamp, valor) booleano por símbolo, compartido en el proceso
+    _last_bool = {}
+    _last_bool_lock = threading.Lock()
+
+    def __init__(self, tables=None):
+        self.tables = tables or ROLLUP_TABLES
+        self._buckets = {table_name: {} for table_name in self.tables}
+        self._pending_bool = {}
+        self.pending_rows = 0
+
+    def _previous_bool(self, key):
+        previous = self._pending_bool.get(key)
+        if previous is None:
+            with self._last_bool_lock:
+                previous = self._last_bool.get(key)
+        return previous
+
+    def _bucket(self, table_name, module, symbol, moment):
+        key = (module, symbol, _bucket_start(moment, self.tables[table_name]))
+        buckets = self._buckets[table_name]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _Bucket()
+        return bucket
+
+    def _add_on_time(self, table_name, module, symbol, start, end):
+        # Reparte [start, end) entre los intervalos que atraviesa
+        width = self.tables[table_name]
+        while start < end:
+            bucket_end = _bucket_start(start, width) + width
+            segment_end = min(end, bucket_end)
+            self._bucket(table_name, module, symbol, start).on_seconds += (segment_end - start).total_seconds()
+            start = segment_end
+
+    def add(self, row):
+        """
+        Añade una fila de históricos (module, address, symbol, data_type, comment, value, timestamp).
+        """
+        module, _, symbol, data_type, _, value, timestamp = row
+        moment = _to_datetime(timestamp)
+        if not symbol or moment is None:
+            return
+        value_bool, value_int, value_real = typed_value(value, data_type)
+        number = value_real if value_real is not None else value_int
+
+        if value_bool is not None:
+            previous = self._previous_bool((module, symbol))
+            if previous is None or previous[0] <= moment:
+                self._pending_bool[(module, symbol)] = (moment, value_bool)
+
+        for table_name in self.tables:
+            bucket = self._bucket(table_name, module, symbol, moment)
+            bucket.samples += 1
+            if bucket.last_ts is None or moment >= bucket.last_ts:
+                bucket.last_ts = moment
+                if number is not None:
+                    bucket.last_value = number
+                elif value_bool is not None:
+                    bucket.last_value = 1.0 if value_bool else 0.0
+
+            if number is not None:
+                bucket.min_value = number if bucket.min_value is None else min(bucket.min_value, number)
+                bucket.max_value = number if bucket.max_value is None else max(bucket.max_value, number)
+                bucket.sum_value = number if bucket.sum_value is None else bucket.sum_value + number
+            elif value_bool is not None:
+                bucket.true_count += value_bool
+                # Solo se enlaza con la muestra anterior si llega en orden
+                if previous is not None and previous[0] <= moment <= previous[0] + MAX_LINK_GAP:
+                    if previous[1] != value_bool:
+                        bucket.transitions += 1
+                    if previous[1]:
+                        self._add_on_time(table_name, module, symbol, previous[0], moment)
+
+        self.pending_rows += 1
+
+    def add_many(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def flush(self, connection):
+        """
+        Inserta o acumula los agregados pendientes en sus tablas (sin commit).
+        """
+        if not self.pending_rows:
+            return
+        cursor = connection.cursor()
+        try:
+            for table_name, buckets in self._buckets.items():
+                rows = [
+                    (module, symbol, bucket_start, b.samples, b.min_value, b.max_value, b.sum_value,
+                     b.last_value, b.last_ts, b.true_count, b.on_seconds, b.transitions)
+                    for (module, symbol, bucket_start), b in buckets.items()
+                ]
+                execute_sorted_upsert(cursor, lambda row_count: _upsert_query(table_name, row_count),
+                                      rows, key=lambda r: (r[0], r[1], r[2]))
+        finally:
+            cursor.close()
+        self._buckets = {table_name: {} for table_name in self.tables}
+        self.pending_rows = 0
+
+    def commit(self):
+        """
+        Publica el último estado booleano de la transacción confirmada.
+        """
+        if not self._pending_bool:
+            return
+        with self._last_bool_lock:
+            for key, (moment, value_bool) in self._pending_bool.items():
+                previous = self._last_bool.get(key)
+                if previous is None or previous[0] <= moment:
+                    self._last_bool[key] = (moment, value_bool)
+        self._pending_bool = {}
+
+    def discard(self):
+        """
+        Olvida los agregados y estados pendientes (la transacción se deshizo).
+        """
+        self._buckets = {table_name: {} for table_name in self.tables}
+        self._pending_bool = {}
+        self.pending_rows = 0
+
+
+class RollupHistoryWriter:
+    """
+    Envoltorio de un escritor de históricos que mantiene también los agregados.
+
+    Solo se agregan las filas que el escritor envuelto insertó de verdad (su
+    on_inserted): una recarga del mismo archivo, --force o el reenvío del
+    búfer tras una caída no cuentan dos veces las muestras que ya estaban.
+    Los agregados de cada lote se envían en cuanto el lote entra, antes de
+    cualquier commit del escritor envuelto, así que siempre quedan en la misma
+    transacción que sus filas. Si el escritor no devuelve el tipo de dato (la
+    tabla ancha solo devuelve module, symbol, value y timestamp), se toma el
+    de las filas escritas de ese símbolo.
+    """
+
+    def __init__(self, writer, connection, batch_size):
+        ensure_rollup_tables(connection)
+        self.writer = writer
+        self.connection = connection
+        self.batch_size = batch_size
+        self.aggregator = RollupAggregator()
+        self._data_types = {}  # (module, symbol) -> data_type de las filas escritas
+        writer.on_inserted = self._rows_inserted
+
+    @property
+    def rows_written(self):
+        return self.writer.rows_written
+
+    def _rows_inserted(self, rows):
+        data_types = self._data_types
+        self.aggregator.add_many(
+            row if row[3] is not None else row[:3] + (data_types.get((row[0], row[2])),) + row[4:]
+            for row in rows
+        )
+        self.aggregator.flush(self.connection)
+
+    def write(self, row):
+        self._data_types[(row[0], row[2])] = row[3]
+        self.writer.write(row)
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        self.writer.flush()
+        self.aggregator.flush(self.connection)
+
+    def commit(self):
+        self.writer.flush()
+        self.aggregator.flush(self.connection)
+        self.writer.commit()
+        self.aggregator.commit()
+
+    def report(self):
+        self.writer.report()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.aggregator.discard()
+            self.writer.__exit__(exc_type, exc, tb)
+        return False
@@ -0,0 +1,137 @@
+import sys
+from array import array
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Marca en la columna de timestamps: el valor original está en _raw_timestamps
+RAW_TIMESTAMP = -(2 ** 63)
+
+
+@lru_cache(maxsize=4096)
+def _timestamp_to_epoch(timestamp):
+    """
+    Convierte un timestamp ISO sin zona horaria a microsegundos desde 1970, o None.
+    """
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None or moment.isoformat() != timestamp:
+        # No se podría reconstruir exactamente el mismo texto
+        return None
+    return (moment - EPOCH) // MICROSECOND
+
+
+@lru_cache(maxsize=4096)
+def _epoch_to_timestamp(epoch_us):
+    return (EPOCH + epoch_us * MICROSECOND).isoformat()
+
+
+class SampleBatch:
+    """
+    Contenedor compacto y columnar de muestras (módulo, entrada).
+
+    Los metadatos (módulo, dirección, símbolo, tipo, comentario) y los valores
+    se guardan una sola vez y cada muestra solo ocupa un id de símbolo, un id
+    de valor y el timestamp en microsegundos desde 1970: 16 bytes por muestra
+    en lugar de un diccionario con seis cadenas. Al recorrerlo se obtienen las
+    mismas tuplas (módulo, entrada) que generan los lectores.
+    """
+
+    __slots__ = ("symbols", "_symbol_ids", "values", "_value_ids",
+                 "symbol_column", "value_column", "timestamp_column", "_raw_timestamps")
+
+    def __init__(self, records=None):
+        self.symbols = []       # [(module, address, symbol, data_type, comment)]
+        self._symbol_ids = {}
+        self.values = []        # valores distintos, tal como se leyeron
+        self._value_ids = {}
+        self.symbol_column = array('I')
+        self.value_column = array('I')
+        self.timestamp_column = array('q')
+        self._raw_timestamps = {}
+        if records is not None:
+            self.extend(records)
+
+    def _intern_symbol(self, key):
+        symbol_id = self._symbol_ids.get(key)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[key] = len(self.symbols)
+            self.symbols.append(tuple(sys.intern(v) if type(v) is str else v for v in key))
+        return symbol_id
+
+    def _intern_value(self, value):
+        value_id = self._value_ids.get(value)
+        if value_id is None:
+            value_id = self._value_ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def append_fields(self, module, address, symbol, data_type, comment, value, timestamp):
+        """
+        Añade una muestra a partir de sus campos.
+        """
+        self.symbol_column.append(self._intern_symbol((module, address, symbol, data_type, comment)))
+        self.value_column.append(self._intern_value(value))
+        epoch_us = _timestamp_to_epoch(timestamp) if type(timestamp) is str else None
+        if epoch_us is None:
+            self._raw_timestamps[len(self.timestamp_column)] = timestamp
+            epoch_us = RAW_TIMESTAMP
+        self.timestamp_column.append(epoch_us)
+
+    def append(self, record):
+        """
+        Añade una tupla (módulo, entrada) con el formato de los lectores.
+        """
+        module, symbol_entry = record
+        self.append_fields(module, symbol_entry.get('Address'), symbol_entry.get('Symbol'),
+                           symbol_entry.get('Data type'), symbol_entry.get('Comment'),
+                           symbol_entry.get('value'), symbol_entry.get('timestamp'))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.timestamp_column)
+
+    def timestamp_at(self, index):
+        epoch_us = self.timestamp_column[index]
+        if epoch_us == RAW_TIMESTAMP:
+            return self._raw_timestamps[index]
+        return _epoch_to_timestamp(epoch_us)
+
+    def iter_fields(self):
+        """
+        Genera tuplas (module, address, symbol, data_type, comment, value, timestamp).
+        """
+        symbols, values = self.symbols, self.values
+        raw = self._raw_timestamps
+        for index, (symbol_id, value_id, epoch_us) in enumerate(
+                zip(self.symbol_column, self.value_column, self.timestamp_column)):
+            timestamp = raw[index] if epoch_us == RAW_TIMESTAMP else _epoch_to_timestamp(epoch_us)
+            yield symbols[symbol_id] + (values[value_id], timestamp)
+
+    def __iter__(self):
+        """
+        Genera las tuplas (módulo, entrada) originales; los diccionarios se crean al vuelo.
+        """
+        for module, address, symbol, data_type, comment, value, timestamp in self.iter_fields():
+            yield module, {
+                'Address': address,
+                'Symbol': symbol,
+                'Data type': data_type,
+                'Comment': comment,
+                'value': value,
+                'timestamp': timestamp
+            }
+
+    def nbytes(self):
+        """
+        Bytes ocupados por las columnas (sin contar las tablas de metadatos y valores).
+        """
+        return sum(column.itemsize * len(column)
+                   for column in (self.symbol_column, self.value_column, self.timestamp_column))
@@ -0,0 +1,156 @@
+import threading
+import time
+import metrics
+
+
+class ScanClass:
+    """
+    Grupo de tags que se escanean con el mismo periodo.
+    """
+
+    def __init__(self, name, interval, callback):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.next_due = None
+        self.scans = 0
+        self.overruns = 0
+        self.missed = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.max_lateness = 0.0
+        # Escaneo en curso en el pool del planificador (None si no hay ninguno)
+        self.future = None
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+
+class ScanScheduler:
+    """
+    Planificador de escaneos a frecuencia fija sobre un reloj monotónico.
+
+    Cada clase de escaneo se dispara en start + k * interval, sin acumular la
+    duración del propio escaneo, por lo que el periodo no deriva. Los escaneos
+    se ejecutan en un pool con un hilo por clase: un escaneo lento de una clase
+    no retrasa a las demás, y una clase nunca se solapa consigo misma. Si un
+    escaneo termina después del siguiente disparo, se cuenta una sobrecarga y
+    se saltan los ciclos perdidos en lugar de ejecutarlos en ráfaga.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=None, report_interval=60.0, executor=None):
+        self.clock = clock
+        self._stop = threading.Event()
+        # Se activa al terminar un escaneo o al parar, para recalcular la espera
+        self._wakeup = threading.Event()
+        self.sleep = sleep or self._wait
+        self.report_interval = report_interval
+        self.executor = executor
+        self.scan_classes = []
+        self._next_report = None
+
+    def add(self, name, interval, callback):
+        if interval <= 0:
+            raise ValueError(f"El periodo de la clase de escaneo '{name}' debe ser positivo")
+        scan_class = ScanClass(name, interval, callback)
+        self.scan_classes.append(scan_class)
+        return scan_class
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _wait(self, timeout):
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def run_pending(self, now=None):
+        """
+        Lanza en el pool las clases cuyo disparo ya venció y que no tienen un
+        escaneo en curso. Devuelve el instante del próximo disparo.
+        """
+        now = self.clock() if now is None else now
+        for scan_class in self.scan_classes:
+            if scan_class.next_due is None:
+                scan_class.next_due = now
+            if not scan_class.running and now >= scan_class.next_due:
+                scan_class.future = self.executor.submit(self._run_scan, scan_class, now)
+        # Las clases en curso fijan su próximo disparo al terminar (y despiertan el bucle)
+        waiting = [c.next_due for c in self.scan_classes if not c.running]
+        if waiting:
+            return min(waiting)
+        return now + min(c.interval for c in self.scan_classes)
+
+    def _run_scan(self, scan_class, started):
+        scan_class.max_lateness = max(scan_class.max_lateness, started - scan_class.next_due)
+        try:
+            scan_class.callback()
+        except Exception as e:
+            print(f"Error en el escaneo '{scan_class.name}': {e}")
+        finished = self.clock()
+
+        duration = finished - started
+        scan_class.scans += 1
+        scan_class.last_duration = duration
+        scan_class.max_duration = max(scan_class.max_duration, duration)
+        metrics.SCAN_SECONDS.labels(scan_class.name).observe(duration)
+
+        scan_class.next_due += scan_class.interval
+        if finished > scan_class.next_due:
+            # Sobrecarga: saltar los disparos que ya pasaron para no ejecutar en ráfaga
+            overrun = finished - scan_class.next_due
+            missed = int(overrun // scan_class.interval) + 1
+            scan_class.overruns += 1
+            metrics.SCAN_OVERRUNS.labels(scan_class.name).inc()
+            scan_class.missed += missed
+            scan_class.next_due += missed * scan_class.interval
+            print(f"Sobrecarga en la clase '{scan_class.name}': {overrun * 1000:.0f} ms tarde sobre el periodo "
+                  f"de {scan_class.interval * 1000:.0f} ms (escaneo de {duration * 1000:.0f} ms, "
+                  f"{missed} ciclo(s) perdido(s))")
+        self._wakeup.set()
+
+    def run(self, max_duration=None):
+        """
+        Ejecuta los escaneos hasta que se llame a stop() o pase max_duration segundos.
+        Al salir espera a los escaneos en curso.
+        """
+        if not self.scan_classes:
+            return
+        own_executor = self.executor is None
+        if own_executor:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=len(self.scan_classes), thread_name_prefix="scan")
+        start = self.clock()
+        self._next_report = start + self.report_interval if self.report_interval else None
+
+        try:
+            while not self._stop.is_set():
+                next_due = self.run_pending()
+                now = self.clock()
+
+                if self._next_report is not None and now >= self._next_report:
+                    self.report()
+                    self._next_report += self.report_interval
+
+                if max_duration is not None and now - start >= max_duration:
+                    break
+
+                wait = next_due - now
+                if wait > 0:
+                    self.sleep(wait)
+        finally:
+            if own_executor:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+    def report(self):
+        """
+        Imprime las estadísticas de cada clase de escaneo.
+        """
+        print("Estadísticas de escaneo:")
+        for scan_class in self.scan_classes:
+            print(f"  - {scan_class.name}: periodo {scan_class.interval} s, {scan_class.scans} escaneos, "
+                  f"último {scan_class.last_duration * 1000:.0f} ms, máximo {scan_class.max_duration * 1000:.0f} ms, "
+                  f"retraso máximo {scan_class.max_lateness * 1000:.0f} ms, "
+                  f"{scan_class.overruns} sobrecargas, {scan_class.missed} ciclos perdidos")
@@ -0,0 +1,188 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import metrics
+
+
+class StoreAndForwardBuffer:
+    """
+    Búfer local persistente (SQLite) donde se escribe cada escaneo antes de subirlo.
+
+    Las filas quedan en disco hasta que el reenviador confirma que se
+    guardaron en Cloud SQL, así que sobreviven a caídas de la red y a
+    reinicios del proceso. Si se supera max_bytes se descartan las filas
+    más antiguas.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buffered_rows ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "payload TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def append(self, rows):
+        """
+        Añade filas (tuplas) al final del búfer en una sola transacción.
+        """
+        if not rows:
+            return
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO buffered_rows (payload) VALUES (?)",
+                [(json.dumps(row),) for row in rows]
+            )
+            self._connection.commit()
+            self._enforce_budget()
+
+    def peek(self, limit):
+        """
+        Devuelve (último id, filas) de las filas más antiguas pendientes, sin borrarlas.
+        """
+        with self._lock:
+            records = self._connection.execute(
+                "SELECT id, payload FROM buffered_rows ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        if not records:
+            return None, []
+        return records[-1][0], [tuple(json.loads(payload)) for _, payload in records]
+
+    def ack(self, last_id):
+        """
+        Confirma (borra) todas las filas hasta last_id inclusive.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM buffered_rows WHERE id <= ?", (last_id,))
+            self._connection.commit()
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM buffered_rows").fetchone()[0]
+
+    def size_bytes(self):
+        """
+        Bytes ocupados por datos (páginas en uso, sin contar las libres).
+        """
+        page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._connection.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self._connection.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def _enforce_budget(self):
+        if not self.max_bytes:
+            return
+        while self.size_bytes() > self.max_bytes:
+            total = self._connection.execute("SELECT COUNT(*) FROM buffered_rows").fetchone()[0]
+            if not total:
+                return
+            # Descartar el 10% más antiguo en cada paso
+            to_drop = max(1, total // 10)
+            self._connection.execute(
+                "DELETE FROM buffered_rows WHERE id IN "
+                "(SELECT id FROM buffered_rows ORDER BY id LIMIT ?)", (to_drop,)
+            )
+            self._connection.commit()
+            self.dropped += to_drop
+            print(f"Warning: Búfer local lleno; descartadas {to_drop} filas antiguas.")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class Forwarder(threading.Thread):
+    """
+    Hilo que vacía el búfer local hacia Cloud SQL en lotes grandes.
+
+    upload_rows recibe una lista de filas y devuelve True si quedaron
+    confirmadas; solo entonces se borran del búfer. Ante un fallo se
+    reintenta con espera exponencial, sin bloquear el bucle de escaneo.
+    """
+
+    def __init__(self, buffer, upload_rows, batch_size=5000, interval=1.0,
+                 retry_delay=5.0, max_retry_delay=300.0):
+        super().__init__(name="store-forward", daemon=True)
+        self.buffer = buffer
+        self.upload_rows = upload_rows
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.forwarded = 0
+        self.failures = 0
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+
+    def notify(self):
+        """
+        Avisa de que hay datos nuevos para reenviar sin esperar al intervalo.
+        """
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._wakeup.set()
+        self.join(timeout)
+
+    def forward_once(self):
+        """
+        Reenvía un lote. Devuelve el número de filas confirmadas, o None si falló.
+        """
+        last_id, rows = self.buffer.peek(self.batch_size)
+        if not rows:
+            return 0
+        try:
+            ok = self.upload_rows(rows)
+        except Exception as e:
+            print(f"Error al reenviar el búfer local: {e}")
+            ok = False
+        if not ok:
+            self.failures += 1
+            return None
+        self.buffer.ack(last_id)
+        self.forwarded += len(rows)
+        if metrics.enabled():
+            metrics.BUFFER_ROWS.set(self.buffer.count())
+        return len(rows)
+
+    def run(self):
+        delay = self.retry_delay
+        while not self._stop_event.is_set():
+            sent = self.forward_once()
+            if sent is None:
+                print(f"Reenvío fallido; {self.buffer.count()} filas pendientes. Reintento en {delay:.0f} s.")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            delay = self.retry_delay
+            if sent < self.batch_size:
+                # Búfer vacío: esperar datos nuevos o el siguiente intervalo
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+
+    def drain(self, timeout=None):
+        """
+        Reenvía todo lo pendiente desde el hilo actual (por ejemplo, al salir).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            sent = self.forward_once()
+            if not sent:
+                return sent == 0
+        return False
+
+
+def open_buffer(path, max_megabytes):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return StoreAndForwardBuffer(path, max_bytes=int(max_megabytes * 1024 * 1024))
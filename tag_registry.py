@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Fuentes de tags separadas por comas (.json con {"tags": [...]} o .xlsx exportado de TIA Portal);
+# las posteriores completan o sobrescriben los campos de las anteriores
+SOURCES = os.getenv("TAG_REGISTRY_SOURCES", "tags.json")
+# Caché JSON del registro compilado, válida mientras las fuentes no cambien; como las
+# fuentes, una ruta relativa se toma respecto a la carpeta del módulo y no del directorio actual
+CACHE_PATH = os.path.join(ROOT, os.getenv("TAG_REGISTRY_CACHE", ".tag_registry.cache"))
+CACHE_VERSION = 2
+
+# Valores para los símbolos que no están en el registro
+DEFAULT_MODULE = 'CSV_Data'
+DEFAULT_ADDRESS = ''
+DEFAULT_DATA_TYPE = 'BOOL'
+
+XLSX_COLUMNS = {'Name': 'symbol', 'Path': 'path', 'Data Type': 'data_type',
+                'Logical Address': 'address', 'Comment': 'comment'}
+
+FIELDS = ("symbol", "module", "address", "data_type", "comment", "scan_class")
+
+def parse_bool(value):
+    """
+    Convierte un Bool leído de la API o del CSV; bool("false") sería True.
+    """
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ("true", "t", "1"):
+        return True
+    if text in ("false", "f", "0"):
+        return False
+    raise ValueError(f"Valor Bool no reconocido: {value!r}")
+
+
+# Conversores por tipo de dato (en mayúsculas); los tipos desconocidos se guardan como texto
+CONVERTERS = {
+    'BOOL': parse_bool,
+    'BYTE': int,
+    'INT': int,
+    'WORD': int,
+    'DINT': int,
+    'DWORD': int,
+    'REAL': float,
+}
+
+
+def converter_for(data_type):
+    """
+    Función de conversión para el tipo de dato indicado.
+    """
+    return CONVERTERS.get(str(data_type).upper(), str)
+
+
+def module_for_address(address):
+    """
+    Módulo a partir del prefijo de la dirección lógica (%I, %Q, %M).
+    """
+    if address.startswith("%I"):
+        return "Digital_Inputs"
+    if address.startswith("%Q"):
+        return "Digital_Outputs"
+    if address.startswith("%M"):
+        return "Memory_Bits"
+    return "OPC_UA_Data"
+
+
+class Tag:
+    """
+    Un tag del registro: id, símbolo, módulo, dirección, tipo y conversor.
+
+    scan_class solo está definido para los tags que lee api_data_collector.
+    """
+
+    __slots__ = ("id", "symbol", "module", "address", "data_type", "comment", "scan_class", "converter")
+
+    def __init__(self, id, symbol, module, address, data_type, comment='', scan_class=None):
+        self.id = id
+        self.symbol = symbol
+        self.module = module
+        self.address = address
+        self.data_type = data_type
+        self.comment = comment
+        self.scan_class = scan_class
+        self.converter = converter_for(data_type)
+
+    def as_tuple(self):
+        return (self.id, self.symbol, self.module, self.address, self.data_type, self.comment, self.scan_class)
+
+    def __repr__(self):
+        return f"Tag({self.id}, {self.symbol!r}, {self.module!r}, {self.address!r}, {self.data_type!r})"
+
+
+class TagRegistry:
+    """
+    Índice símbolo -> Tag construido una vez a partir de las fuentes de tags.
+    """
+
+    def __init__(self, tags=()):
+        self.tags = list(tags)
+        self._by_symbol = {tag.symbol: tag for tag in self.tags}
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __contains__(self, symbol):
+        return symbol in self._by_symbol
+
+    def get(self, symbol):
+        return self._by_symbol.get(symbol)
+
+    def module_for(self, symbol):
+        tag = self._by_symbol.get(symbol)
+        return tag.module if tag is not None else DEFAULT_MODULE
+
+    def address_for(self, symbol):
+        tag = self._by_symbol.get(symbol)
+        return tag.address if tag is not None else DEFAULT_ADDRESS
+
+    def data_type_for(self, symbol):
+        tag = self._by_symbol.get(symbol)
+        return tag.data_type if tag is not None else DEFAULT_DATA_TYPE
+
+    def resolve(self, symbol):
+        """
+        Devuelve (módulo, dirección, tipo) del símbolo, con los valores por defecto si no está registrado.
+        """
+        tag = self._by_symbol.get(symbol)
+        if tag is None:
+            return DEFAULT_MODULE, DEFAULT_ADDRESS, DEFAULT_DATA_TYPE
+        return tag.module, tag.address, tag.data_type
+
+    def collected(self):
+        """
+        Tags que lee api_data_collector (los que tienen clase de escaneo), en orden de registro.
+        """
+        return [tag for tag in self.tags if tag.scan_class]
+
+    def symbols_config(self):
+        """
+        Configuración de símbolos con el formato de api_data_collector.SYMBOLS_CONFIG.
+        """
+        return [{"symbol": tag.symbol, "address": tag.address, "data_type": tag.data_type,
+                 "scan_class": tag.scan_class} for tag in self.collected()]
+
+
+def _source_paths(sources=None):
+    sources = SOURCES if sources is None else sources
+    if isinstance(sources, str):
+        sources = [s.strip() for s in sources.split(",") if s.strip()]
+    return [source if os.path.isabs(source) else os.path.join(ROOT, source) for source in sources]
+
+
+def _fingerprint(paths):
+    # Solo listas y escalares, para compararla tal cual con la leída del JSON
+    key = [CACHE_VERSION]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            key.append([path, stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            key.append([path, None, None])
+    return key
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get("tags", []) if isinstance(data, dict) else data
+    for entry in entries:
+        yield {field: entry[field] for field in FIELDS if entry.get(field) not in (None, '')}
+
+
+def _read_xlsx(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename=path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, ())
+        columns = [(i, XLSX_COLUMNS[h]) for i, h in enumerate(headers) if h in XLSX_COLUMNS]
+        for row in rows:
+            entry = {field: str(row[i]).strip() for i, field in columns
+                     if i < len(row) and row[i] is not None and str(row[i]).strip()}
+            if not entry.get("symbol"):
+                continue
+            # Mismo criterio que main._iter_xlsx_records: el módulo es el prefijo del Path
+            path_parts = entry.pop("path", "").split('.')
+            if len(path_parts) > 1:
+                entry["module"] = path_parts[0]
+            yield entry
+    finally:
+        workbook.close()
+
+
+def _compile(paths):
+    """
+    Lee y combina las fuentes; devuelve la lista de Tag en orden de aparición.
+    """
+    merged = {}
+    for path in paths:
+        reader = _read_xlsx if path.lower().endswith(('.xlsx', '.xlsm')) else _read_json
+        try:
+            for entry in reader(path):
+                merged.setdefault(entry["symbol"], {}).update(entry)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: No se pudo leer la fuente de tags {path}: {e}")
+
+    tags = []
+    for tag_id, (symbol, entry) in enumerate(merged.items(), start=1):
+        address = entry.get("address", DEFAULT_ADDRESS)
+        module = entry.get("module") or (module_for_address(address) if address.startswith("%") else DEFAULT_MODULE)
+        tags.append(Tag(tag_id, symbol, module, address, entry.get("data_type", DEFAULT_DATA_TYPE),
+                        entry.get("comment", ''), entry.get("scan_class")))
+    return tags
+
+
+def _load_cache(key):
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache["key"] != key:
+            return None
+        return [Tag(*row) for row in cache["tags"]]
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+
+def _save_cache(key, tags):
+    try:
+        tmp_path = CACHE_PATH + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": key, "tags": [tag.as_tuple() for tag in tags]}, f, ensure_ascii=False)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: No se pudo guardar la caché del registro de tags: {e}")
+
+
+def load_registry(sources=None, use_cache=True):
+    """
+    Construye el registro desde las fuentes, usando la caché si ninguna cambió (tamaño y mtime).
+    """
+    paths = _source_paths(sources)
+    key = _fingerprint(paths)
+    tags = _load_cache(key) if use_cache else None
+    if tags is None:
+        tags = _compile(paths)
+        if use_cache:
+            _save_cache(key, tags)
+    return TagRegistry(tags)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Registro compartido del proceso; se construye en el primer uso.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_registry()
+    return _registry
+
+
+def reload_registry():
+    """
+    Vuelve a leer las fuentes (o la caché) y reemplaza el registro compartido.
+    """
+    global _registry
+    with _registry_lock:
+        _registry = load_registry()
+    return _registry
@@ -0,0 +1,120 @@
+import types
+
+import pytest
+import api_data_collector
+from api_data_collector import collect_all_variables
+
+SYMBOLS = [
+    {"symbol": "MotorVerdesIn", "address": "I 0.0", "data_type": "Bool"},
+    {"symbol": "Repeticiones", "address": "MW 10", "data_type": "Int"},
+    {"symbol": "NivelTolva", "address": "MD 20", "data_type": "Real"},
+]
+
+VALUES = {"MotorVerdesIn": True, "Repeticiones": 7, "NivelTolva": 41.5}
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class StubSession:
+    """
+    Responde como la API OPC UA: el endpoint de lotes devuelve batch_status
+    mientras no esté soportado y las lecturas individuales siempre funcionan.
+    """
+
+    def __init__(self, batch_status):
+        self.batch_status = batch_status
+        self.batch_calls = []
+        self.single_calls = []
+
+    def get(self, url, params=None, timeout=None):
+        if params is not None:
+            names = params["names"].split(",")
+            self.batch_calls.append(names)
+            if self.batch_status != 200:
+                return FakeResponse(self.batch_status, {"detail": "Not Found"})
+            return FakeResponse(200, {"variables": {name: {"value": VALUES[name], "data_type": "x"}
+                                                    for name in names}})
+        name = url.rsplit("/", 1)[1]
+        self.single_calls.append(name)
+        return FakeResponse(200, {"success": True, "value": VALUES[name], "data_type": "x"})
+
+
+class InlineExecutor:
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(api_data_collector, "time",
+                        types.SimpleNamespace(monotonic=lambda: now[0], sleep=lambda seconds: None))
+    monkeypatch.setattr(api_data_collector, "_batch_endpoint_supported", None)
+    monkeypatch.setattr(api_data_collector, "_batch_reprobe_at", 0.0)
+    monkeypatch.setattr(api_data_collector.api_config, "USE_BATCH_ENDPOINT", True)
+    monkeypatch.setattr(api_data_collector.api_config, "BATCH_SIZE", 2)
+    monkeypatch.setattr(api_data_collector.api_config, "BATCH_REPROBE_INTERVAL", 300.0)
+    monkeypatch.setattr(api_data_collector.api_config, "API_ENDPOINT", "/variable/{variable_name}")
+    return now
+
+
+def _collect(session):
+    results = collect_all_variables(SYMBOLS, max_in_flight=4, session=session, executor=InlineExecutor())
+    return {result["symbol"]: result["value"] for result in results}
+
+
+def test_batch_endpoint_reads_in_chunks(clock):
+    session = StubSession(200)
+    assert _collect(session) == VALUES
+    assert session.batch_calls == [["MotorVerdesIn", "Repeticiones"], ["NivelTolva"]]
+    assert session.single_calls == []
+
+
+@pytest.mark.parametrize("status", [404, 405, 501])
+def test_unsupported_batch_endpoint_falls_back_to_single_reads(clock, status):
+    session = StubSession(status)
+    assert _collect(session) == VALUES
+    assert session.single_calls == ["MotorVerdesIn", "Repeticiones", "NivelTolva"]
+
+    # Mientras dure BATCH_REPROBE_INTERVAL no se vuelve a intentar el lote
+    batch_calls = len(session.batch_calls)
+    clock[0] += 299.0
+    assert _collect(session) == VALUES
+    assert len(session.batch_calls) == batch_calls
+    assert len(session.single_calls) == 6
+
+
+def test_batch_endpoint_is_probed_again_after_the_interval(clock):
+    session = StubSession(404)
+    _collect(session)
+    assert not api_data_collector.batch_endpoint_usable()
+
+    # El servidor se actualizó: pasado el intervalo se vuelve a usar el lote
+    session.batch_status = 200
+    clock[0] += 300.0
+    assert api_data_collector.batch_endpoint_usable()
+    single_calls = len(session.single_calls)
+    assert _collect(session) == VALUES
+    assert len(session.single_calls) == single_calls
+    assert session.batch_calls[-2:] == [["MotorVerdesIn", "Repeticiones"], ["NivelTolva"]]
+
+    clock[0] += 1.0
+    _collect(session)
+    assert len(session.single_calls) == single_calls
+
+
+def test_other_http_errors_do_not_disable_the_batch_endpoint(clock):
+    session = StubSession(500)
+    assert _collect(session) == VALUES
+    assert api_data_collector.batch_endpoint_usable()
+    batch_calls = len(session.batch_calls)
+    _collect(session)
+    assert len(session.batch_calls) > batch_calls
@@ -0,0 +1,152 @@
+import pytest
+import bit_image
+from bit_image import BIT_MAP_TABLE, MODULE_LAYOUTS, PackedBoolWriter, bit_addresses, pack, unpack
+
+
+class ImageCursor:
+    """
+    Guarda las entradas del mapa de bits enviadas y responde al upsert de
+    imágenes como si ningún bit estuviera guardado.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+
+    def execute(self, query, args=None):
+        self._rows = []
+        rows = [tuple(args[i:i + 4]) for i in range(0, len(args or ()), 4)]
+        if f"INSERT INTO {BIT_MAP_TABLE}" in query:
+            self.connection.bit_map_batches.append(rows)
+        elif "WITH incoming" in query:
+            self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class ImageConnection:
+    def __init__(self):
+        self.bit_map_batches = []
+
+    def cursor(self):
+        return ImageCursor(self)
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+        self.rows_written = 0
+        self.on_inserted = None
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        self.rows_written = len(self.rows)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.rows = []
+        return False
+
+
+@pytest.fixture(autouse=True)
+def fresh_bit_map(monkeypatch):
+    monkeypatch.setattr(bit_image, "_schema_ready", True)
+    monkeypatch.setattr(PackedBoolWriter, "_mapped", {})
+
+
+def _row(address, symbol, value, timestamp="2025-06-26T15:00:00", module="DI16xDC24V", data_type="Bool"):
+    return (module, address, symbol, data_type, "", value, timestamp)
+
+
+@pytest.mark.parametrize("module", sorted(MODULE_LAYOUTS))
+def test_pack_unpack_round_trip(module):
+    addresses = bit_addresses(module)
+    values = [(address, i % 3 == 0) for i, address in enumerate(addresses)]
+    bits, present = pack(module, values)
+    assert present == (1 << len(addresses)) - 1
+    assert unpack(module, bits, present) == values
+    assert unpack(module, bits) == values
+
+
+def test_partial_image_only_unpacks_present_bits():
+    bits, present = pack("DI16xDC24V", [("%I1.7", True), ("I 0.1", False), ("i0.2", True)])
+    assert unpack("DI16xDC24V", bits, present) == [("I 0.1", False), ("I 0.2", True), ("I 1.7", True)]
+    # El último valor de una dirección repetida es el que cuenta
+    bits, present = pack("DO8xDC24V_2A", [("Q 0.3", True), ("Q 0.3", False)])
+    assert unpack("DO8xDC24V_2A", bits, present) == [("Q 0.3", False)]
+
+
+def test_pack_rejects_addresses_outside_the_module():
+    with pytest.raises(ValueError):
+        pack("DO8xDC24V_2A", [("Q 1.0", True)])
+
+
+def test_only_new_bit_map_entries_are_sent():
+    connection = ImageConnection()
+    with PackedBoolWriter(ListWriter(), connection, batch_size=2) as writer:
+        writer.write(_row("I 0.0", "MotorVerdesIn", "1"))
+        writer.write(_row("I 0.1", "MotorRojosIn", "0"))
+        # Mismas direcciones en otro lote de la misma transacción: nada nuevo
+        writer.write(_row("I 0.0", "MotorVerdesIn", "0", timestamp="2025-06-26T15:00:01"))
+        writer.write(_row("I 0.1", "MotorRojosIn", "1", timestamp="2025-06-26T15:00:01"))
+        writer.write(_row("I 0.2", "MotorMoradosIn", "1", timestamp="2025-06-26T15:00:01"))
+    assert connection.bit_map_batches == [
+        [("DI16xDC24V", 0, "I 0.0", "MotorVerdesIn"), ("DI16xDC24V", 1, "I 0.1", "MotorRojosIn")],
+        [("DI16xDC24V", 2, "I 0.2", "MotorMoradosIn")],
+    ]
+
+    # Otro escritor tras el commit solo envía las entradas nuevas o cambiadas
+    connection.bit_map_batches = []
+    with PackedBoolWriter(ListWriter(), connection, batch_size=100) as writer:
+        writer.write(_row("I 0.0", "MotorVerdesIn", "1", timestamp="2025-06-26T15:00:02"))
+        writer.write(_row("I 0.1", "MotorRojos", "1", timestamp="2025-06-26T15:00:02"))
+    assert connection.bit_map_batches == [[("DI16xDC24V", 1, "I 0.1", "MotorRojos")]]
+
+
+def test_bit_map_entries_are_shared_only_after_commit():
+    connection = ImageConnection()
+    writer = PackedBoolWriter(ListWriter(), connection, batch_size=1)
+    writer.write(_row("I 0.0", "MotorVerdesIn", "1"))
+    assert len(connection.bit_map_batches) == 1
+    assert PackedBoolWriter._mapped == {}
+
+    writer.commit()
+    assert PackedBoolWriter._mapped == {("DI16xDC24V", 0): ("I 0.0", "MotorVerdesIn")}
+
+
+def test_bit_map_entries_are_discarded_on_rollback():
+    connection = ImageConnection()
+    with pytest.raises(RuntimeError):
+        with PackedBoolWriter(ListWriter(), connection, batch_size=1) as writer:
+            writer.write(_row("Q 0.0", "LuzVerde", "1", module="DO8xDC24V_2A"))
+            raise RuntimeError("conexión perdida")
+    assert PackedBoolWriter._mapped == {}
+    # Aunque se reutilice el escritor, lo enviado antes del rollback no se promueve
+    writer.commit()
+    assert PackedBoolWriter._mapped == {}
+
+    # El mapa de bits se perdió con el rollback: hay que volver a enviarlo
+    with PackedBoolWriter(ListWriter(), connection, batch_size=1) as writer:
+        writer.write(_row("Q 0.0", "LuzVerde", "1", module="DO8xDC24V_2A"))
+    assert connection.bit_map_batches[-1] == [("DO8xDC24V_2A", 0, "Q 0.0", "LuzVerde")]
+    assert len(connection.bit_map_batches) == 2
+
+
+def test_rows_outside_the_cards_go_to_the_wrapped_writer():
+    wrapped = ListWriter()
+    rows = [_row("I 0.0", "Repeticiones", "7", data_type="Int"),
+            _row("M 0.0", "Marca", "1", module="Memory_Bits"),
+            _row("I 0.0", "MotorVerdesIn", "")]
+    with PackedBoolWriter(wrapped, ImageConnection(), batch_size=10) as writer:
+        writer.write_many(rows)
+        writer.write(_row("I 0.0", "MotorVerdesIn", "true"))
+    assert wrapped.rows == rows
+    assert writer.packed_rows == 1 and writer.images_written == 1
@@ -0,0 +1,114 @@
+import pytest
+from pg8000.exceptions import DatabaseError
+
+from bulk_writer import HISTORY_TABLE, BulkWriter, _copy_escape
+
+
+class ScriptedCursor:
+    """
+    Guarda las sentencias (y el contenido de COPY); COPY falla si copy_error está definido.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def execute(self, query, args=None, stream=None):
+        if stream is not None:
+            if self.connection.copy_error is not None:
+                raise self.connection.copy_error
+            self.connection.copied.append(stream.read().decode("utf-8"))
+        self.connection.queries.append(query.split(" (")[0])
+        self.rowcount = len(args) // 7 if args else -1
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class ScriptedConnection:
+    def __init__(self, copy_error=None):
+        self.copy_error = copy_error
+        self.queries = []
+        self.copied = []
+        self.commits = 0
+
+    def cursor(self):
+        return ScriptedCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+ROW = ("Analog_Inputs", "IW 64", "Temperatura", "REAL", "", "21.5", "2025-06-26T15:00:00")
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, "\\N"),
+    (True, "true"),
+    (False, "false"),
+    (21.5, "21.5"),
+    (0, "0"),
+    ("", ""),
+    ("Tolva 1", "Tolva 1"),
+    ("a\tb", "a\\tb"),
+    ("línea 1\nlínea 2\r\n", "línea 1\\nlínea 2\\r\\n"),
+    ("C:\\WinCC\\N", "C:\\\\WinCC\\\\N"),
+    ("\\N", "\\\\N"),
+])
+def test_copy_escape(value, expected):
+    assert _copy_escape(value) == expected
+
+
+def test_copy_payload_keeps_one_line_per_row():
+    connection = ScriptedConnection()
+    writer = BulkWriter(connection, use_copy=True, commit_interval=0)
+    writer.write(ROW[:4] + ("nota\tcon\ntabulador", None, ROW[6]))
+    writer.commit()
+    assert connection.copied == [
+        "Analog_Inputs\tIW 64\tTemperatura\tREAL\tnota\\tcon\\ntabulador\t\\N\t2025-06-26T15:00:00\n"
+    ]
+
+
+def test_copy_is_probed_once_inside_a_savepoint():
+    connection = ScriptedConnection()
+    writer = BulkWriter(connection, batch_size=1, use_copy=True, commit_interval=0)
+    writer.write_many([ROW, ROW[:6] + ("2025-06-26T15:00:20",)])
+    writer.commit()
+    assert connection.queries == [
+        "SAVEPOINT bulk_writer_copy",
+        f"COPY {HISTORY_TABLE}",
+        "RELEASE SAVEPOINT bulk_writer_copy",
+        f"COPY {HISTORY_TABLE}",
+    ]
+    assert writer.mode == "COPY"
+    assert writer.rows_written == 2
+
+
+def test_failed_copy_falls_back_to_insert_inside_the_savepoint():
+    connection = ScriptedConnection(copy_error=DatabaseError("COPY from stdin failed"))
+    writer = BulkWriter(connection, batch_size=1, use_copy=True, commit_interval=0)
+    writer.write_many([ROW, ROW[:6] + ("2025-06-26T15:00:20",)])
+    writer.commit()
+    assert connection.queries == [
+        "SAVEPOINT bulk_writer_copy",
+        "ROLLBACK TO SAVEPOINT bulk_writer_copy",
+        f"INSERT INTO {HISTORY_TABLE}",
+        "RELEASE SAVEPOINT bulk_writer_copy",
+        # Los lotes siguientes van directamente con INSERT, sin volver a probar COPY
+        f"INSERT INTO {HISTORY_TABLE}",
+    ]
+    assert writer.mode == "INSERT"
+    assert writer.rows_written == 2
+    assert connection.commits == 1
+
+
+def test_other_copy_errors_are_not_swallowed():
+    connection = ScriptedConnection(copy_error=RuntimeError("fallo inesperado"))
+    writer = BulkWriter(connection, use_copy=True, commit_interval=0)
+    writer.write(ROW)
+    with pytest.raises(RuntimeError):
+        writer.commit()
+    assert "ROLLBACK TO SAVEPOINT bulk_writer_copy" not in connection.queries
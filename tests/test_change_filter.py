@@ -0,0 +1,76 @@
+import pytest
+from api_data_collector import convert_value_to_appropriate_type
+from change_filter import ChangeFilter
+from tag_registry import parse_bool
+
+
+def _reading(symbol, value, data_type):
+    return {"success": True, "symbol": symbol, "data_type": data_type, "value": value}
+
+
+def _passes(change_filter, values, data_type, symbol="Tag", start=0.0, step=1.0):
+    return [change_filter.should_write(_reading(symbol, value, data_type), now=start + i * step)
+            for i, value in enumerate(values)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("true", True), ("True", True), ("1", True), (1, True), (True, True),
+    ("false", False), ("False", False), ("0", False), (0, False), (False, False),
+])
+def test_bool_text_is_parsed(text, expected):
+    assert parse_bool(text) is expected
+
+
+def test_unknown_bool_text_is_kept_as_text():
+    with pytest.raises(ValueError):
+        parse_bool("quizás")
+    assert convert_value_to_appropriate_type("quizás", "Bool") == "quizás"
+
+
+def test_bool_changes_from_text_readings_are_detected():
+    change_filter = ChangeFilter(converter=convert_value_to_appropriate_type)
+    values = ["true", "false", "false", "False", "true", "True"]
+    assert _passes(change_filter, values, "Bool") == [True, True, False, False, True, False]
+
+
+def test_real_absolute_deadband():
+    change_filter = ChangeFilter(real_deadband=0.5, converter=convert_value_to_appropriate_type)
+    values = ["10.0", "10.4", "10.6", "10.2", "10.0"]
+    # 10.6 supera la banda respecto al último valor escrito (10.0), no al último leído
+    assert _passes(change_filter, values, "Real") == [True, False, True, False, True]
+
+
+def test_real_percent_deadband():
+    change_filter = ChangeFilter(real_deadband_percent=5.0)
+    assert _passes(change_filter, [100.0, 104.0, 106.0, 106.0], "Real") == [True, False, True, False]
+    # Desde cero cualquier cambio cuenta
+    assert _passes(change_filter, [0.0, 0.0, 0.1], "Real", symbol="Cero") == [True, False, True]
+
+
+def test_real_without_deadband_writes_every_change():
+    change_filter = ChangeFilter()
+    assert _passes(change_filter, [1.0, 1.0, 1.0001], "Real") == [True, False, True]
+
+
+def test_heartbeat_writes_unchanged_values_after_max_silence():
+    change_filter = ChangeFilter(max_silence=10.0, converter=convert_value_to_appropriate_type)
+    # Lecturas cada 4 s del mismo valor: latido a los 12 s y de nuevo a los 24 s
+    passes = _passes(change_filter, ["7"] * 7, "Int", step=4.0)
+    assert passes == [True, False, False, True, False, False, True]
+
+
+def test_heartbeat_is_measured_from_the_last_write():
+    change_filter = ChangeFilter(max_silence=10.0)
+    assert change_filter.should_write(_reading("Tag", 1, "Int"), now=0.0)
+    assert change_filter.should_write(_reading("Tag", 2, "Int"), now=8.0)
+    assert not change_filter.should_write(_reading("Tag", 2, "Int"), now=16.0)
+    assert change_filter.should_write(_reading("Tag", 2, "Int"), now=18.0)
+
+
+def test_failed_readings_are_dropped_and_counted():
+    change_filter = ChangeFilter()
+    readings = [_reading("A", 1, "Int"), {"success": False, "symbol": "B", "value": None},
+                _reading("A", 1, "Int")]
+    assert change_filter.filter(readings, now=0.0) == readings[:1]
+    assert (change_filter.received, change_filter.passed) == (3, 1)
+    assert change_filter.reduction_ratio() == 3.0
@@ -0,0 +1,33 @@
+import pytest
+import api_data_collector
+
+
+@pytest.fixture
+def upload_path(monkeypatch):
+    calls = []
+    monkeypatch.setattr(api_data_collector, "start_upload_path", lambda: ("forwarder", "pipeline", "spill"))
+    monkeypatch.setattr(api_data_collector, "stop_upload_path", lambda *path: calls.append(("stop", path)))
+    monkeypatch.setattr(api_data_collector, "shutdown_executor", lambda: calls.append(("executor",)))
+    return calls
+
+
+@pytest.mark.parametrize("backend, runner", [("http", "run_scans"), ("opcua", "run_opcua")])
+def test_upload_path_is_stopped_when_the_backend_fails(monkeypatch, upload_path, backend, runner):
+    def fail(*args):
+        raise RuntimeError("sesión perdida")
+
+    monkeypatch.setattr(api_data_collector.api_config, "BACKEND", backend)
+    monkeypatch.setattr(api_data_collector, runner, fail)
+    with pytest.raises(RuntimeError):
+        api_data_collector.main()
+    assert upload_path == [("executor",), ("stop", ("forwarder", "pipeline", "spill"))]
+
+
+def test_keyboard_interrupt_stops_the_upload_path_quietly(monkeypatch, upload_path):
+    def interrupt(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(api_data_collector.api_config, "BACKEND", "http")
+    monkeypatch.setattr(api_data_collector, "run_scans", interrupt)
+    api_data_collector.main()
+    assert ("stop", ("forwarder", "pipeline", "spill")) in upload_path
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import api_data_collector
+from api_data_collector import collect_all_variables, get_session
+
+SYMBOLS = [{"symbol": f"Tag{i}", "address": f"MW {i * 2}", "data_type": "Int"} for i in range(8)]
+LATENCY = 0.05
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, value):
+        self._value = value
+
+    def json(self):
+        return {"success": True, "value": self._value, "data_type": "Int"}
+
+
+class SlowSession:
+    """
+    Sesión compartida con latencia fija que cuenta las peticiones simultáneas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.threads = set()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.threads.add(threading.current_thread().name)
+        try:
+            time.sleep(LATENCY)
+            return FakeResponse(int(url.rsplit("Tag", 1)[1]))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def single_reads(monkeypatch):
+    monkeypatch.setattr(api_data_collector.api_config, "USE_BATCH_ENDPOINT", False)
+    monkeypatch.setattr(api_data_collector.api_config, "API_ENDPOINT", "/variable/{variable_name}")
+
+
+def test_scan_runs_requests_in_parallel_on_one_session():
+    session = SlowSession()
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="opc-poll") as executor:
+        start = time.perf_counter()
+        results = collect_all_variables(SYMBOLS, max_in_flight=4, session=session, executor=executor)
+        elapsed = time.perf_counter() - start
+
+    # Resultados en el orden de SYMBOLS aunque lleguen desordenados
+    assert [result["symbol"] for result in results] == [s["symbol"] for s in SYMBOLS]
+    assert [result["value"] for result in results] == list(range(8))
+    assert len({result["timestamp"] for result in results}) == 1
+    # Nunca más peticiones simultáneas que hilos, y varias a la vez
+    assert 1 < session.max_in_flight <= 4
+    assert len(session.threads) > 1
+    assert elapsed < len(SYMBOLS) * LATENCY * 0.75
+
+
+def test_sequential_mode_uses_one_request_at_a_time(monkeypatch):
+    monkeypatch.setattr(api_data_collector.api_config, "REQUEST_DELAY", 0)
+    session = SlowSession()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = collect_all_variables(SYMBOLS[:3], max_in_flight=1, session=session, executor=executor)
+    assert [result["value"] for result in results] == [0, 1, 2]
+    assert session.max_in_flight == 1
+
+
+def test_session_is_created_once_and_shared(monkeypatch):
+    monkeypatch.setattr(api_data_collector, "_session", None)
+    session = get_session()
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(get_session())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(other is session for other in sessions)
+    session.close()
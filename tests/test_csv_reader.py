@@ -0,0 +1,74 @@
+import tracemalloc
+
+import pytest
+import encoding_detection
+from main import iter_symbols_from_csv, read_symbols_from_csv
+from sample_batch import SampleBatch
+
+HEADER = '"MotorVerdesIn";"MotorVerdesIn_valor";"Repeticiones";"Repeticiones_valor"\r\n'
+
+
+def _write_export(path, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        f.write(HEADER)
+        for i in range(rows):
+            timestamp = f"26/06/2025 {15 + i // 3600 % 9:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+            f.write(f'"{timestamp}";"{i % 2}";"{timestamp}";"{i}"\r\n')
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoding_detection, "CACHE_PATH", str(tmp_path / "encoding_cache.json"))
+    monkeypatch.setattr(encoding_detection, "_memory_cache", {})
+
+
+def test_batches_are_bounded_and_keep_the_file_order(tmp_path):
+    file_path = _write_export(tmp_path / "EXPORT.csv", 1001)
+    records = list(iter_symbols_from_csv(file_path))
+    assert len(records) == 2002
+    assert [entry['Symbol'] for _, entry in records[:4]] == ["MotorVerdesIn", "Repeticiones"] * 2
+    assert records[1][1]['value'] == "0" and records[-1][1]['value'] == "1000"
+
+    batches = list(iter_symbols_from_csv(file_path, batch_size=500))
+    assert [len(batch) for batch in batches] == [500, 500, 500, 500, 2]
+    assert [record for batch in batches for record in batch] == records
+
+    compact = list(iter_symbols_from_csv(file_path, batch_size=500, compact=True))
+    assert all(isinstance(batch, SampleBatch) for batch in compact)
+    assert [record for batch in compact for record in batch] == records
+
+
+def test_whole_file_compact_batch(tmp_path):
+    file_path = _write_export(tmp_path / "EXPORT.csv", 10)
+    batches = list(iter_symbols_from_csv(file_path, compact=True))
+    assert len(batches) == 1 and len(batches[0]) == 20
+    assert read_symbols_from_csv(file_path).keys() == {module for module, _ in batches[0]}
+
+
+def _peak_bytes(consume):
+    tracemalloc.start()
+    try:
+        consume()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_does_not_grow_with_the_file(tmp_path):
+    file_path = _write_export(tmp_path / "EXPORT.csv", 20000)
+
+    def stream():
+        for batch in iter_symbols_from_csv(file_path, batch_size=500):
+            pass
+
+    def materialize():
+        list(iter_symbols_from_csv(file_path))
+
+    # Con lotes solo hay un lote vivo a la vez; con la lista, las 40000 entradas
+    assert _peak_bytes(stream) * 5 < _peak_bytes(materialize)
+
+
+def test_missing_file_yields_nothing(tmp_path):
+    assert list(iter_symbols_from_csv(str(tmp_path / "no_existe.csv"))) == []
+    assert read_symbols_from_csv(str(tmp_path / "no_existe.csv")) is None
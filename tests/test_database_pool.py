@@ -0,0 +1,192 @@
+import threading
+import types
+
+import pytest
+import database
+from database import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, args=None):
+        if self.connection.closed or self.connection.dead:
+            raise OSError("server closed the connection unexpectedly")
+        self.connection.queries.append(query)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.queries = []
+        self.dead = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector:
+    """
+    Sustituye al Connector de Cloud SQL; falla las primeras `failures` veces.
+    """
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.connections = []
+        self.attempts = 0
+
+    def connect(self, instance, driver, **kwargs):
+        self.attempts += 1
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection refused")
+        connection = FakeConnection(len(self.connections) + 1)
+        self.connections.append(connection)
+        return connection
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = types.SimpleNamespace(now=0.0, sleeps=[])
+    monkeypatch.setattr(database, "time", types.SimpleNamespace(
+        monotonic=lambda: state.now, sleep=state.sleeps.append))
+    monkeypatch.setattr(database.config, "require_database", lambda: None)
+    return state
+
+
+def _pool(connector, **kwargs):
+    options = dict(dsn="", max_size=2, health_check_interval=30.0, connect_retries=4,
+                   retry_delay=0.5, checkout_timeout=0)
+    options.update(kwargs)
+    pool = ConnectionPool(**options)
+    pool._connector = connector
+    return pool
+
+
+def test_pool_connects_lazily_and_reuses_idle_connections(clock):
+    connector = FakeConnector()
+    pool = _pool(connector)
+    assert connector.attempts == 0
+
+    with pool.checkout() as connection:
+        assert connection.number == 1
+    with pool.checkout() as connection:
+        assert connection.number == 1
+    assert connector.attempts == 1
+    # Conexión recién devuelta: no hace falta comprobarla
+    assert connection.queries == []
+
+
+def test_idle_connection_is_checked_with_select_1(clock):
+    connector = FakeConnector()
+    pool = _pool(connector)
+    with pool.checkout():
+        pass
+
+    clock.now += 31.0
+    with pool.checkout() as connection:
+        assert connection.queries == ["SELECT 1"]
+    assert pool.reconnects == 0
+
+
+def test_dead_idle_connection_is_replaced(clock):
+    connector = FakeConnector()
+    pool = _pool(connector)
+    with pool.checkout() as first:
+        pass
+
+    first.dead = True
+    clock.now += 31.0
+    with pool.checkout() as connection:
+        assert connection.number == 2
+    assert first.closed
+    assert pool.reconnects == 1
+
+
+def test_connect_retries_with_exponential_backoff(clock):
+    connector = FakeConnector(failures=3)
+    pool = _pool(connector)
+    with pool.checkout() as connection:
+        assert connection.number == 1
+    assert connector.attempts == 4
+    assert clock.sleeps == [0.5, 1.0, 2.0]
+
+
+def test_connect_gives_up_and_frees_the_slot(clock):
+    connector = FakeConnector(failures=2)
+    pool = _pool(connector, max_size=1, connect_retries=2)
+    with pytest.raises(OSError):
+        with pool.checkout():
+            pass
+    assert clock.sleeps == [0.5]
+
+    # El hueco se liberó: el siguiente intento conecta
+    with pool.checkout() as connection:
+        assert connection.number == 1
+
+
+def test_checkout_is_exclusive_per_thread(clock):
+    connector = FakeConnector()
+    pool = _pool(connector, max_size=1)
+    seen = {}
+
+    def other_thread():
+        try:
+            with pool.checkout():
+                seen["other"] = "connection"
+        except PoolTimeout:
+            seen["other"] = "timeout"
+
+    with pool.checkout() as connection:
+        # Checkout anidado en el mismo hilo: la misma conexión, sin ocupar otro hueco
+        with pool.checkout() as nested:
+            assert nested is connection
+        worker = threading.Thread(target=other_thread)
+        worker.start()
+        worker.join()
+    assert seen["other"] == "timeout"
+
+    worker = threading.Thread(target=other_thread)
+    worker.start()
+    worker.join()
+    assert seen["other"] == "connection"
+    assert connector.attempts == 1
+
+
+def test_errors_roll_back_and_connection_errors_discard(clock):
+    connector = FakeConnector()
+    pool = _pool(connector)
+    with pytest.raises(ValueError):
+        with pool.checkout() as connection:
+            raise ValueError("fila inválida")
+    assert connection.rollbacks == 1 and not connection.closed
+
+    calls = []
+
+    def operation(connection):
+        calls.append(connection.number)
+        if len(calls) == 1:
+            raise OSError("connection reset")
+        return "ok"
+
+    assert pool.run(operation) == "ok"
+    assert calls == [1, 2]
+    assert connection.closed
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+import encoding_detection
+from encoding_detection import detect_encoding
+
+DEFAULT_CACHE_PATH = encoding_detection.CACHE_PATH
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoding_detection, "CACHE_PATH", str(tmp_path / "encoding_cache.json"))
+    monkeypatch.setattr(encoding_detection, "_memory_cache", {})
+
+
+def _write(path, text, encoding):
+    # Más de SAMPLE_SIZE bytes ASCII antes del primer carácter acentuado
+    path.write_bytes(b"Fecha;Tolva1\n" + b"x" * (encoding_detection.SAMPLE_SIZE + 1024) + f"\n{text}\n".encode(encoding))
+    return str(path)
+
+
+def test_ascii_sample_with_utf8_after_it_is_read_as_utf8(tmp_path):
+    file_path = _write(tmp_path / "export.csv", "año", "utf-8")
+    encoding = detect_encoding(file_path)
+    assert encoding == "utf-8"
+    with open(file_path, encoding=encoding) as f:
+        assert f.read().rstrip().endswith("año")
+
+
+def test_ascii_sample_with_cp1252_after_it_falls_back_to_cp1252(tmp_path):
+    file_path = _write(tmp_path / "export.csv", "año", "cp1252")
+    assert detect_encoding(file_path) == "cp1252"
+
+
+def test_pure_ascii_file_is_never_reported_as_ascii(tmp_path):
+    file_path = tmp_path / "export.csv"
+    file_path.write_bytes(b"Fecha;Tolva1\n26/06/2025 15:01:52;1\n")
+    assert detect_encoding(str(file_path)) == "utf-8"
+
+
+def test_non_ascii_in_the_middle_of_a_large_file_is_found_in_a_bounded_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoding_detection, "SAMPLE_SIZE", 4096)
+    filler = b"26/06/2025 15:01:52;1\n" * 2000
+    file_path = tmp_path / "export.csv"
+    file_path.write_bytes(b"Fecha;Tolva1\n" + filler + "caña\n".encode("cp1252") + filler)
+
+    reads = []
+    real_open = open
+
+    def counting_open(path, mode="r", *args, **kwargs):
+        f = real_open(path, mode, *args, **kwargs)
+        original_read = f.read
+        f.read = lambda size=-1: reads.append(size) or original_read(size)
+        return f
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    assert encoding_detection.promote_ascii(str(file_path), sample_size=4096) == "cp1252"
+    assert reads and all(0 < size <= 4096 for size in reads) and len(reads) <= 3
+
+
+def test_cache_is_anchored_next_to_the_module():
+    assert os.path.dirname(DEFAULT_CACHE_PATH) == encoding_detection.ROOT
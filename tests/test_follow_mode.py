@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+import encoding_detection
+import main
+from main import follow_symbols_from_csv
+
+HEADER = '"MotorVerdesIn";"MotorVerdesIn_valor";"Repeticiones";"Repeticiones_valor"\r\n'
+
+
+def _line(second, value):
+    timestamp = f"26/06/2025 15:00:{second:02d}"
+    return f'"{timestamp}";"{value % 2}";"{timestamp}";"{value}"\r\n'
+
+
+def _export(seconds):
+    return HEADER + "".join(_line(second, second) for second in seconds)
+
+
+def _follow(file_path, checkpoint_path):
+    # Consumir todo el generador: el checkpoint se guarda al pedir el siguiente lote
+    return [(entry['Symbol'], entry['timestamp'], entry['value'])
+            for batch in follow_symbols_from_csv(str(file_path), str(checkpoint_path))
+            for _, entry in batch]
+
+
+def _seconds(records, symbol="Repeticiones"):
+    return [int(timestamp[-2:]) for name, timestamp, _ in records if name == symbol]
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoding_detection, "CACHE_PATH", str(tmp_path / "encoding_cache.json"))
+    monkeypatch.setattr(encoding_detection, "_memory_cache", {})
+
+
+@pytest.fixture
+def export(tmp_path):
+    return tmp_path / "EXPORT.csv", tmp_path / "EXPORT.csv.checkpoint.json"
+
+
+def test_appended_lines_are_read_once(export):
+    file_path, checkpoint_path = export
+    file_path.write_bytes(_export([0, 1]).encode("utf-8-sig"))
+
+    first = _follow(file_path, checkpoint_path)
+    assert _seconds(first) == [0, 1]
+    assert _seconds(first, "MotorVerdesIn") == [0, 1]
+
+    # Una línea completa y otra a medio escribir por WinCC
+    with open(file_path, "ab") as f:
+        f.write(_line(2, 2).encode())
+        f.write(_line(3, 3).encode()[:10])
+    assert _seconds(_follow(file_path, checkpoint_path)) == [2]
+
+    with open(file_path, "ab") as f:
+        f.write(_line(3, 3).encode()[10:])
+    assert _seconds(_follow(file_path, checkpoint_path)) == [3]
+    assert _follow(file_path, checkpoint_path) == []
+
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+    assert checkpoint["offset"] == file_path.stat().st_size
+
+
+def test_resume_uses_the_stored_offset_and_encoding(export, monkeypatch):
+    file_path, checkpoint_path = export
+    file_path.write_bytes(_export([0, 1]).encode("cp1252"))
+    _follow(file_path, checkpoint_path)
+
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+    assert checkpoint["encoding"] is not None
+    assert checkpoint["headers"][0] == "MotorVerdesIn"
+
+    def no_detection(file_path):
+        raise AssertionError("la codificación debía salir del checkpoint")
+
+    monkeypatch.setattr(main, "detect_encoding", no_detection)
+    with open(file_path, "ab") as f:
+        f.write(_line(2, 2).encode("cp1252"))
+
+    assert _seconds(_follow(file_path, checkpoint_path)) == [2]
+
+
+def test_truncated_file_is_reread_without_duplicates(export):
+    file_path, checkpoint_path = export
+    file_path.write_bytes(_export([0, 1, 2, 3]).encode("utf-8-sig"))
+    _follow(file_path, checkpoint_path)
+    inode = file_path.stat().st_ino
+
+    # Mismo inodo y menos bytes que el offset guardado
+    with open(file_path, "wb") as f:
+        f.write(_export([3, 4]).encode("utf-8-sig"))
+    assert file_path.stat().st_ino == inode
+
+    assert _seconds(_follow(file_path, checkpoint_path)) == [4]
+    assert _seconds(_follow(file_path, checkpoint_path)) == []
+
+
+def test_replaced_file_is_read_from_the_start(export, tmp_path):
+    file_path, checkpoint_path = export
+    file_path.write_bytes(_export([0, 1]).encode("utf-8-sig"))
+    _follow(file_path, checkpoint_path)
+    inode = file_path.stat().st_ino
+
+    # Rotación: un archivo nuevo, más largo que el anterior, reemplaza al original
+    rotated = tmp_path / "EXPORT.csv.new"
+    rotated.write_bytes(_export([1, 2, 3, 4, 5, 6, 7, 8]).encode("cp1252"))
+    os.replace(rotated, file_path)
+    assert file_path.stat().st_ino != inode
+
+    records = _follow(file_path, checkpoint_path)
+    assert _seconds(records) == [2, 3, 4, 5, 6, 7, 8]
+    assert _seconds(records, "MotorVerdesIn") == [2, 3, 4, 5, 6, 7, 8]
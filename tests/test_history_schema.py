@@ -0,0 +1,190 @@
+import importlib.util
+from datetime import datetime, timezone
+
+import pytest
+import config as config_module
+import history_schema
+from bulk_writer import HISTORY_KEY
+from history_schema import create_history_writer, deduplicate_history, ensure_history_table, maintain_partitions
+
+
+class RecordingCursor:
+    """
+    Guarda las sentencias en orden y responde a las consultas con answer(query).
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, query, args=None, stream=None):
+        self.connection.queries.append(" ".join(query.split()))
+        self._rows = self.connection.answer(query, args) or []
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self, answer=None):
+        self.queries = []
+        self.answer = answer or (lambda query, args: [])
+        self.commits = 0
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def _answers(kind="r", key_exists=False, duplicates=0):
+    def answer(query, args):
+        if "relkind" in query:
+            return [(kind,)] if kind else []
+        if "to_regclass" in query:
+            return [("index",) if key_exists else (None,)]
+        if "HAVING count(*) > 1" in query:
+            return [(duplicates,)]
+        return []
+    return answer
+
+
+@pytest.fixture(autouse=True)
+def fresh_schema_state(monkeypatch):
+    monkeypatch.setattr(history_schema, "_ready", {})
+    monkeypatch.setattr(history_schema, "_keyed", {})
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_PARTITION", "none")
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_SCHEMA", "wide")
+    monkeypatch.setattr(history_schema.config, "SQL_ENABLE_ROLLUPS", False)
+    monkeypatch.setattr(history_schema.config, "SQL_PACK_DIGITAL_IO", False)
+
+
+def test_existing_duplicates_are_kept_and_the_key_is_not_created():
+    connection = RecordingConnection(_answers(duplicates=3))
+    assert ensure_history_table(connection, "history") is False
+    assert not any(q.startswith("DELETE") for q in connection.queries)
+    assert not any("CREATE UNIQUE INDEX" in q for q in connection.queries)
+
+    writer = create_history_writer(connection, table_name="history")
+    assert writer._on_conflict == ""
+
+
+def test_key_includes_the_module_and_replaces_the_older_indexes():
+    connection = RecordingConnection(_answers())
+    assert ensure_history_table(connection, "history") is True
+    assert ('CREATE UNIQUE INDEX IF NOT EXISTS history_symbol_timestamp_module_key '
+            'ON history (symbol, "timestamp", module)') in connection.queries
+    assert "DROP INDEX IF EXISTS history_symbol_timestamp_key" in connection.queries
+
+    writer = create_history_writer(connection, table_name="history")
+    assert writer._on_conflict == ' ON CONFLICT ("module", "symbol", "timestamp") DO NOTHING'
+    assert HISTORY_KEY == ("module", "symbol", "timestamp")
+
+
+def test_deduplication_only_runs_when_asked_and_only_removes_identical_rows():
+    connection = RecordingConnection(_answers())
+    assert deduplicate_history(connection, "history") is True
+    [delete] = [q for q in connection.queries if q.startswith("DELETE")]
+    assert "a.module = b.module" in delete
+    assert "a.value IS NOT DISTINCT FROM b.value" in delete
+    assert connection.queries.index(delete) < next(
+        i for i, q in enumerate(connection.queries) if "CREATE UNIQUE INDEX" in q)
+
+
+def _partition_answers(partitions=()):
+    base = _answers(kind=None)
+
+    def answer(query, args):
+        if "pg_inherits" in query:
+            return [(name,) for name in partitions]
+        return base(query, args)
+    return answer
+
+
+NOW = datetime(2025, 6, 15, 12, tzinfo=timezone.utc)
+
+
+def test_partitioning_is_opt_in(monkeypatch):
+    monkeypatch.delenv("SQL_HISTORY_PARTITION", raising=False)
+    spec = importlib.util.spec_from_file_location("fresh_config", config_module.__file__)
+    fresh_config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fresh_config)
+    assert fresh_config.config.SQL_HISTORY_PARTITION == "none"
+
+    connection = RecordingConnection(_answers(kind=None))
+    ensure_history_table(connection, "history", now=NOW)
+    assert not any("PARTITION" in q for q in connection.queries)
+
+
+def test_new_partitioned_table_gets_default_partition_brin_index_and_upcoming_months(monkeypatch):
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_PARTITION", "month")
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_PRECREATE", 1)
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_RETENTION_DAYS", 0)
+    connection = RecordingConnection(_partition_answers())
+    ensure_history_table(connection, "history", now=NOW)
+
+    ddl = [q for q in connection.queries if not q.startswith("SELECT")]
+    assert ddl == [
+        'CREATE TABLE IF NOT EXISTS history ( id BIGSERIAL, module VARCHAR(255) NOT NULL, '
+        'address VARCHAR(255) NOT NULL, symbol VARCHAR(255), data_type VARCHAR(50), comment TEXT, value TEXT, '
+        '"timestamp" TIMESTAMPTZ NOT NULL, created_at TIMESTAMPTZ DEFAULT NOW(), PRIMARY KEY (id, "timestamp") ) '
+        'PARTITION BY RANGE ("timestamp")',
+        "CREATE TABLE IF NOT EXISTS history_default PARTITION OF history DEFAULT",
+        'CREATE INDEX IF NOT EXISTS history_timestamp_brin ON history USING BRIN ("timestamp")',
+        'CREATE UNIQUE INDEX IF NOT EXISTS history_symbol_timestamp_module_key ON history (symbol, "timestamp", module)',
+        "DROP INDEX IF EXISTS history_symbol_timestamp_idx",
+        "DROP INDEX IF EXISTS history_symbol_timestamp_key",
+        "CREATE TABLE IF NOT EXISTS history_p202506 (LIKE history INCLUDING DEFAULTS)",
+        'WITH moved AS (DELETE FROM history_default WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        'INSERT INTO history_p202506 SELECT * FROM moved',
+        "ALTER TABLE history ATTACH PARTITION history_p202506 "
+        "FOR VALUES FROM ('2025-06-01T00:00:00+00:00') TO ('2025-07-01T00:00:00+00:00')",
+        "CREATE TABLE IF NOT EXISTS history_p202507 (LIKE history INCLUDING DEFAULTS)",
+        'WITH moved AS (DELETE FROM history_default WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        'INSERT INTO history_p202507 SELECT * FROM moved',
+        "ALTER TABLE history ATTACH PARTITION history_p202507 "
+        "FOR VALUES FROM ('2025-07-01T00:00:00+00:00') TO ('2025-08-01T00:00:00+00:00')",
+    ]
+    # Cada bloque de DDL empieza por el bloqueo de mantenimiento de la tabla
+    locks = [i for i, q in enumerate(connection.queries) if "pg_advisory_xact_lock" in q]
+    assert len(locks) == 2 and locks[0] == 0
+    assert connection.queries.index(ddl[6]) > locks[1]
+
+
+def test_existing_partitions_are_not_created_again(monkeypatch):
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_PRECREATE", 1)
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_RETENTION_DAYS", 0)
+    connection = RecordingConnection(_partition_answers(["history_p202506"]))
+    maintain_partitions(connection, "history", "month", NOW)
+    created = [q for q in connection.queries if q.startswith("CREATE TABLE")]
+    assert created == ["CREATE TABLE IF NOT EXISTS history_p202507 (LIKE history INCLUDING DEFAULTS)"]
+
+
+@pytest.mark.parametrize("action", ["detach", "drop"])
+def test_retention_only_removes_partitions_entirely_past_the_horizon(monkeypatch, action):
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_PRECREATE", 0)
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_RETENTION_DAYS", 40)
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_RETENTION_ACTION", action)
+    partitions = ["history_p202503", "history_p202504", "history_p202505", "history_p202506", "history_default"]
+    connection = RecordingConnection(_partition_answers(partitions))
+    maintain_partitions(connection, "history", "month", NOW)
+
+    removed = [q for q in connection.queries if q.startswith(("ALTER TABLE history DETACH", "DROP TABLE"))]
+    expected = []
+    for name in ("history_p202503", "history_p202504"):
+        expected.append(f"ALTER TABLE history DETACH PARTITION {name}")
+        if action == "drop":
+            expected.append(f"DROP TABLE {name}")
+    assert removed == expected
+
+
+def test_existing_plain_table_is_kept_unpartitioned(monkeypatch):
+    monkeypatch.setattr(history_schema.config, "SQL_HISTORY_PARTITION", "month")
+    connection = RecordingConnection(_answers(kind="r"))
+    ensure_history_table(connection, "history", now=NOW)
+    assert not any("PARTITION" in q for q in connection.queries)
@@ -0,0 +1,132 @@
+import pytest
+import rollups
+from bulk_writer import HISTORY_COLUMNS, HISTORY_KEY, HISTORY_RETURNING, HISTORY_TABLE, BulkWriter
+from rollups import ROLLUP_COLUMNS, RollupAggregator, RollupHistoryWriter
+
+ROWS = [
+    ("Analog_Inputs", "IW 64", "Temperatura", "REAL", "", "21.5", "2025-06-26T15:00:00"),
+    ("Analog_Inputs", "IW 64", "Temperatura", "REAL", "", "22.5", "2025-06-26T15:00:20"),
+    ("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", "true", "2025-06-26T15:00:00"),
+]
+
+
+class FakeCursor:
+    """
+    Emula lo justo de PostgreSQL: staging con COPY, la fusión e INSERT con
+    ON CONFLICT DO NOTHING (y RETURNING) y el upsert de los agregados.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._rows = []
+
+    def _insert_history(self, rows):
+        inserted = []
+        for row in rows:
+            key = tuple(row[i] for i in (0, 2, 6))
+            if key not in self.database.history:
+                self.database.history[key] = row
+                inserted.append(row)
+        return inserted
+
+    def execute(self, query, args=None, stream=None):
+        self._rows = []
+        if stream is not None:
+            self.database.staged = [tuple(line.split("\t")) for line in stream.read().decode().splitlines()]
+        elif query.lstrip().startswith(f"INSERT INTO {HISTORY_TABLE} "):
+            if args is None:
+                rows, self.database.staged = self.database.staged, []
+            else:
+                rows = [tuple(args[i:i + 7]) for i in range(0, len(args), 7)]
+            inserted = self._insert_history(rows)
+            self.rowcount = len(inserted)
+            if "RETURNING" in query:
+                returning = [c.strip().strip('"') for c in query.rsplit("RETURNING", 1)[1].split(",")]
+                self._rows = [tuple(row[HISTORY_COLUMNS.index(c)] for c in returning) for row in inserted]
+                self.database.returned_widths.add(len(returning))
+        elif "INSERT INTO history_rollup_" in query:
+            table_name = query.split("INSERT INTO ")[1].split()[0]
+            width = len(ROLLUP_COLUMNS)
+            for i in range(0, len(args), width):
+                row = dict(zip(ROLLUP_COLUMNS, args[i:i + width]))
+                key = (table_name, row["module"], row["symbol"], row["bucket"])
+                stored = self.database.rollups.setdefault(key, {"samples": 0, "sum_value": None})
+                stored["samples"] += row["samples"]
+                if row["sum_value"] is not None:
+                    stored["sum_value"] = (stored["sum_value"] or 0) + row["sum_value"]
+                for column in ("transitions", "on_seconds"):
+                    if row[column]:
+                        stored[column] = stored.get(column, 0) + row[column]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.history = {}
+        self.staged = []
+        self.rollups = {}
+        self.returned_widths = set()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_rollup_state(monkeypatch):
+    monkeypatch.setattr(rollups, "_schema_ready", True)
+    monkeypatch.setattr(RollupAggregator, "_last_bool", {})
+
+
+@pytest.mark.parametrize("use_copy", [True, False])
+def test_reloading_the_same_rows_does_not_double_count_rollups(use_copy):
+    connection = FakeConnection()
+    for _ in range(2):
+        writer = BulkWriter(connection, use_copy=use_copy, conflict_key=HISTORY_KEY, commit_interval=0,
+                            returning=HISTORY_RETURNING)
+        with RollupHistoryWriter(writer, connection, batch_size=100) as rollup_writer:
+            rollup_writer.write_many(ROWS)
+
+    assert len(connection.history) == len(ROWS)
+    assert connection.returned_widths == {len(HISTORY_RETURNING)}
+    minute = {key[2]: value for key, value in connection.rollups.items() if key[0] == "history_rollup_1m"}
+    assert minute["Temperatura"] == {"samples": 2, "sum_value": 44.0}
+    assert minute["Marcha"]["samples"] == 1
+
+
+def test_partially_loaded_batch_only_adds_the_new_rows():
+    connection = FakeConnection()
+    writer = BulkWriter(connection, use_copy=False, conflict_key=HISTORY_KEY, commit_interval=0,
+                        returning=HISTORY_RETURNING)
+    with RollupHistoryWriter(writer, connection, batch_size=100) as rollup_writer:
+        rollup_writer.write(ROWS[0])
+
+    writer = BulkWriter(connection, use_copy=False, conflict_key=HISTORY_KEY, commit_interval=0,
+                        returning=HISTORY_RETURNING)
+    with RollupHistoryWriter(writer, connection, batch_size=100) as rollup_writer:
+        rollup_writer.write_many(ROWS[:2])
+
+    minute = {key[2]: value for key, value in connection.rollups.items() if key[0] == "history_rollup_1m"}
+    assert minute["Temperatura"] == {"samples": 2, "sum_value": 44.0}
+
+
+def test_bool_rows_written_in_separate_batches_are_linked():
+    connection = FakeConnection()
+    writer = BulkWriter(connection, batch_size=1, use_copy=True, conflict_key=HISTORY_KEY, commit_interval=0,
+                        returning=HISTORY_RETURNING)
+    with RollupHistoryWriter(writer, connection, batch_size=1) as rollup_writer:
+        rollup_writer.write(ROWS[2])
+        rollup_writer.write(ROWS[2][:5] + ("false", "2025-06-26T15:00:45"))
+
+    minute = {key[2]: value for key, value in connection.rollups.items() if key[0] == "history_rollup_1m"}
+    assert minute["Marcha"] == {"samples": 2, "sum_value": None, "transitions": 1, "on_seconds": 45.0}
@@ -0,0 +1,92 @@
+import urllib.error
+import urllib.request
+
+import pytest
+import metrics
+from metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+    monkeypatch.setattr(metrics, "ENABLED", True)
+
+
+def test_disabled_metrics_record_nothing(registry, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    counter = Counter("opc_test_total", "Prueba", ("tag",))
+    histogram = Histogram("opc_test_seconds", "Prueba")
+    counter.labels("Tolva1").inc()
+    counter.inc()
+    with histogram.time():
+        pass
+    assert counter.series() == [] and histogram.series() == []
+    assert metrics.render() == (
+        "# HELP opc_test_total Prueba\n# TYPE opc_test_total counter\n"
+        "# HELP opc_test_seconds Prueba\n# TYPE opc_test_seconds histogram\n"
+    )
+
+
+def test_text_exposition(registry):
+    counter = Counter("opc_errors_total", "Errores por tag", ("tag", "reason"))
+    gauge = Gauge("opc_queue_depth", "Cola")
+    histogram = Histogram("opc_latency_seconds", "Latencia", ("mode",), buckets=(0.5, 0.1, 1.0))
+
+    counter.labels("Tolva1", "http_500").inc()
+    counter.labels("Tolva1", "http_500").inc(2)
+    counter.labels('Nivel "A"\\B\n', "connection").inc()
+    gauge.set(3)
+    for value in (0.05, 0.1, 0.7, 4.0):
+        histogram.labels("COPY").observe(value)
+
+    assert metrics.render().splitlines() == [
+        "# HELP opc_errors_total Errores por tag",
+        "# TYPE opc_errors_total counter",
+        'opc_errors_total{tag="Tolva1",reason="http_500"} 3',
+        'opc_errors_total{tag="Nivel \\"A\\"\\\\B\\n",reason="connection"} 1',
+        "# HELP opc_queue_depth Cola",
+        "# TYPE opc_queue_depth gauge",
+        "opc_queue_depth 3",
+        "# HELP opc_latency_seconds Latencia",
+        "# TYPE opc_latency_seconds histogram",
+        # Buckets ordenados y acumulados; el límite superior es inclusivo
+        'opc_latency_seconds_bucket{mode="COPY",le="0.1"} 2',
+        'opc_latency_seconds_bucket{mode="COPY",le="0.5"} 2',
+        'opc_latency_seconds_bucket{mode="COPY",le="1"} 3',
+        'opc_latency_seconds_bucket{mode="COPY",le="+Inf"} 4',
+        'opc_latency_seconds_sum{mode="COPY"} 4.85',
+        'opc_latency_seconds_count{mode="COPY"} 4',
+    ]
+
+
+def test_histogram_quantiles_and_summary(registry):
+    histogram = Histogram("opc_scan_seconds", "Escaneos", buckets=(0.01, 0.1, 1.0))
+    counter = Counter("opc_rows_total", "Filas")
+    assert histogram.quantile(0.95) == 0.0
+    for value in [0.005] * 90 + [0.05] * 9 + [5.0]:
+        histogram.observe(value)
+    counter.inc(10)
+
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.95) == 0.1
+    assert histogram.quantile(1.0) == float("inf")
+    line = metrics.SummaryReporter(interval=60).summary_line()
+    assert line.startswith("[métricas] opc_scan_seconds: n=100 ")
+    assert "p95<=100ms" in line
+    assert "opc_rows_total=10" in line
+
+
+def test_http_endpoint_serves_the_exposition(registry):
+    Counter("opc_rows_total", "Filas").inc(5)
+    server = metrics.start_http_server(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert response.read().decode("utf-8") == metrics.render()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/otra", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,119 @@
+import pytest
+import normalized_schema
+from normalized_schema import INT_MAX, INT_MIN, MIGRATION_QUERIES, NormalizedHistoryWriter, typed_value
+
+
+class SymbolsCursor:
+    """
+    Responde al alta de símbolos con ids nuevos y acepta los INSERT de muestras.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, query, args=None, stream=None):
+        self._rows = []
+        if "RETURNING id" in query:
+            self.connection.next_id += 1
+            self.connection.created.append(args[1])
+            self._rows = [(self.connection.next_id,)]
+        elif query.lstrip().startswith("INSERT INTO symbol_samples"):
+            self.connection.samples.extend(tuple(args[i:i + 5]) for i in range(0, len(args), 5))
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class SymbolsConnection:
+    def __init__(self):
+        self.next_id = 0
+        self.created = []
+        self.samples = []
+
+    def cursor(self):
+        return SymbolsCursor(self)
+
+    def commit(self):
+        pass
+
+
+ROW = ("Digital_Inputs", "I 0.0", "MotorVerdesIn", "Bool", "", "true", "2025-06-26T15:00:00")
+
+
+@pytest.fixture(autouse=True)
+def fresh_symbol_cache(monkeypatch):
+    monkeypatch.setattr(normalized_schema, "_schema_ready", True)
+    monkeypatch.setattr(normalized_schema, "_sample_keyed", True)
+    monkeypatch.setattr(NormalizedHistoryWriter, "_symbol_ids", {})
+
+
+def _writer(connection):
+    return NormalizedHistoryWriter(connection, use_copy=False, commit_interval=0)
+
+
+@pytest.mark.parametrize("value, data_type, expected", [
+    ("true", "Bool", (True, None, None)),
+    ("0", "BOOL", (False, None, None)),
+    (True, "Bool", (True, None, None)),
+    ("42", "Int", (None, 42, None)),
+    ("-7", "DInt", (None, -7, None)),
+    (str(INT_MAX), "DInt", (None, INT_MAX, None)),
+    (str(INT_MAX + 1), "DInt", (None, None, float(INT_MAX + 1))),
+    (str(INT_MIN - 1), "Word", (None, None, float(INT_MIN - 1))),
+    ("2.5", "Real", (None, None, 2.5)),
+    ("n/a", "Int", (None, None, None)),
+    ("", "Real", (None, None, None)),
+    (None, "Int", (None, None, None)),
+    # Tipo desconocido: se deduce del valor
+    ("false", None, (False, None, None)),
+    ("12", "String", (None, 12, None)),
+    ("3.25", "", (None, None, 3.25)),
+    ("texto", "String", (None, None, None)),
+])
+def test_typed_value(value, data_type, expected):
+    assert typed_value(value, data_type) == expected
+
+
+def test_migration_guards_the_integer_cast():
+    samples_query = " ".join(MIGRATION_QUERIES[1].split())
+    assert f"h.value::numeric BETWEEN {INT_MIN} AND {INT_MAX} THEN h.value::integer" in samples_query
+    assert f"NOT BETWEEN {INT_MIN} AND {INT_MAX} THEN h.value::numeric::double precision" in samples_query
+
+
+def test_symbol_ids_are_shared_only_after_commit():
+    connection = SymbolsConnection()
+    with _writer(connection) as writer:
+        writer.write(ROW)
+        writer.write(ROW[:5] + ("false", "2025-06-26T15:00:01"))
+        assert NormalizedHistoryWriter._symbol_ids == {}
+
+    assert NormalizedHistoryWriter._symbol_ids == {("Digital_Inputs", "MotorVerdesIn"): 1}
+    assert connection.created == ["MotorVerdesIn"]
+    assert connection.samples == [(1, "2025-06-26T15:00:00", True, None, None),
+                                  (1, "2025-06-26T15:00:01", False, None, None)]
+
+    # Otro escritor reutiliza el id sin volver a darlo de alta
+    with _writer(connection) as writer:
+        writer.write(ROW)
+    assert connection.created == ["MotorVerdesIn"]
+
+
+def test_symbol_ids_are_discarded_on_rollback():
+    connection = SymbolsConnection()
+    with pytest.raises(RuntimeError):
+        with _writer(connection) as writer:
+            writer.write(ROW)
+            raise RuntimeError("conexión perdida")
+
+    assert NormalizedHistoryWriter._symbol_ids == {}
+
+    # La fila del símbolo se perdió con el rollback: el siguiente escritor la vuelve a crear
+    with _writer(connection) as writer:
+        writer.write(ROW)
+    assert connection.created == ["MotorVerdesIn", "MotorVerdesIn"]
+    assert NormalizedHistoryWriter._symbol_ids == {("Digital_Inputs", "MotorVerdesIn"): 2}
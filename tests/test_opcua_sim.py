@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("asyncua")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import opcua_sim  # noqa: E402
+
+
+def test_every_symbol_notifies_with_the_default_deadband():
+    assert opcua_sim.main(["--check", "5"]) == 0
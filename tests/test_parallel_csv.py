@@ -0,0 +1,31 @@
+import metrics
+from parallel_csv import iter_symbols_parallel
+
+HEADER = "MotorVerdesIn;MotorVerdesIn_valor;Repeticiones;Repeticiones_valor\n"
+
+
+def _write_export(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        for i in range(rows):
+            f.write(f"26/06/2025 15:{i // 60 % 60:02d}:{i % 60:02d};{i % 2};26/06/2025 15:{i // 60 % 60:02d}:{i % 60:02d};{i}\n")
+    return str(path)
+
+
+def test_parallel_parse_counts_records_in_the_parent(tmp_path):
+    metrics.enable()
+    try:
+        _check_parallel_counts(tmp_path)
+    finally:
+        metrics.enable(False)
+
+
+def _check_parallel_counts(tmp_path):
+    file_path = _write_export(tmp_path / "EXPORT.csv", 2000)
+    counter = metrics.RECORDS_PARSED.labels("csv")
+    before = counter.value
+
+    batches = list(iter_symbols_parallel([file_path], workers=2, chunk_size=4096))
+
+    assert sum(len(batch) for batch in batches) == 4000
+    assert counter.value - before == 4000
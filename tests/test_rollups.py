@@ -0,0 +1,89 @@
+import pytest
+from rollups import RollupAggregator
+
+
+@pytest.fixture(autouse=True)
+def fresh_bool_state(monkeypatch):
+    monkeypatch.setattr(RollupAggregator, "_last_bool", {})
+
+
+def _buckets(aggregator, table_name="history_rollup_1m"):
+    return list(aggregator._buckets[table_name].values())
+
+
+def test_bool_state_is_not_published_when_the_transaction_rolls_back():
+    failed = RollupAggregator()
+    failed.add(("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", "true", "2025-06-26T15:00:00"))
+    failed.discard()
+
+    retry = RollupAggregator()
+    retry.add(("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", "false", "2025-06-26T15:00:30"))
+    [bucket] = _buckets(retry)
+    assert bucket.transitions == 0
+    assert bucket.on_seconds == 0
+
+
+def test_bool_state_links_batches_after_commit():
+    first = RollupAggregator()
+    first.add(("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", "true", "2025-06-26T15:00:00"))
+    first.commit()
+
+    second = RollupAggregator()
+    second.add(("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", "false", "2025-06-26T15:00:30"))
+    [bucket] = _buckets(second)
+    assert bucket.transitions == 1
+    assert bucket.on_seconds == 30
+
+
+class _DiscardingConnection:
+    def cursor(self):
+        return self
+
+    def execute(self, query, args=None):
+        pass
+
+    def close(self):
+        pass
+
+
+def _marcha(value, moment):
+    return ("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", value, f"2025-06-26T{moment}")
+
+
+def test_bool_state_links_rows_across_batches_of_one_transaction():
+    aggregator = RollupAggregator()
+    aggregator.add_many([_marcha("true", "15:00:00")])
+    aggregator.flush(_DiscardingConnection())
+
+    aggregator.add_many([_marcha("false", "15:00:30")])
+    [bucket] = _buckets(aggregator)
+    assert bucket.transitions == 1
+    assert bucket.on_seconds == 30
+
+
+def test_on_time_is_split_between_the_buckets_it_spans():
+    aggregator = RollupAggregator()
+    aggregator.add_many([_marcha("true", "15:00:50"), _marcha("false", "15:01:10")])
+    on_seconds = {key[2].minute: bucket.on_seconds for key, bucket in aggregator._buckets["history_rollup_1m"].items()}
+    assert on_seconds == {0: 10, 1: 10}
+
+
+def test_late_rows_are_counted_but_not_linked():
+    aggregator = RollupAggregator()
+    aggregator.add_many([_marcha("true", "15:00:30"), _marcha("false", "15:00:10"), _marcha("false", "15:00:50")])
+    [bucket] = _buckets(aggregator)
+    assert bucket.samples == 3
+    # El false tardío no rompe el enlace true(15:00:30) -> false(15:00:50)
+    assert bucket.transitions == 1
+    assert bucket.on_seconds == 20
+
+
+def test_rows_far_apart_are_not_linked():
+    aggregator = RollupAggregator()
+    aggregator.add_many([_marcha("true", "15:00:00")])
+    aggregator.commit()
+
+    later = RollupAggregator()
+    later.add_many([("Digital_Inputs", "I 0.0", "Marcha", "BOOL", "", "false", "2025-06-26T17:00:00")])
+    [bucket] = _buckets(later)
+    assert bucket.on_seconds == 0
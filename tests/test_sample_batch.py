@@ -0,0 +1,70 @@
+import pickle
+from datetime import datetime
+
+from sample_batch import EPOCH, RAW_TIMESTAMP, MICROSECOND, SampleBatch
+
+
+def _record(symbol, value, timestamp, module="Digital_Inputs", address="I 0.0", data_type="Bool"):
+    return module, {
+        'Address': address,
+        'Symbol': symbol,
+        'Data type': data_type,
+        'Comment': '',
+        'value': value,
+        'timestamp': timestamp
+    }
+
+
+RECORDS = [
+    _record("MotorVerdesIn", "1", "2025-06-26T15:00:00"),
+    _record("Repeticiones", "7", "2025-06-26T15:00:00.250000", module="Memory_Bits",
+            address="MW 10", data_type="Int"),
+    _record("MotorVerdesIn", "0", "2025-06-26T15:00:01"),
+    _record("MotorVerdesIn", "1", "2025-06-26T15:00:02"),
+]
+
+
+def test_records_round_trip():
+    batch = SampleBatch(RECORDS)
+    assert len(batch) == len(RECORDS)
+    assert list(batch) == RECORDS
+    assert [batch.timestamp_at(i) for i in range(len(batch))] == [entry['timestamp'] for _, entry in RECORDS]
+
+
+def test_symbols_and_values_are_interned():
+    batch = SampleBatch(RECORDS)
+    assert len(batch.symbols) == 2
+    assert batch.values == ["1", "7", "0"]
+    assert list(batch.symbol_column) == [0, 1, 0, 0]
+    assert list(batch.value_column) == [0, 1, 2, 0]
+
+    # Las cadenas de metadatos se comparten entre lotes
+    other = SampleBatch([_record("".join(["Motor", "VerdesIn"]), "1", "2025-06-26T15:00:03")])
+    assert other.symbols[0][2] is batch.symbols[0][2]
+
+
+def test_timestamps_are_stored_as_epoch_microseconds():
+    batch = SampleBatch(RECORDS)
+    expected = datetime(2025, 6, 26, 15, 0, 0, 250000)
+    assert batch.timestamp_column[1] == (expected - EPOCH) // MICROSECOND
+    assert batch.nbytes() == 16 * len(RECORDS)
+    assert not batch._raw_timestamps
+
+
+def test_timestamps_that_do_not_round_trip_are_kept_raw():
+    raw = [
+        "26/06/2025 15:00:00",           # formato de WinCC sin parsear
+        "2025-06-26T15:00:00+02:00",     # con zona horaria
+        "2025-06-26 15:00:00",           # isoformat() lo escribiría con 'T'
+        None,
+        datetime(2025, 6, 26, 15),
+    ]
+    batch = SampleBatch(_record("MotorVerdesIn", "1", timestamp) for timestamp in raw)
+    assert list(batch.timestamp_column) == [RAW_TIMESTAMP] * len(raw)
+    assert [entry['timestamp'] for _, entry in batch] == raw
+    assert [fields[-1] for fields in batch.iter_fields()] == raw
+
+
+def test_batches_survive_pickling_between_processes():
+    batch = SampleBatch(RECORDS + [_record("MotorVerdesIn", "1", "26/06/2025 15:00:03")])
+    assert list(pickle.loads(pickle.dumps(batch))) == list(batch)
@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from scan_scheduler import ScanScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class InlineExecutor:
+    """
+    Ejecuta cada escaneo en el momento, para comprobar el calendario paso a paso.
+    """
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def _scan_that_takes(clock, seconds):
+    def scan():
+        clock.now += seconds
+    return scan
+
+
+def test_fixed_rate_does_not_drift_with_the_scan_duration():
+    clock = FakeClock()
+    starts = []
+
+    def scan():
+        starts.append(clock.now)
+        clock.now += 0.3
+
+    scheduler = ScanScheduler(clock=clock, executor=InlineExecutor(), report_interval=0)
+    scan_class = scheduler.add("fast", 1.0, scan)
+    next_due = scheduler.run_pending()
+    for _ in range(3):
+        clock.now = next_due
+        next_due = scheduler.run_pending()
+
+    assert starts == [0.0, 1.0, 2.0, 3.0]
+    assert next_due == 4.0
+    assert scan_class.scans == 4 and scan_class.overruns == 0
+
+
+def test_overrun_skips_the_missed_cycles_instead_of_bursting():
+    clock = FakeClock()
+    scheduler = ScanScheduler(clock=clock, executor=InlineExecutor(), report_interval=0)
+    scan_class = scheduler.add("slow", 1.0, _scan_that_takes(clock, 2.5))
+
+    next_due = scheduler.run_pending()
+    assert scan_class.overruns == 1
+    assert scan_class.missed == 2
+    # Terminó en 2.5: el siguiente disparo es 3.0, en fase con el periodo
+    assert next_due == 3.0
+
+
+def test_slow_class_does_not_delay_the_fast_class():
+    clock = FakeClock()
+    release = threading.Event()
+    fast_runs = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scheduler = ScanScheduler(clock=clock, executor=executor, report_interval=0)
+        slow = scheduler.add("slow", 10.0, lambda: release.wait(5))
+        fast = scheduler.add("fast", 0.25, lambda: fast_runs.append(clock.now))
+
+        scheduler.run_pending()
+        for step in range(1, 4):
+            fast.future.result(5)
+            clock.now = step * 0.25
+            scheduler.run_pending()
+        fast.future.result(5)
+        assert slow.running
+        release.set()
+        slow.future.result(5)
+
+    assert fast_runs == [0.0, 0.25, 0.5, 0.75]
+    assert fast.overruns == 0
+
+
+def test_run_stops_and_waits_for_the_scans_in_flight():
+    scheduler = ScanScheduler(report_interval=0)
+    scans = []
+    scheduler.add("fast", 0.01, lambda: scans.append(1))
+    threading.Timer(0.1, scheduler.stop).start()
+    scheduler.run(max_duration=5)
+    assert scans and scheduler.executor is None
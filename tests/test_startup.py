@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import bench_startup  # noqa: E402
+
+BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "50"))
+
+
+@pytest.mark.parametrize("module", bench_startup.MODULES)
+def test_import_stays_within_the_startup_budget(module):
+    elapsed, heavy = bench_startup.measure(module)
+    assert heavy == []
+    assert elapsed <= BUDGET_MS
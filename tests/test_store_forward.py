@@ -0,0 +1,73 @@
+import pytest
+from store_forward import Forwarder, StoreAndForwardBuffer, open_buffer
+
+
+@pytest.fixture
+def buffer_path(tmp_path):
+    return str(tmp_path / "buffer" / "opc_buffer.sqlite3")
+
+
+def _rows(start, count):
+    return [("Digital_Inputs", "%I1.0", "Inicio", "Bool", "", str(i % 2 == 0).lower(), f"2025-06-26T15:00:{i:02d}")
+            for i in range(start, start + count)]
+
+
+def test_rows_survive_a_restart(buffer_path):
+    buffer = open_buffer(buffer_path, 1)
+    buffer.append(_rows(0, 5))
+    buffer.close()
+
+    reopened = open_buffer(buffer_path, 1)
+    assert reopened.count() == 5
+    assert reopened.peek(10)[1] == _rows(0, 5)
+    reopened.close()
+
+
+def test_peek_and_ack_replay_in_order(buffer_path):
+    buffer = open_buffer(buffer_path, 1)
+    buffer.append(_rows(0, 3))
+    buffer.append(_rows(3, 3))
+
+    last_id, first = buffer.peek(4)
+    assert first == _rows(0, 4)
+    # Sin ack, lo mismo vuelve a salir: un fallo de subida no pierde filas
+    assert buffer.peek(4) == (last_id, first)
+    buffer.ack(last_id)
+    assert buffer.peek(4)[1] == _rows(4, 2)
+    buffer.close()
+
+
+def test_disk_budget_drops_the_oldest_rows(tmp_path):
+    buffer = StoreAndForwardBuffer(str(tmp_path / "opc_buffer.sqlite3"), max_bytes=64 * 1024)
+    for start in range(0, 4000, 200):
+        buffer.append(_rows(start, 200))
+
+    remaining = buffer.count()
+    assert buffer.dropped > 0
+    assert remaining + buffer.dropped == 4000
+    assert buffer.size_bytes() <= 64 * 1024
+    # Lo que queda es lo más reciente, en orden
+    kept = buffer.peek(remaining)[1]
+    assert kept == [row for start in range(0, 4000, 200) for row in _rows(start, 200)][-remaining:]
+    buffer.close()
+
+
+def test_forwarder_acks_only_confirmed_batches(buffer_path):
+    buffer = open_buffer(buffer_path, 1)
+    buffer.append(_rows(0, 5))
+    uploaded = []
+    outcomes = iter([False, True, True])
+
+    def upload_rows(rows):
+        ok = next(outcomes)
+        if ok:
+            uploaded.extend(rows)
+        return ok
+
+    forwarder = Forwarder(buffer, upload_rows, batch_size=3)
+    assert forwarder.forward_once() is None
+    assert buffer.count() == 5
+    assert forwarder.drain(timeout=5) is True
+    assert uploaded == _rows(0, 5)
+    assert buffer.count() == 0 and forwarder.failures == 1
+    buffer.close()
@@ -0,0 +1,39 @@
+import json
+import os
+import tag_registry
+from main import convert_value_to_boolean_or_word, format_sql_value
+
+
+def test_cache_is_anchored_next_to_the_module():
+    assert os.path.dirname(tag_registry.CACHE_PATH) == tag_registry.ROOT
+
+
+def test_cache_round_trip_and_corrupt_cache(tmp_path, monkeypatch):
+    cache_path = tmp_path / "registry.cache"
+    monkeypatch.setattr(tag_registry, "CACHE_PATH", str(cache_path))
+
+    compiled = tag_registry.load_registry()
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["tags"]
+    cached = tag_registry.load_registry()
+    assert [tag.as_tuple() for tag in cached.tags] == [tag.as_tuple() for tag in compiled.tags]
+
+    cache_path.write_bytes(b"\x80\x04not json")
+    assert len(tag_registry.load_registry()) == len(compiled)
+
+
+def _converted(value, symbol):
+    return format_sql_value(convert_value_to_boolean_or_word(value, {"Symbol": symbol}))
+
+
+def test_csv_values_are_converted_by_the_registered_data_type():
+    assert _converted("7", "Repeticiones") == "7"
+    assert _converted("12", "CiclosTerminados") == "12"
+    assert _converted("1", "MotorVerdesIn") == "true"
+    assert _converted("0", "MotorVerdesIn") == "false"
+    assert _converted("2.5", "Tolva1") == "2.5"
+    # Los símbolos que no están en el registro siguen siendo BOOL
+    assert _converted("1", "NoRegistrado") == "true"
+
+
+def test_unparseable_numbers_are_kept_as_text():
+    assert _converted("n/a", "Repeticiones") == "n/a"
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+from upload_pipeline import UploadPipeline
+
+
+class GatedUpload:
+    """
+    upload_rows que se queda esperando en el primer lote hasta release().
+    """
+
+    def __init__(self, ok=True):
+        self.batches = []
+        self.ok = ok
+        self.started = threading.Event()
+        self._gate = threading.Event()
+
+    def __call__(self, rows):
+        self.batches.append(list(rows))
+        self.started.set()
+        self._gate.wait(5)
+        return self.ok
+
+    def release(self):
+        self._gate.set()
+
+
+class ListBuffer:
+    def __init__(self):
+        self.rows = []
+
+    def append(self, rows):
+        self.rows.extend(rows)
+
+
+def _busy_pipeline(upload, **kwargs):
+    # El escritor ya tiene el primer escaneo entre manos: lo siguiente se queda en la cola
+    pipeline = UploadPipeline(upload, **kwargs).start()
+    pipeline.put([("scan", 0)])
+    assert upload.started.wait(5)
+    return pipeline
+
+
+def test_queued_scans_are_coalesced_into_batches_of_at_most_max_batch_rows():
+    upload = GatedUpload()
+    pipeline = _busy_pipeline(upload, max_queue=10, max_batch_rows=4)
+    for scan in range(1, 6):
+        pipeline.put([("scan", scan), ("scan", scan)])
+    upload.release()
+    pipeline.stop(timeout=5)
+
+    assert [len(batch) for batch in upload.batches] == [1, 4, 4, 2]
+    assert pipeline.written == 11
+
+
+def test_block_policy_makes_the_scan_wait_for_room():
+    upload = GatedUpload()
+    pipeline = _busy_pipeline(upload, max_queue=1, policy="block")
+    pipeline.put([("scan", 1)])
+    producer = threading.Thread(target=pipeline.put, args=([("scan", 2)],))
+    producer.start()
+    time.sleep(0.1)
+    assert producer.is_alive()
+
+    upload.release()
+    producer.join(5)
+    pipeline.stop(timeout=5)
+    assert not producer.is_alive()
+    assert pipeline.written == 3 and pipeline.dropped == 0
+
+
+def test_drop_oldest_policy_discards_the_oldest_queued_scan():
+    upload = GatedUpload()
+    pipeline = _busy_pipeline(upload, max_queue=1, policy="drop_oldest")
+    pipeline.put([("scan", 1), ("scan", 1)])
+    pipeline.put([("scan", 2)])
+    upload.release()
+    pipeline.stop(timeout=5)
+
+    assert pipeline.dropped == 2
+    assert [row for batch in upload.batches for row in batch] == [("scan", 0), ("scan", 2)]
+
+
+def test_spill_policy_sends_overflow_and_failed_batches_to_the_local_buffer():
+    upload = GatedUpload(ok=False)
+    buffer = ListBuffer()
+    spills = []
+    pipeline = _busy_pipeline(upload, max_queue=1, policy="spill", spill_buffer=buffer,
+                              on_spill=lambda: spills.append(True))
+    pipeline.put([("scan", 1)])
+    pipeline.put([("scan", 2)])
+    assert buffer.rows == [("scan", 2)]
+
+    upload.release()
+    pipeline.stop(timeout=5)
+    # Las subidas fallidas tampoco se pierden
+    assert sorted(buffer.rows) == [("scan", 0), ("scan", 1), ("scan", 2)]
+    assert pipeline.failed == 0 and spills
+
+
+def test_spill_policy_needs_a_buffer():
+    with pytest.raises(ValueError):
+        UploadPipeline(lambda rows: True, policy="spill")
@@ -0,0 +1,90 @@
+import importlib.util
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import main
+from main import iter_symbols_from_xlsx, parse_args, read_symbols_from_xlsx
+from sample_batch import SampleBatch
+
+
+def _write_workbook(path, headers, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def reports(tmp_path):
+    headers = ["Name", "Unused", "Path", "Data Type", "Logical Address", "Comment", "Notas"]
+    rows = [
+        ["MotorVerdesIn", "x", "Digital_Inputs.MotorVerdesIn", "Bool", "%I0.0", "Motor verde", "ignorar"],
+        ["Repeticiones", None, "Contadores", "Int", "%MW10", None, None],
+        [None, "fila sin nombre", "Digital_Inputs.X", "Bool", "%I0.1", "", ""],
+        ["   ", "", "", "", "", "", ""],
+        [42, None, "Memory_Bits.Tag42", "Word", "%MW42", 3.5, None],
+    ]
+    return _write_workbook(tmp_path / "REPORTS.xlsx", headers, rows)
+
+
+def test_rows_are_projected_onto_the_known_columns(reports):
+    records = list(iter_symbols_from_xlsx(reports))
+    assert [(module, entry['Symbol']) for module, entry in records] == [
+        ("Digital_Inputs", "MotorVerdesIn"),
+        # Path sin punto: módulo por defecto
+        ("XLSX_Data", "Repeticiones"),
+        ("Memory_Bits", "42"),
+    ]
+    first = records[0][1]
+    assert first['Address'] == "%I0.0"
+    assert first['Data type'] == "Bool"
+    assert first['Comment'] == "Motor verde"
+    assert first['value'] == ""
+    # Celdas vacías como texto vacío y números como texto
+    assert records[1][1]['Comment'] == ""
+    assert records[2][1]['Comment'] == "3.5"
+    # Todas las filas comparten el timestamp de la carga
+    assert len({entry['timestamp'] for _, entry in records}) == 1
+
+
+def test_xlsx_batches(reports):
+    records = list(iter_symbols_from_xlsx(reports))
+    batches = list(iter_symbols_from_xlsx(reports, batch_size=2, compact=True))
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert all(isinstance(batch, SampleBatch) for batch in batches)
+    assert [(module, entry['Symbol']) for batch in batches for module, entry in batch] == \
+        [(module, entry['Symbol']) for module, entry in records]
+
+
+def test_sheet_without_known_columns_yields_nothing(tmp_path):
+    file_path = _write_workbook(tmp_path / "OTRO.xlsx", ["Fecha", "Valor"], [["26/06/2025", 1]])
+    assert list(iter_symbols_from_xlsx(file_path)) == []
+
+
+def test_grouped_by_module(reports, tmp_path):
+    assert {module: [entry['Symbol'] for entry in entries]
+            for module, entries in read_symbols_from_xlsx(reports).items()} == {
+        "Digital_Inputs": ["MotorVerdesIn"],
+        "XLSX_Data": ["Repeticiones"],
+        "Memory_Bits": ["42"],
+    }
+    assert read_symbols_from_xlsx(str(tmp_path / "no_existe.xlsx")) is None
+
+
+def test_default_workbook_is_the_one_in_the_repository(monkeypatch):
+    assert parse_args([]).xlsx == main.DEFAULT_XLSX_PATH
+    if "WINCC_XLSX_PATH" not in os.environ:
+        assert main.DEFAULT_XLSX_PATH == os.path.join(main.ROOT, "REPORTS_V2.xlsx")
+        assert list(iter_symbols_from_xlsx(main.DEFAULT_XLSX_PATH))
+
+    # Una ruta relativa en WINCC_XLSX_PATH se resuelve desde el repositorio
+    monkeypatch.setenv("WINCC_XLSX_PATH", os.path.join("exports", "REPORTS.xlsx"))
+    spec = importlib.util.spec_from_file_location("main_env", main.__file__)
+    fresh = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fresh)
+    assert fresh.DEFAULT_XLSX_PATH == os.path.join(main.ROOT, "exports", "REPORTS.xlsx")
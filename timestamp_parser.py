@@ -0,0 +1,104 @@
+from datetime import datetime
+from functools import lru_cache
+
+# WinCC repite el mismo segundo en muchas filas y columnas
+CACHE_SIZE = 4096
+
+
+def _fast_dmy(timestamp_str):
+    """
+    Ruta rápida de ancho fijo para "%d/%m/%Y %H:%M:%S" (p. ej. "26/06/2025 15:01:52").
+    """
+    s = timestamp_str
+    if len(s) != 19 or s[2] != '/' or s[5] != '/' or s[10] != ' ' or s[13] != ':' or s[16] != ':':
+        raise ValueError(timestamp_str)
+    return datetime(int(s[6:10]), int(s[3:5]), int(s[0:2]),
+                    int(s[11:13]), int(s[14:16]), int(s[17:19]))
+
+
+def _fast_ymd(timestamp_str):
+    """
+    Ruta rápida de ancho fijo para "%Y-%m-%d %H:%M:%S".
+    """
+    s = timestamp_str
+    if len(s) != 19 or s[4] != '-' or s[7] != '-' or s[10] != ' ' or s[13] != ':' or s[16] != ':':
+        raise ValueError(timestamp_str)
+    return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                    int(s[11:13]), int(s[14:16]), int(s[17:19]))
+
+
+def _strptime_parser(fmt):
+    return lambda timestamp_str: datetime.strptime(timestamp_str, fmt)
+
+
+# Formatos soportados en orden de preferencia: (formato, ruta rápida, ruta general)
+TIMESTAMP_FORMATS = [
+    ("%d/%m/%Y %H:%M:%S", _fast_dmy, _strptime_parser("%d/%m/%Y %H:%M:%S")),
+    ("%Y-%m-%d %H:%M:%S", _fast_ymd, _strptime_parser("%Y-%m-%d %H:%M:%S")),
+]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_with_format(timestamp_str, format_index):
+    """
+    Convierte el timestamp con el formato indicado; lanza ValueError si no encaja.
+    """
+    _, fast, slow = TIMESTAMP_FORMATS[format_index]
+    try:
+        return fast(timestamp_str).isoformat()
+    except ValueError:
+        # Valores sin ceros a la izquierda u otras variantes que acepta strptime
+        return slow(timestamp_str).isoformat()
+
+
+class TimestampParser:
+    """
+    Parser de timestamps para una columna del CSV.
+
+    Infiere el formato con el primer valor y lo reutiliza en las filas
+    siguientes; solo vuelve a probar otros formatos si el valor no encaja.
+    """
+
+    def __init__(self):
+        self.format_index = None
+
+    @property
+    def format(self):
+        if self.format_index is None:
+            return None
+        return TIMESTAMP_FORMATS[self.format_index][0]
+
+    def parse(self, timestamp_str):
+        """
+        Convierte el timestamp al formato ISO para PostgreSQL.
+        """
+        if self.format_index is not None:
+            try:
+                return _parse_with_format(timestamp_str, self.format_index)
+            except ValueError:
+                pass
+
+        for index in range(len(TIMESTAMP_FORMATS)):
+            if index == self.format_index:
+                continue
+            try:
+                result = _parse_with_format(timestamp_str, index)
+            except ValueError:
+                continue
+            self.format_index = index
+            return result
+
+        print(f"Warning: No se pudo parsear el timestamp: {timestamp_str}")
+        return timestamp_str
+
+    __call__ = parse
+
+
+_default_parser = TimestampParser()
+
+
+def parse_timestamp(timestamp_str):
+    """
+    Convierte el timestamp del formato CSV al formato ISO para PostgreSQL.
+    """
+    return _default_parser.parse(timestamp_str)
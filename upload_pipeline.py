@@ -0,0 +1,155 @@
+import queue
+import threading
+import metrics
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "spill")
+
+
+class UploadPipeline:
+    """
+    Cola acotada entre los escaneos (productores) y un hilo escritor (consumidor).
+
+    Cada escaneo encola su lista de filas y sigue; el escritor junta lo que
+    haya en la cola en una sola transacción de hasta max_batch_rows filas.
+    Cuando la cola está llena se aplica la política configurada:
+      - block: el escaneo espera a que haya sitio
+      - drop_oldest: se descarta el escaneo más antiguo de la cola
+      - spill: las filas se guardan en el búfer local en disco
+
+    Es el camino de subida con OPC_ENABLE_STORE_AND_FORWARD=false; por defecto
+    los escaneos van directamente al búfer local (store_forward.Forwarder).
+    """
+
+    def __init__(self, upload_rows, max_queue=100, policy="block", max_batch_rows=5000,
+                 spill_buffer=None, on_spill=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Política de contrapresión desconocida: {policy}")
+        if policy == "spill" and spill_buffer is None:
+            raise ValueError("La política 'spill' necesita un búfer local")
+
+        self.upload_rows = upload_rows
+        self.policy = policy
+        self.max_batch_rows = max_batch_rows
+        self.spill_buffer = spill_buffer
+        self.on_spill = on_spill
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._put_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="upload-writer", daemon=True)
+        self._stopping = threading.Event()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.written = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def depth(self):
+        """
+        Número de escaneos esperando en la cola.
+        """
+        return self._queue.qsize()
+
+    def put(self, rows):
+        """
+        Encola las filas de un escaneo aplicando la política de contrapresión.
+        """
+        if not rows:
+            return
+        if self.policy == "block":
+            self._queue.put(rows)
+        else:
+            with self._put_lock:
+                try:
+                    self._queue.put_nowait(rows)
+                except queue.Full:
+                    if self.policy == "drop_oldest":
+                        try:
+                            oldest = self._queue.get_nowait()
+                            self._queue.task_done()
+                            self.dropped += len(oldest)
+                            print(f"Warning: Cola de subida llena; descartadas {len(oldest)} filas antiguas.")
+                        except queue.Empty:
+                            pass
+                        self._queue.put_nowait(rows)
+                    else:
+                        self._spill(rows)
+                        return
+        self.enqueued += len(rows)
+        depth = self._queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        metrics.UPLOAD_QUEUE_DEPTH.set(depth)
+
+    def _spill(self, rows):
+        self.spill_buffer.append(rows)
+        self.spilled += len(rows)
+        if self.on_spill:
+            self.on_spill()
+
+    def _take_batch(self):
+        """
+        Espera el primer escaneo y junta los que ya estén en cola, hasta max_batch_rows filas.
+        """
+        first = self._queue.get()
+        if first is None:
+            self._queue.task_done()
+            return None
+        rows = list(first)
+        taken = 1
+        while len(rows) < self.max_batch_rows:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            taken += 1
+            if item is None:
+                # Marca de parada: escribir este lote y terminar
+                self._queue.task_done()
+                taken -= 1
+                self._stopping.set()
+                break
+            rows.extend(item)
+        metrics.UPLOAD_QUEUE_DEPTH.set(self._queue.qsize())
+        return rows, taken
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            rows, taken = batch
+            try:
+                ok = self.upload_rows(rows)
+            except Exception as e:
+                print(f"Error en el hilo escritor: {e}")
+                ok = False
+
+            if ok:
+                self.written += len(rows)
+            elif self.spill_buffer is not None:
+                # La subida falló: no perder el lote, pasarlo al búfer en disco
+                self._spill(rows)
+            else:
+                self.failed += len(rows)
+                print(f"Warning: Se perdieron {len(rows)} filas por un fallo de subida.")
+
+            for _ in range(taken):
+                self._queue.task_done()
+            if self._stopping.is_set():
+                return
+
+    def stop(self, timeout=None):
+        """
+        Termina de escribir lo encolado y detiene el hilo escritor.
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return (f"cola {self.depth()} (máx. {self.max_depth}), encoladas {self.enqueued}, "
+                f"escritas {self.written}, descartadas {self.dropped}, "
+                f"al disco {self.spilled}, perdidas {self.failed}")